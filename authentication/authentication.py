@@ -0,0 +1,133 @@
+# authentication/authentication.py
+
+import copy
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from django.utils.translation import gettext_lazy as _
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import AuthenticationFailed, InvalidToken
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.utils import get_md5_hash_password
+
+from mygame.metrics import register_collector
+
+DEFAULTS = {
+    "TOKENS": 10000,  # Verified tokens kept (each until it expires)
+    "USERS": 10000,  # Users kept
+    "USER_TTL": 300,  # Seconds; bounds staleness for changes made by other processes
+}
+
+
+def get_config():
+    return {**DEFAULTS, **getattr(settings, "AUTH_CACHE", {})}
+
+
+class ExpiringLRU:
+    """Thread-safe, size-bounded LRU whose entries also expire at a given time."""
+
+    def __init__(self, maxsize):
+        self.maxsize = maxsize
+        self._data = OrderedDict()  # key -> (expires_at, value)
+        self._lock = threading.Lock()
+        self.hits = self.misses = self.evictions = 0
+
+    def __len__(self):
+        return len(self._data)
+
+    def get(self, key):
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None or entry[0] <= time.time():
+                if entry is not None:
+                    del self._data[key]
+                self.misses += 1
+                return None
+            self._data.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def set(self, key, value, expires_at):
+        with self._lock:
+            self._data[key] = (expires_at, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+                self.evictions += 1
+
+    def discard(self, key):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def stats(self):
+        return {"size": len(self._data), "maxsize": self.maxsize, "hits": self.hits,
+                "misses": self.misses, "evictions": self.evictions}
+
+
+token_cache = ExpiringLRU(get_config()["TOKENS"])
+user_cache = ExpiringLRU(get_config()["USERS"])
+
+
+def auth_cache_stats():
+    """Hit/miss counters for sizing AUTH_CACHE."""
+    return {"tokens": token_cache.stats(), "users": user_cache.stats()}
+
+
+@register_collector
+def auth_cache_metrics():
+    samples = []
+    for cache, stats in auth_cache_stats().items():
+        for event in ("hits", "misses", "evictions"):
+            samples.append(("auth_cache_events_total", "counter", "JWT token/user cache hits, misses and evictions.",
+                            (("cache", cache), ("event", event)), stats[event]))
+    return samples
+
+
+class CachedJWTAuthentication(JWTAuthentication):
+    """JWTAuthentication that memoizes verified tokens and the users they belong to.
+
+    Tokens are cached by SHA-256 of the raw token until their `exp` claim, so a
+    token is only decoded and verified once. Users are cached by id for
+    AUTH_CACHE["USER_TTL"] seconds and dropped as soon as they are saved or
+    deleted in this process (e.g. a role change). Each request gets its own
+    shallow copy of the cached user.
+    """
+
+    def get_validated_token(self, raw_token):
+        key = hashlib.sha256(raw_token if isinstance(raw_token, bytes) else raw_token.encode()).digest()
+        token = token_cache.get(key)
+        if token is None:
+            token = super().get_validated_token(raw_token)
+            token_cache.set(key, token, token.get("exp", 0))
+        return token
+
+    def get_user(self, validated_token):
+        try:
+            user_id = validated_token[api_settings.USER_ID_CLAIM]
+        except KeyError:
+            raise InvalidToken(_("Token contained no recognizable user identification"))
+
+        user = user_cache.get(user_id)
+        if user is None:
+            user = super().get_user(validated_token)
+            user_cache.set(user_id, user, time.time() + get_config()["USER_TTL"])
+        elif api_settings.CHECK_REVOKE_TOKEN and validated_token.get(
+            api_settings.REVOKE_TOKEN_CLAIM
+        ) != get_md5_hash_password(user.password):
+            raise AuthenticationFailed(_("The user's password has been changed."), code="password_changed")
+        return copy.copy(user)
+
+
+@receiver(post_save, sender=settings.AUTH_USER_MODEL)
+@receiver(post_delete, sender=settings.AUTH_USER_MODEL)
+def invalidate_cached_user(sender, instance, **kwargs):
+    user_cache.discard(getattr(instance, api_settings.USER_ID_FIELD))
@@ -0,0 +1,39 @@
+# authentication/forms.py
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.forms import AuthenticationForm, UserCreationForm
+
+from .hashing import aauthenticate, amake_password
+
+
+class PooledAuthenticationForm(AuthenticationForm):
+    """AuthenticationForm checking the password in the hashing pool. Validate with `await form.ais_valid()`."""
+
+    def clean(self):
+        return self.cleaned_data  # Credentials are checked by ais_valid(), off the request thread
+
+    async def ais_valid(self):
+        """Raises HashingPoolSaturated."""
+        if not self.is_bound:
+            return False
+        self.full_clean()  # Field checks only: no queries, no hashing
+        if not self._errors:
+            self.user_cache = await aauthenticate(self.request, self.cleaned_data["username"],
+                                                  self.cleaned_data["password"])
+            if self.user_cache is None:
+                self.add_error(None, self.get_invalid_login_error())
+        return not self._errors
+
+
+class RegistrationForm(UserCreationForm):
+    """UserCreationForm for our user model; `await form.asave()` hashes the password in the hashing pool."""
+
+    class Meta(UserCreationForm.Meta):
+        model = get_user_model()
+
+    async def asave(self):
+        """Raises HashingPoolSaturated."""
+        user = self.instance  # Filled in from the form by full_clean()
+        user.password = await amake_password(self.cleaned_data["password1"])
+        await user.asave()
+        return user
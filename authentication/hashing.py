@@ -0,0 +1,199 @@
+# authentication/hashing.py
+"""
+Password hashing on a small, bounded thread pool.
+
+One PBKDF2 check or hash costs about 0.4 s of CPU. Run on the request
+threads, a burst of logins after a deploy holds every gunicorn thread and
+gameplay requests queue behind it. Instead, logins and signups hand the
+work to `hashing_pool`, WORKERS threads per process. hashlib releases the
+GIL while hashing, so request threads keep running in the meantime.
+
+At most MAX_PENDING jobs per process may be running or queued. The next
+one raises HashingPoolSaturated at once, and the views answer 503 with
+Retry-After rather than queueing work that would time out anyway. Under
+gunicorn, keep MAX_PENDING below its thread count: a request thread waits
+for its job, so logins can then never hold every thread. The login and
+register views are async, and every middleware in MIDDLEWARE can run
+async too. Under ASGI (gunicorn with GUNICORN_ASGI=True) they therefore
+await the job on the event loop without holding a thread; only the hooks
+of Django's own middleware step onto a thread briefly. WORKERS = 0 hashes
+on the caller's thread, without limits, as before.
+
+aauthenticate() tries AUTHENTICATION_BACKENDS in order, like
+django.contrib.auth.authenticate(), and sends user_login_failed when none
+accepts. Backends that keep ModelBackend's authenticate() check the
+password in the pool; any other backend runs in a thread via
+sync_to_async.
+"""
+
+import asyncio
+import inspect
+import os
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.contrib.auth import get_user_model, load_backend
+from django.contrib.auth.backends import ModelBackend
+from django.contrib.auth.hashers import check_password, make_password
+from django.contrib.auth.signals import user_login_failed
+from django.core.exceptions import PermissionDenied
+from django.core.signals import setting_changed
+from django.dispatch import receiver
+
+from mygame.metrics import register_collector
+
+DEFAULTS = {
+    "WORKERS": 2,  # Hashing threads per process; 0 hashes inline on the request thread
+    "MAX_PENDING": 4,  # Jobs running or queued per process before fast-failing
+    "RETRY_AFTER": 1,  # Seconds, sent with the 503
+}
+
+
+def get_config():
+    return {**DEFAULTS, **getattr(settings, "AUTH_HASHING", {})}
+
+
+class HashingPoolSaturated(Exception):
+    """Too many password hashes are already running or queued in this process."""
+
+
+class HashingPool:
+    """ThreadPoolExecutor with a hard cap on running plus queued jobs; created lazily, once per process."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.rejected = 0
+        self.completed = 0
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self._config = None
+            self._executor = None
+            self._pid = None
+            self.pending = 0
+
+    def _prepare(self):
+        # Caller holds self._lock. Threads do not survive fork: workers of a preloaded master start their own.
+        if self._pid != os.getpid():
+            self._config = get_config()
+            self._executor = (ThreadPoolExecutor(self._config["WORKERS"], thread_name_prefix="password-hashing")
+                              if self._config["WORKERS"] else None)
+            self._pid = os.getpid()
+            self.pending = 0
+
+    @property
+    def retry_after(self):
+        return (self._config or get_config())["RETRY_AFTER"]
+
+    def submit(self, func, *args):
+        """Future of func(*args). Raises HashingPoolSaturated when MAX_PENDING jobs are in flight."""
+        with self._lock:
+            self._prepare()
+            executor = self._executor
+            if executor is not None:
+                if self.pending >= self._config["MAX_PENDING"]:
+                    self.rejected += 1
+                    raise HashingPoolSaturated(f"{self.pending} password hashes already in progress")
+                self.pending += 1
+        if executor is None:
+            future = Future()
+            try:
+                future.set_result(func(*args))
+            except Exception as error:
+                future.set_exception(error)
+            with self._lock:
+                self.completed += 1
+            return future
+        try:
+            future = executor.submit(func, *args)
+        except BaseException:
+            with self._lock:
+                self.pending -= 1
+            raise
+        future.add_done_callback(self._done)
+        return future
+
+    def _done(self, future):
+        with self._lock:
+            self.pending -= 1
+            self.completed += 1
+
+    def run(self, func, *args):
+        return self.submit(func, *args).result()
+
+    async def arun(self, func, *args):
+        return await asyncio.wrap_future(self.submit(func, *args))
+
+
+hashing_pool = HashingPool()
+
+
+@receiver(setting_changed)
+def _reset_pool(setting, **kwargs):
+    if setting == "AUTH_HASHING":
+        hashing_pool.reset()
+
+
+@register_collector
+def hashing_metrics():
+    return [
+        ("auth_hashing_pending", "gauge", "Password hashes running or queued in the hashing pool.", (),
+         hashing_pool.pending),
+        ("auth_hashing_jobs_total", "counter", "Password hashing jobs by outcome.", (("outcome", "completed"),),
+         hashing_pool.completed),
+        ("auth_hashing_jobs_total", "counter", "Password hashing jobs by outcome.", (("outcome", "rejected"),),
+         hashing_pool.rejected),
+    ]
+
+
+def _verify(password, encoded):
+    """(valid, new hash if the stored one uses outdated parameters). Runs in the pool."""
+    if encoded is None:
+        make_password(password)  # Unknown usernames cost as much as wrong passwords (as in ModelBackend)
+        return False, None
+    outdated = []
+    valid = check_password(password, encoded, setter=outdated.append)
+    return valid, make_password(outdated[0]) if outdated else None
+
+
+async def _model_backend_authenticate(backend, username, password):
+    """ModelBackend.authenticate() with the password checked in the pool."""
+    User = get_user_model()
+    user = await User._default_manager.filter(**{User.USERNAME_FIELD: username}).afirst()
+    valid, rehashed = await hashing_pool.arun(_verify, password, user.password if user is not None else None)
+    if not valid or not backend.user_can_authenticate(user):
+        return None
+    if rehashed:
+        user.password = rehashed
+        await user.asave(update_fields=["password"])
+    return user
+
+
+async def aauthenticate(request, username, password):
+    """The user the configured backends accept for these credentials, or None. Raises HashingPoolSaturated."""
+    for path in settings.AUTHENTICATION_BACKENDS:
+        backend = load_backend(path)
+        try:
+            if isinstance(backend, ModelBackend) and type(backend).authenticate is ModelBackend.authenticate:
+                user = await _model_backend_authenticate(backend, username, password)
+            else:
+                try:
+                    inspect.signature(backend.authenticate).bind(request, username=username, password=password)
+                except TypeError:
+                    continue  # This backend does not take these credentials
+                user = await sync_to_async(backend.authenticate)(request, username=username, password=password)
+        except PermissionDenied:
+            break  # The backend vetoes: no other backend may accept the user
+        if user is not None:
+            user.backend = path
+            return user
+    await user_login_failed.asend(sender=__name__, credentials={"username": username}, request=request)
+    return None
+
+
+async def amake_password(password):
+    """make_password() in the pool. Raises HashingPoolSaturated."""
+    return await hashing_pool.arun(make_password, password)
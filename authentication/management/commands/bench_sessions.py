@@ -0,0 +1,45 @@
+# authentication/management/commands/bench_sessions.py
+
+from django.core.cache import caches
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.test import Client, override_settings
+from django.test.utils import CaptureQueriesContext
+
+from game.bench import Stopwatch, bench_players, rate
+
+ENGINES = [
+    ("db (before)", "django.contrib.sessions.backends.db"),
+    ("low-write (after)", "authentication.sessions"),
+]
+
+
+def is_session_write(sql):
+    sql = sql.lstrip().upper()
+    return "DJANGO_SESSION" in sql and sql.startswith(("INSERT", "UPDATE", "DELETE"))
+
+
+class Command(BaseCommand):
+    help = "Count django_session writes per request for the stock db engine and the low-write engine."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--requests", type=int, default=500)
+        parser.add_argument("--path", default="/", help="URL requested by a logged-in browser session")
+
+    def handle(self, *args, **options):
+        count = options["requests"]
+        with bench_players() as (player,):
+            for label, engine in ENGINES:
+                caches["sessions"].clear()
+                with override_settings(SESSION_ENGINE=engine):
+                    client = Client()
+                    client.force_login(player)
+                    with CaptureQueriesContext(connection) as queries, Stopwatch() as timer:
+                        for _ in range(count):
+                            client.get(options["path"])
+                    writes = sum(1 for query in queries.captured_queries if is_session_write(query["sql"]))
+                    client.logout()
+                self.stdout.write(
+                    f"{label:<20} {count:>6} requests  {writes:>6} session writes  "
+                    f"{writes / count:6.3f} writes/request  {rate(count, timer.elapsed):8.0f} req/s"
+                )
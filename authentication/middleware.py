@@ -1,16 +1,38 @@
+import logging
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
 from django.http import JsonResponse
 from rest_framework.exceptions import APIException
 
+logger = logging.getLogger(__name__)
+
 class CustomExceptionMiddleware:
     """Middleware to handle all exceptions globally and return JSON responses."""
-    
+
+    sync_capable = True
+    async_capable = True
+
     def __init__(self, get_response):
         self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
 
     def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
         try:
             return self.get_response(request)
-        except APIException as e:
-            return JsonResponse({'error': str(e.detail)}, status=e.status_code)
         except Exception as e:
-            return JsonResponse({'error': 'Internal Server Error'}, status=500)
+            return self.handle(request, e)
+
+    async def __acall__(self, request):
+        try:
+            return await self.get_response(request)
+        except Exception as e:
+            return self.handle(request, e)
+
+    def handle(self, request, e):
+        if isinstance(e, APIException):
+            return JsonResponse({'error': str(e.detail)}, status=e.status_code)
+        logger.exception("Unhandled exception on %s", request.path)
+        return JsonResponse({'error': 'Internal Server Error'}, status=500)
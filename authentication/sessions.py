@@ -0,0 +1,92 @@
+# authentication/sessions.py
+"""
+Low-write session engine (SESSION_ENGINE = 'authentication.sessions').
+
+Sessions are still identified by the usual cookie and stored in
+django_session, but:
+
+* reads come from the SESSION_CACHE_ALIAS cache for up to
+  SESSION_LOCAL_CACHE_TTL seconds, falling back to the database. That cache
+  must be shared by all workers (see CACHES in settings): flush() and
+  cycle_key() delete the entry there, so a logged-out session stops
+  authenticating everywhere at once;
+* save() only writes when the session data actually changed. With
+  SESSION_SAVE_EVERY_REQUEST the cookie still slides on every response, but
+  the stored expiry is only pushed forward once it is more than
+  SESSION_REFRESH_INTERVAL seconds old, so read-only traffic costs at most one
+  write per session per interval.
+
+The stored expiry can therefore lag the cookie's by up to
+SESSION_REFRESH_INTERVAL. Rows changed behind the engine's back (e.g. deleted
+with a queryset) are seen after at most SESSION_LOCAL_CACHE_TTL.
+"""
+
+import time
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.contrib.sessions.backends.cached_db import SessionStore as CachedDBStore
+
+KEY_PREFIX = "authentication.sessions"
+
+
+class SessionStore(CachedDBStore):
+    cache_key_prefix = KEY_PREFIX
+
+    # Per-process counters, see the bench_sessions command.
+    writes = 0
+    skipped_writes = 0
+
+    def __init__(self, session_key=None):
+        super().__init__(session_key)
+        self._persisted = None  # (serialized data, stored expiry timestamp) as last loaded/written
+
+    def _cache_timeout(self, expires_at):
+        ttl = getattr(settings, "SESSION_LOCAL_CACHE_TTL", 30)
+        return max(0, min(ttl, expires_at - time.time()))
+
+    def load(self):
+        try:
+            entry = self._cache.get(self.cache_key)
+        except Exception:
+            entry = None
+
+        if entry is None:
+            s = self._get_session_from_db()
+            if not s:
+                return {}
+            data, expires_at = self.decode(s.session_data), s.expire_date.timestamp()
+            self._cache.set(self.cache_key, (data, expires_at), self._cache_timeout(expires_at))
+        else:
+            data, expires_at = entry
+        self._persisted = (self.serializer().dumps(data), expires_at)
+        return data
+
+    def _needs_write(self):
+        if self._persisted is None:
+            return True
+        stored_data, stored_expiry = self._persisted
+        if self.serializer().dumps(self._session) != stored_data:
+            return True
+        # How far a write now would push the stored expiry forward.
+        extension = self.get_expiry_date().timestamp() - stored_expiry
+        return extension > getattr(settings, "SESSION_REFRESH_INTERVAL", 3600)
+
+    def save(self, must_create=False):
+        if self.session_key is None:
+            return self.create()
+        if not must_create and not self._needs_write():
+            SessionStore.skipped_writes += 1
+            return
+        super(CachedDBStore, self).save(must_create)  # Database only; the cache entry is ours
+        SessionStore.writes += 1
+        expires_at = self.get_expiry_date().timestamp()
+        data = self._get_session(no_load=must_create)
+        self._persisted = (self.serializer().dumps(data), expires_at)
+        self._cache.set(self.cache_key, (data, expires_at), self._cache_timeout(expires_at))
+
+    async def aload(self):
+        return await sync_to_async(self.load)()
+
+    async def asave(self, must_create=False):
+        return await sync_to_async(self.save)(must_create)
@@ -1,6 +1,28 @@
+import json
+import os
+import subprocess
+import sys
+import threading
+import tempfile
+from pathlib import Path
+from unittest import mock
 from django.contrib.auth import get_user_model
-from rest_framework.test import APITestCase
+from django.contrib.auth.backends import BaseBackend
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.signals import user_login_failed
+from django.core.cache import caches
+from django.core.handlers.asgi import ASGIHandler
+from django.db import IntegrityError, connection
+from asgiref.sync import async_to_sync
+from django.test import AsyncRequestFactory, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APITestCase, force_authenticate
 from rest_framework import status
+from rest_framework_simplejwt.tokens import RefreshToken
+from .authentication import auth_cache_stats, token_cache, user_cache
+from .hashing import hashing_pool
+from .sessions import SessionStore
+from mygame.metrics import registry
 
 User = get_user_model()  # Get the correct user model dynamically
 
@@ -23,7 +45,7 @@ class AuthenticationTests(APITestCase):
         print("Login Response Data:", response.json())
 
         self.assertEqual(response.status_code, status.HTTP_200_OK)
-        self.assertIn("tokens", response.data)  # Check if tokens are returned
+        self.assertIn("tokens", response.json())  # Check if tokens are returned
 
     def test_protected_route_without_auth(self):
         """Test accessing a protected route without authentication."""
@@ -33,7 +55,306 @@ class AuthenticationTests(APITestCase):
     def test_protected_route_with_auth(self):
         """Test accessing a protected route with a valid token."""
         login_response = self.client.post(self.login_url, {"username": "testuser", "password": "testpass"}, follow=True)
-        token = login_response.data["tokens"]["access"]
+        token = login_response.json()["tokens"]["access"]
         headers = {"HTTP_AUTHORIZATION": f"Bearer {token}"}
         response = self.client.get(self.protected_url, **headers)
         self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+
+class CachedJWTAuthenticationTests(APITestCase):
+    """Verified tokens and users are served from memory after the first request."""
+
+    def setUp(self):
+        self.user = User.objects.create_user(username="cached", password="testpass")
+        self.headers = {"HTTP_AUTHORIZATION": f"Bearer {RefreshToken.for_user(self.user).access_token}"}
+        self.protected_url = "/api/auth/protected/"
+        token_cache.clear()
+        user_cache.clear()
+
+    def test_steady_state_requests_do_no_user_query(self):
+        self.client.get(self.protected_url, **self.headers)
+        with self.assertNumQueries(0):
+            response = self.client.get(self.protected_url, **self.headers)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertGreaterEqual(auth_cache_stats()["tokens"]["hits"], 1)
+
+    def test_saving_the_user_invalidates_the_cache(self):
+        self.client.get(self.protected_url, **self.headers)
+        self.user.is_active = False
+        self.user.save()
+        response = self.client.get(self.protected_url, **self.headers)
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_stats_are_admin_only(self):
+        response = self.client.get("/api/auth/auth-cache-stats/", **self.headers)
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+        self.user.role = "admin"
+        self.user.save()
+        response = self.client.get("/api/auth/auth-cache-stats/", **self.headers)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertIn("users", response.data)
+
+
+class LowWriteSessionTests(TestCase):
+    """The session engine only writes django_session rows when something changed."""
+
+    def setUp(self):
+        caches["sessions"].clear()
+        session = SessionStore()
+        session["health"] = 100
+        session.create()
+        self.session_key = session.session_key
+
+    def test_unchanged_session_is_not_written(self):
+        session = SessionStore(self.session_key)
+        self.assertEqual(session["health"], 100)
+        with self.assertNumQueries(0):
+            session.save()
+
+    def test_changed_session_is_written(self):
+        session = SessionStore(self.session_key)
+        session["health"] = 80
+        session.save()
+        caches["sessions"].clear()
+        self.assertEqual(SessionStore(self.session_key)["health"], 80)
+
+    @override_settings(SESSION_REFRESH_INTERVAL=-1)
+    def test_stale_expiry_is_refreshed(self):
+        session = SessionStore(self.session_key)
+        session.load()
+        with CaptureQueriesContext(connection) as queries:
+            session.save()
+        self.assertTrue(any(q["sql"].startswith('UPDATE "django_session"') for q in queries.captured_queries))
+
+    def test_cache_is_shared_between_workers(self):
+        from django.core.cache.backends.locmem import LocMemCache
+
+        self.assertNotIsInstance(caches["sessions"], LocMemCache)
+
+    def test_flush_and_cycle_key_drop_the_cached_entry(self):
+        SessionStore(self.session_key).load()  # Cached, as by another worker's earlier request
+        session = SessionStore(self.session_key)
+        session.cycle_key()
+        self.assertEqual(SessionStore(self.session_key).load(), {})
+        self.assertEqual(SessionStore(session.session_key)["health"], 100)
+
+        cycled_key = session.session_key
+        session.flush()
+        self.assertIsNone(caches["sessions"].get(SessionStore.cache_key_prefix + cycled_key))
+        self.assertEqual(SessionStore(cycled_key).load(), {})
+
+
+class MetricsTests(APITestCase):
+    """Per-endpoint metrics exposed at /metrics, summed across worker processes."""
+
+    def test_requests_are_counted_per_view(self):
+        self.client.get("/api/auth/protected/")
+        body = self.client.get("/metrics").content.decode()
+        self.assertIn('http_requests_total{method="GET",status="401",view="protected"}', body)
+        self.assertIn('http_request_duration_seconds_bucket{view="protected",le="+Inf"}', body)
+        self.assertIn("# TYPE db_queries_per_request histogram", body)
+
+    @override_settings(DEBUG=True)
+    def test_middleware_stays_async_under_asgi(self):
+        with self.assertNoLogs("django.request", "DEBUG"):  # Django logs each middleware it has to adapt
+            ASGIHandler()
+        async_to_sync(self.async_client.get)("/api/auth/protected/")
+        body = self.client.get("/metrics").content.decode()
+        self.assertIn('http_requests_total{method="GET",status="401",view="protected"}', body)
+
+    def test_only_allowed_clients_and_staff_may_scrape(self):
+        self.assertEqual(self.client.get("/metrics", REMOTE_ADDR="203.0.113.7").status_code, status.HTTP_403_FORBIDDEN)
+        with self.settings(METRICS_ALLOWED_IPS=["203.0.113.0/24"]):
+            self.assertEqual(self.client.get("/metrics", REMOTE_ADDR="203.0.113.7").status_code, status.HTTP_200_OK)
+        self.client.force_login(User.objects.create_user(username="ops", password="testpass", is_staff=True))
+        self.assertEqual(self.client.get("/metrics", REMOTE_ADDR="203.0.113.7").status_code, status.HTTP_200_OK)
+
+    def test_snapshots_of_other_workers_are_summed(self):
+        with tempfile.TemporaryDirectory() as directory, self.settings(METRICS_DIR=directory):
+            other = {"counters": [["http_errors_total", [["error", "500"], ["view", "elsewhere"]], 2]],
+                     "histograms": []}
+            Path(directory, "999999.json").write_text(json.dumps(other))
+            body = self.client.get("/metrics").content.decode()
+        self.assertIn('http_errors_total{error="500",view="elsewhere"} 2', body)
+
+    def test_exited_workers_keep_counters_but_not_gauges(self):
+        exited = subprocess.Popen([sys.executable, "-c", ""])
+        exited.wait()
+        registry.describe("test_worker_busy", "gauge", "A per-process gauge.")
+        registry.describe("test_worker_jobs_total", "counter", "A per-process counter.")
+        samples = [["test_worker_busy", [], 3], ["test_worker_jobs_total", [], 5]]
+        with tempfile.TemporaryDirectory() as directory, self.settings(METRICS_DIR=directory):
+            for pid in (os.getppid(), exited.pid):  # A live process, then an exited one
+                Path(directory, f"{pid}.json").write_text(json.dumps({"counters": samples, "histograms": []}))
+            body = self.client.get("/metrics").content.decode()
+        self.assertIn("test_worker_busy 3\n", body)
+        self.assertIn("test_worker_jobs_total 10\n", body)
+
+
+class AdminExportTests(APITestCase):
+    """Admins can stream whole tables as CSV or NDJSON in a constant number of queries."""
+
+    def setUp(self):
+        from game.models import GameSession, Leaderboard, PlayerMove
+
+        self.admin = User.objects.create_user(username="exporter", password="testpass", role="admin")
+        self.players = [User.objects.create_user(username=f"player{i}", password="testpass") for i in range(3)]
+        for i, player in enumerate(self.players):
+            session = GameSession.objects.create(player=player, score=i)
+            PlayerMove.objects.bulk_create([PlayerMove(session=session, action=f"move-{j}") for j in range(2)])
+            Leaderboard.objects.create(player=player, best_score=10 * i)
+        self.client.force_authenticate(user=self.admin)
+
+    def export(self, dataset, file_type):
+        response = self.client.get(f"/api/auth/admin-dashboard/export/{dataset}.{file_type}")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertIn(f'filename="{dataset}.{file_type}"', response["Content-Disposition"])
+        with CaptureQueriesContext(connection) as queries:
+            body = b"".join(response.streaming_content).decode()
+        return body, queries
+
+    def test_sessions_csv_joins_player_names(self):
+        body, queries = self.export("sessions", "csv")
+        lines = body.splitlines()
+        self.assertEqual(lines[0].split(",")[:3], ["id", "player_id", "player"])
+        self.assertEqual(len(lines), 4)
+        self.assertEqual([line.split(",")[2] for line in lines[1:]], ["player0", "player1", "player2"])
+        self.assertEqual(len(queries), 1)  # No per-row username lookups
+
+    def test_ndjson_datasets(self):
+        body, _ = self.export("leaderboard", "ndjson")
+        rows = [json.loads(line) for line in body.splitlines()]
+        self.assertEqual([(row["position"], row["player"]) for row in rows],
+                         [(1, "player2"), (2, "player1"), (3, "player0")])
+        body, _ = self.export("moves", "ndjson")
+        self.assertEqual(len(body.splitlines()), 6)
+        body, _ = self.export("users", "ndjson")
+        users = [json.loads(line) for line in body.splitlines()]
+        self.assertEqual(len(users), 4)
+        self.assertNotIn("password", users[0])
+
+    def test_asgi_requests_get_an_async_iterator(self):
+        from game import exports
+        from .views import admin_export
+
+        request = AsyncRequestFactory().get("/api/auth/admin-dashboard/export/users.ndjson")
+        force_authenticate(request, user=self.admin)
+        with mock.patch.object(exports, "LINES_PER_CHUNK", 1):
+            response = admin_export(request, dataset="users", file_type="ndjson")
+            self.assertTrue(response.is_async)  # Served as produced, not drained into a list by the handler
+
+            async def consume():
+                return [chunk async for chunk in response.streaming_content]
+
+            chunks = async_to_sync(consume)()
+        self.assertEqual(len(chunks), 4)
+        self.assertEqual(json.loads(chunks[0])["username"], "exporter")
+
+    def test_admin_role_required(self):
+        self.client.force_authenticate(user=self.players[0])
+        response = self.client.get("/api/auth/admin-dashboard/export/users.csv")
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+        self.client.force_authenticate(user=self.admin)
+        response = self.client.get("/api/auth/admin-dashboard/export/passwords.csv")
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+
+class PasswordHashingPoolTests(TestCase):
+    """Logins and sign-ups hash passwords in a bounded pool and fail fast when it is full."""
+
+    def setUp(self):
+        hashing_pool.reset()
+        self.user = User.objects.create_user(username="storm", password="testpass")
+
+    def tearDown(self):
+        hashing_pool.reset()
+
+    def test_register_then_login(self):
+        response = self.client.post("/api/auth/register/", {"username": "newbie", "password": "s3cret!", "role": "admin"},
+                                    content_type="application/json")
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        user = User.objects.get(username="newbie")
+        self.assertEqual(user.role, "admin")
+        self.assertTrue(user.check_password("s3cret!"))
+
+        response = self.client.post("/api/auth/login/", {"username": "newbie", "password": "s3cret!"})
+        self.assertIn("access", response.json()["tokens"])
+        response = self.client.post("/api/auth/login/", {"username": "newbie", "password": "wrong"})
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+        self.assertEqual(self.client.get("/api/auth/login/").status_code, status.HTTP_405_METHOD_NOT_ALLOWED)
+
+    @override_settings(AUTH_HASHING={"WORKERS": 1, "MAX_PENDING": 1, "RETRY_AFTER": 2})
+    def test_saturated_pool_fails_fast(self):
+        release = threading.Event()
+        blocker = hashing_pool.submit(release.wait)
+        try:
+            response = self.client.post("/api/auth/login/", {"username": "storm", "password": "testpass"})
+            self.assertEqual(response.status_code, status.HTTP_503_SERVICE_UNAVAILABLE)
+            self.assertEqual(response["Retry-After"], "2")
+            response = self.client.post("/api/game/login/", {"username": "storm", "password": "testpass"})
+            self.assertEqual(response.status_code, status.HTTP_503_SERVICE_UNAVAILABLE)
+            self.assertEqual(hashing_pool.rejected, 2)
+        finally:
+            release.set()
+            blocker.result()
+        response = self.client.post("/api/auth/login/", {"username": "storm", "password": "testpass"})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    def test_outdated_hashes_are_upgraded(self):
+        User.objects.filter(pk=self.user.pk).update(password=make_password("testpass", hasher="pbkdf2_sha1"))
+        response = self.client.post("/api/auth/login/", {"username": "storm", "password": "testpass"})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.user.refresh_from_db()
+        self.assertTrue(self.user.password.startswith("pbkdf2_sha256$"))
+
+    def test_login_and_register_pages(self):
+        response = self.client.post("/api/game/login/", {"username": "storm", "password": "nope"})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertNotIn("_auth_user_id", self.client.session)
+        response = self.client.post("/api/game/login/", {"username": "storm", "password": "testpass"})
+        self.assertRedirects(response, "/api/game/", fetch_redirect_response=False)
+        self.assertEqual(self.client.session["_auth_user_id"], str(self.user.pk))
+
+        self.client.logout()
+        response = self.client.post("/api/game/register/", {"username": "painter", "password1": "Zx9!long-pass",
+                                                             "password2": "Zx9!long-pass"})
+        self.assertRedirects(response, "/api/game/", fetch_redirect_response=False)
+        self.assertTrue(User.objects.get(username="painter").check_password("Zx9!long-pass"))
+
+    def test_username_taken_during_sign_up(self):
+        with mock.patch.object(User, "asave", side_effect=IntegrityError):
+            response = self.client.post("/api/game/register/", {"username": "painter", "password1": "Zx9!long-pass",
+                                                                 "password2": "Zx9!long-pass"})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.context["form"].errors["username"], ["A user with that username already exists."])
+
+    def test_failed_login_is_signalled(self):
+        failures = []
+
+        def receiver(sender, credentials, request, **kwargs):
+            failures.append(credentials)
+
+        user_login_failed.connect(receiver)
+        self.addCleanup(user_login_failed.disconnect, receiver)
+        self.client.post("/api/auth/login/", {"username": "storm", "password": "wrong"})
+        self.assertEqual(failures, [{"username": "storm"}])
+
+    def test_configured_backends_are_used(self):
+        User.objects.filter(pk=self.user.pk).update(is_active=False)
+        response = self.client.post("/api/auth/login/", {"username": "storm", "password": "testpass"})
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+        with self.settings(AUTHENTICATION_BACKENDS=["django.contrib.auth.backends.AllowAllUsersModelBackend"]):
+            response = self.client.post("/api/auth/login/", {"username": "storm", "password": "testpass"})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        with self.settings(AUTHENTICATION_BACKENDS=["authentication.tests.NobodyBackend"]):
+            User.objects.filter(pk=self.user.pk).update(is_active=True)
+            response = self.client.post("/api/auth/login/", {"username": "storm", "password": "testpass"})
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+
+class NobodyBackend(BaseBackend):
+    """Accepts no one (see test_configured_backends_are_used)."""
+
+    def authenticate(self, request, username=None, password=None):
+        return None
@@ -1,5 +1,5 @@
 from django.urls import path
-from .views import register, login, admin_dashboard
+from .views import register, login, admin_dashboard, admin_export, auth_cache_stats
 from .views import ProtectedView
 from rest_framework_simplejwt.views import TokenObtainPairView, TokenRefreshView
 
@@ -7,6 +7,8 @@ urlpatterns = [
     path('register/', register, name='register'),
     path('login/', login, name='login'),
     path('admin-dashboard/', admin_dashboard, name='admin-dashboard'),
+    path('admin-dashboard/export/<str:dataset>.<str:file_type>', admin_export, name='admin-export'),
+    path('auth-cache-stats/', auth_cache_stats, name='auth-cache-stats'),
 ]
 
 urlpatterns += [
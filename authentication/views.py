@@ -1,8 +1,11 @@
 # authentication/views.py
 
 from django.views.decorators.csrf import csrf_exempt 
+from django.views.decorators.http import require_POST
 from django.shortcuts import render, get_object_or_404
-from django.contrib.auth import authenticate, get_user_model
+from django.contrib.auth import get_user_model
+from django.db import IntegrityError
+from django.http import JsonResponse
 from django.utils.timezone import now
 from rest_framework.response import Response
 from rest_framework.decorators import api_view, permission_classes
@@ -10,8 +13,14 @@ from rest_framework.permissions import IsAuthenticated, BasePermission
 from rest_framework import status
 from rest_framework.views import APIView
 from rest_framework_simplejwt.tokens import RefreshToken
+import json
 import logging
 
+from game import rollups
+from mygame.streaming import streaming_response
+
+from . import authentication, hashing
+
 logger = logging.getLogger(__name__)
 
 # Get the correct User model dynamically
@@ -26,6 +35,13 @@ class IsSuperUser(BasePermission):
     def has_permission(self, request, view):
         return request.user and request.user.is_superuser
 
+class IsAdminRole(BasePermission):
+    """Allow only users whose role is 'admin' (the same check admin_dashboard makes)."""
+    message = 'You do not have permission to access this resource'
+
+    def has_permission(self, request, view):
+        return bool(request.user and getattr(request.user, 'role', None) == 'admin')
+
 # ------------------------------
 # 🔹 AUTHENTICATION & USER MANAGEMENT
 # ------------------------------
@@ -37,49 +53,78 @@ def get_tokens_for_user(user):
         'access': str(refresh.access_token),
     }
 
+def _payload(request):
+    """Fields of a JSON, form or multipart POST body (what DRF's parsers accept), or None if malformed."""
+    if request.content_type == 'application/json':
+        try:
+            data = json.loads(request.body or b'{}')
+        except ValueError:
+            return None
+        return data if isinstance(data, dict) else None
+    return request.POST
+
+def _busy():
+    response = JsonResponse({'error': 'Too many logins in progress, please retry shortly'},
+                            status=status.HTTP_503_SERVICE_UNAVAILABLE)
+    response['Retry-After'] = str(hashing.hashing_pool.retry_after)
+    return response
+
+# Async (not DRF) views: password hashing runs in the bounded hashing pool and is awaited (see hashing.py).
 @csrf_exempt
-@api_view(['POST'])
-def register(request):
+@require_POST
+async def register(request):
     """API endpoint to create a new user with roles."""
-    username = request.data.get('username')
-    password = request.data.get('password')
-    role = request.data.get('role', 'player')  # Default role is 'player'
+    data = _payload(request)
+    if data is None:
+        return JsonResponse({'error': 'Malformed request body'}, status=status.HTTP_400_BAD_REQUEST)
+    username = data.get('username')
+    password = data.get('password')
+    role = data.get('role', 'player')  # Default role is 'player'
 
     if not username or not password:
-        return Response({'error': 'Username and password are required'}, status=status.HTTP_400_BAD_REQUEST)
+        return JsonResponse({'error': 'Username and password are required'}, status=status.HTTP_400_BAD_REQUEST)
 
     if role not in ['player', 'admin']:
-        return Response({'error': 'Invalid role'}, status=status.HTTP_400_BAD_REQUEST)
+        return JsonResponse({'error': 'Invalid role'}, status=status.HTTP_400_BAD_REQUEST)
 
-    if User.objects.filter(username=username).exists():
-        return Response({'error': 'Username already taken'}, status=status.HTTP_400_BAD_REQUEST)
+    if await User.objects.filter(username=username).aexists():
+        return JsonResponse({'error': 'Username already taken'}, status=status.HTTP_400_BAD_REQUEST)
 
-    user = User.objects.create_user(username=username, password=password)
-    if hasattr(user, 'role'):  # Ensure role exists in CustomUser model
-        user.role = role  
-        user.save()
+    try:
+        password = await hashing.amake_password(password)
+    except hashing.HashingPoolSaturated:
+        return _busy()
+    user = User(username=User.normalize_username(username), password=password, role=role)
+    try:
+        await user.asave()
+    except IntegrityError:  # Taken since the check above
+        return JsonResponse({'error': 'Username already taken'}, status=status.HTTP_400_BAD_REQUEST)
 
-    return Response({'message': 'User created successfully', 'role': role}, status=status.HTTP_201_CREATED)
+    return JsonResponse({'message': 'User created successfully', 'role': role}, status=status.HTTP_201_CREATED)
 
 @csrf_exempt
-@api_view(['POST'])
-def login(request):
+@require_POST
+async def login(request):
     """API endpoint for user login."""
-    print("\nReceived Request Data:", request.data)  # Debugging
-    
-    username = request.data.get('username')
-    password = request.data.get('password')
+    data = _payload(request)
+    if data is None:
+        return JsonResponse({'error': 'Malformed request body'}, status=status.HTTP_400_BAD_REQUEST)
+    username = data.get('username')
+    password = data.get('password')
 
     if not username or not password:
-        return Response({'error': 'Both username and password are required'}, status=status.HTTP_400_BAD_REQUEST)
+        return JsonResponse({'error': 'Both username and password are required'}, status=status.HTTP_400_BAD_REQUEST)
 
-    user = authenticate(username=username, password=password)
+    try:
+        user = await hashing.aauthenticate(request, username, password)
+    except hashing.HashingPoolSaturated:
+        return _busy()
 
     if user is not None:
         tokens = get_tokens_for_user(user)  # Generate JWT tokens
-        return Response({'message': 'Login successful', 'tokens': tokens}, status=status.HTTP_200_OK)
+        return JsonResponse({'message': 'Login successful', 'tokens': tokens}, status=status.HTTP_200_OK)
     else:
-        return Response({'error': 'Invalid credentials'}, status=status.HTTP_401_UNAUTHORIZED)
+        return JsonResponse({'error': 'Invalid credentials'}, status=status.HTTP_401_UNAUTHORIZED)
 
 # ------------------------------
 # 🔹 PROTECTED ADMIN DASHBOARD
@@ -91,7 +136,27 @@ def admin_dashboard(request):
     if not hasattr(request.user, 'role') or request.user.role != 'admin':
         return Response({'error': 'You do not have permission to access this resource'}, status=status.HTTP_403_FORBIDDEN)
 
-    return Response({'message': 'Welcome, Admin! Here’s your dashboard.'}, status=status.HTTP_200_OK)
+    return Response({'message': 'Welcome, Admin! Here’s your dashboard.', 'stats': rollups.dashboard_stats()},
+                    status=status.HTTP_200_OK)
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated, IsAdminRole])
+def admin_export(request, dataset, file_type):
+    """Stream a whole table (sessions, moves, leaderboard or users) as CSV or NDJSON (admin only)."""
+    from game import exports  # Loads the move archive and numpy; only exports need them
+
+    if dataset not in exports.DATASETS or file_type not in exports.CONTENT_TYPES:
+        return Response({'error': 'Unknown export'}, status=status.HTTP_404_NOT_FOUND)
+    response = streaming_response(request, exports.stream(dataset, file_type), content_type=exports.CONTENT_TYPES[file_type])
+    response['Content-Disposition'] = f'attachment; filename="{dataset}.{file_type}"'
+    response['X-Accel-Buffering'] = 'no'  # Let proxies pass chunks through as they are produced
+    return response
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated, IsAdminRole])
+def auth_cache_stats(request):
+    """Hit/miss counters of the JWT token and user caches (admin only)."""
+    return Response(authentication.auth_cache_stats(), status=status.HTTP_200_OK)
 
 class ProtectedView(APIView):
     """A sample API that requires authentication."""
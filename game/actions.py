@@ -0,0 +1,173 @@
+# game/actions.py
+"""
+Game actions shared by the REST views and the WebSocket channel.
+
+Each action works on a LiveSession (see live_state.py) and returns the
+response payload; refusals raise GameActionError carrying the message and the
+HTTP status the REST views answer with.
+"""
+
+import random
+
+from django.conf import settings
+from django.utils.timezone import now
+from rest_framework import status
+
+from .ingest import move_ingestor
+from .leaderboard_index import leaderboard_index
+from .live_state import live_sessions
+from .maintenance import maintenance_worker
+from .models import GameSession, InventoryItem, PlayerMove
+from .reaper import session_reaper
+from .rollups import activity_rollups
+from .scores import score_submitter
+
+
+class GameActionError(Exception):
+    """An action was refused."""
+
+    def __init__(self, message, status=status.HTTP_400_BAD_REQUEST, headers=None):
+        super().__init__(message)
+        self.message = message
+        self.status = status
+        self.headers = headers
+
+
+def get_session(session_id, player):
+    """The live state of `player`'s session `session_id`; every action counts as a heartbeat."""
+    session = live_sessions.get(session_id, player)
+    if session is None:
+        raise GameActionError("Invalid session!")
+    seen(session)
+    if ticks_enabled() and session.engine is None and session.is_alive():
+        from .ticks import tick_engine
+
+        tick_engine.register(session)
+        tick_engine.ensure_running()
+    return session
+
+
+def ticks_enabled():
+    """ticks.is_enabled() without importing ticks.py: numpy loads only once the engine is on."""
+    return getattr(settings, "GAME_TICK_ENGINE", {}).get("ENABLED", False)
+
+
+def seen(session):
+    """Record activity on `session`, persisting it when due."""
+    if session.heartbeat():
+        live_sessions.commit(session)
+    session_reaper.ensure_started()
+
+
+def start_game(player):
+    session = GameSession.objects.create(player=player)
+    activity_rollups.add(session.start_time, sessions_started=1)
+    session_reaper.ensure_started()
+    maintenance_worker.ensure_started()
+    return {"message": "Game started!", "session_id": session.id}
+
+
+def heartbeat(session):
+    """Keep-alive; the heartbeat itself was recorded by get_session()."""
+    return {"survival_time": session.survival_time(), "health": session.health}
+
+
+def survival_time(player, session_id):
+    """Server-side survival time of one of `player`'s sessions."""
+    try:
+        row = GameSession.objects.filter(id=session_id, player=player).values_list("start_time", "end_time").first()
+    except (TypeError, ValueError):
+        row = None
+    if row is None:
+        raise GameActionError("Invalid session!")
+    start_time, end_time = row
+    return {
+        "session_id": int(session_id),
+        "survival_time": ((end_time or now()) - start_time).total_seconds(),
+        "active": end_time is None,
+    }
+
+
+def log_move(session, action):
+    """Queue a move for batched insertion."""
+    if not isinstance(action, str) or not action or len(action) > PlayerMove._meta.get_field("action").max_length:
+        raise GameActionError("Invalid action!")
+    if not move_ingestor.submit(session.session_id, action):
+        raise GameActionError("Server busy, retry shortly.", status.HTTP_503_SERVICE_UNAVAILABLE,
+                              {"Retry-After": "1"})
+    return {"message": "Move accepted!"}
+
+
+def enemy_attack(session):
+    """Enemy attack reduces player's health randomly."""
+    if not session.is_alive():
+        raise GameActionError("Game Over!")
+
+    damage = random.randint(5, 20)  # Random damage
+    session.take_damage(damage)
+    live_sessions.commit(session)
+
+    return {
+        "message": f"Enemy attacked! You lost {damage} HP.",
+        "remaining_health": session.health
+    }
+
+
+def collect_item(session, item):
+    """Collect an item and gain a bonus."""
+    if not isinstance(item, str) or not item or len(item) > InventoryItem._meta.get_field("item").max_length:
+        raise GameActionError("Invalid item!")
+    if not session.is_alive():
+        raise GameActionError("Game Over!")
+
+    session.collect_item(item)
+
+    # If it's a health potion, restore health
+    if item == "Health Potion":
+        session.heal(20)
+    live_sessions.commit(session)
+
+    return {
+        "message": f"You collected a {item}!",
+        "inventory": session.get_inventory(),
+        "health": session.health
+    }
+
+
+def parse_score(raw):
+    try:
+        score = int(raw)
+    except (TypeError, ValueError):
+        raise GameActionError("Invalid score!")
+    if score < 0:
+        raise GameActionError("Invalid score!")
+    return score
+
+
+def end_game(player, session_id, score):
+    """End the game session and update the leaderboard."""
+    try:
+        session = GameSession.objects.get(id=session_id, player=player)
+    except (GameSession.DoesNotExist, TypeError, ValueError):
+        raise GameActionError("Invalid session!")
+
+    was_open = session.end_time is None
+    if was_open:
+        move_ingestor.flush_session(session.id)  # Its queued moves land before the session counts as ended
+    live = live_sessions.finish(session.id)  # Writes buffered health/inventory changes
+    if live is not None:
+        session.health = live.health
+        session.damage_taken = live.damage_taken
+        session.last_seen = live.last_seen
+    session.end_time = now()
+    session.score = score
+    session.save()
+    live_sessions.finish(session.id)  # A request racing this one may have reloaded it before end_time was set
+    if was_open:
+        activity_rollups.add(session.end_time, sessions_ended=1, score_total=score)
+
+    # Update the leaderboard (atomic "keep the higher score" upsert)
+    score_submitter.submit(player.pk, score)
+    leaderboard_index.submit(player, score)
+
+    return {"message": "Game ended!", "final_score": score}
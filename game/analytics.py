@@ -0,0 +1,272 @@
+# game/analytics.py
+"""
+Gameplay analytics over finished sessions, computed with numpy.
+
+Columns are read in chunks straight from a database cursor (the SQL is built
+by the ORM, the rows skip its per-value converters) and turned into arrays:
+timestamps are parsed by numpy, move counts come from np.unique over the
+PlayerMove session_id column plus a searchsorted over each archive segment,
+and pickups are summed with np.bincount. Chunks are independent, so they
+can be processed on a thread pool (numpy and SQLite release the GIL).
+
+Per-session results (duration, moves, damage taken, pickups) and per-item
+pickup totals are cached in GAME_ANALYTICS["CACHE_DIR"]/sessions.npz with the
+watermark of the last session included: the (end_time, id) of the most
+recently ended one. A rerun only reads sessions that ended after it, then
+recomputes the summary from the cached arrays, which takes milliseconds.
+
+The reaper ends abandoned sessions at their last heartbeat, up to TIMEOUT +
+INTERVAL seconds in the past (see reaper.py). So a rerun also rereads the
+LOOKBACK seconds before the watermark and skips sessions it already has.
+Sessions ended further back (the reaper catching up after downtime, a clock
+jump) are missed until `--refresh`.
+"""
+
+import os
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+import numpy as np
+from django.conf import settings
+from django.db import connection
+
+from .archive import from_micros, move_archive
+from .models import GameSession, InventoryItem, PlayerMove
+from .reaper import get_config as reaper_config
+
+DEFAULTS = {
+    "CACHE_DIR": None,  # Defaults to BASE_DIR / "analytics"
+    "CHUNK_SIZE": 20000,  # Sessions per chunk
+    "WORKERS": 1,  # Threads processing chunks
+    "LOOKBACK": None,  # Seconds reread before the watermark; defaults to the reaper's TIMEOUT + INTERVAL
+}
+
+CACHE_VERSION = 1
+SURVIVAL_BUCKETS = (0, 30, 60, 120, 300, 600, 1200, 1800, 3600, np.inf)  # Seconds
+SESSION_COLUMNS = ("session_id", "duration", "moves", "damage", "pickups")
+
+
+def get_config():
+    config = {**DEFAULTS, **getattr(settings, "GAME_ANALYTICS", {})}
+    if config["CACHE_DIR"] is None:
+        config["CACHE_DIR"] = Path(settings.BASE_DIR) / "analytics"
+    config["CACHE_DIR"] = Path(config["CACHE_DIR"])
+    if config["LOOKBACK"] is None:
+        reaper = reaper_config()
+        config["LOOKBACK"] = reaper["TIMEOUT"] + reaper["INTERVAL"]
+    return config
+
+
+def _fetch_chunks(queryset, chunk_size):
+    """Rows of `queryset` (a values_list) from a raw cursor, `chunk_size` at a time."""
+    sql, params = queryset.query.sql_with_params()
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params)
+        while True:
+            rows = cursor.fetchmany(chunk_size)
+            if not rows:
+                return
+            yield rows
+
+
+def _drop_known(rows, known):
+    """`rows` minus the sessions whose ids are in `known` (rows reread by the lookback)."""
+    if not len(known):
+        return rows
+    ids = np.fromiter((row[0] for row in rows), np.int64, len(rows))
+    return [row for row, new in zip(rows, (~np.isin(ids, known)).tolist()) if new]
+
+
+def _as_micros(values):
+    return np.array(values, dtype="datetime64[us]").astype(np.int64)
+
+
+class Snapshot:
+    """Per-session analytics columns, per-item pickup totals and the watermark they cover."""
+
+    def __init__(self, columns=None, items=None, watermark=None):
+        self.columns = columns or {
+            "session_id": np.empty(0, np.int64),
+            "duration": np.empty(0, np.float64),
+            "moves": np.empty(0, np.int64),
+            "damage": np.empty(0, np.int64),
+            "pickups": np.empty(0, np.int64),
+        }
+        self.items = items or {}  # item -> total quantity
+        self.watermark = watermark  # (end_time micros, session id) of the last session included
+
+    def __len__(self):
+        return len(self.columns["session_id"])
+
+    @classmethod
+    def load(cls, path):
+        try:
+            with np.load(path) as data:
+                if int(data["version"]) != CACHE_VERSION:
+                    return cls()
+                columns = {name: data[name] for name in SESSION_COLUMNS}
+                items = dict(zip(data["item_names"].tolist(), data["item_totals"].tolist()))
+                watermark = tuple(int(v) for v in data["watermark"]) if len(data["watermark"]) else None
+        except (OSError, KeyError, ValueError):
+            return cls()
+        return cls(columns, items, watermark)
+
+    def save(self, path):
+        path.parent.mkdir(parents=True, exist_ok=True)
+        temporary = path.with_name(f".{path.name}.tmp")
+        with open(temporary, "wb") as handle:
+            np.savez(handle, version=CACHE_VERSION, watermark=np.array(self.watermark or (), np.int64),
+                     item_names=np.array(list(self.items), dtype=str),
+                     item_totals=np.array(list(self.items.values()), np.int64), **self.columns)
+        os.replace(temporary, path)
+
+    def extend(self, columns, items, watermark):
+        self.columns = {name: np.concatenate([self.columns[name], columns[name]]) for name in SESSION_COLUMNS}
+        for item, quantity in items.items():
+            self.items[item] = self.items.get(item, 0) + quantity
+        self.watermark = watermark
+
+
+def session_chunk_stats(rows):
+    """Analytics columns and item totals for one chunk of (id, start_time, end_time, damage_taken) rows."""
+    session_ids, starts, ends, damage = zip(*rows)
+    session_ids = np.array(session_ids, np.int64)
+    order = np.argsort(session_ids)  # searchsorted below needs sorted ids
+    session_ids = session_ids[order]
+    duration = ((_as_micros(ends) - _as_micros(starts)) / 1e6)[order]
+    damage = np.array(damage, np.int64)[order]
+    ids = session_ids.tolist()
+
+    moves = np.zeros(len(session_ids), np.int64)
+    hot = PlayerMove.objects.filter(session_id__in=ids).values_list("session_id")
+    for chunk in _fetch_chunks(hot, 100_000):
+        found, counts = np.unique(np.array(chunk, np.int64).ravel(), return_counts=True)
+        moves[np.searchsorted(session_ids, found)] += counts
+    for segment in move_archive.segments():
+        if not segment.meta.get("deleted"):
+            continue  # Its rows are still (partly) in the hot table, counted above
+        column = segment.column("session_id")
+        moves += np.searchsorted(column, session_ids, side="right") - np.searchsorted(column, session_ids)
+
+    pickups = np.zeros(len(session_ids), np.int64)
+    items = {}
+    inventory = InventoryItem.objects.filter(session_id__in=ids).values_list("session_id", "item", "quantity")
+    for chunk in _fetch_chunks(inventory, 100_000):
+        owners, names, quantities = zip(*chunk)
+        quantities = np.array(quantities, np.int64)
+        pickups += np.bincount(np.searchsorted(session_ids, np.array(owners, np.int64)),
+                               weights=quantities, minlength=len(session_ids)).astype(np.int64)
+        names, codes = np.unique(np.array(names, dtype=str), return_inverse=True)
+        for name, total in zip(names.tolist(), np.bincount(codes, weights=quantities).tolist()):
+            items[name] = items.get(name, 0) + int(total)
+
+    columns = {"session_id": session_ids, "duration": duration, "moves": moves, "damage": damage,
+               "pickups": pickups}
+    return columns, items
+
+
+def collect(snapshot, chunk_size=None, workers=None):
+    """Add the sessions that ended after `snapshot.watermark` (less LOOKBACK). Returns the number added."""
+    config = get_config()
+    chunk_size = chunk_size or config["CHUNK_SIZE"]
+    workers = workers or config["WORKERS"]
+
+    sessions = GameSession.objects.filter(end_time__isnull=False)
+    known = np.empty(0, np.int64)
+    if snapshot.watermark is not None:
+        end_micros = snapshot.watermark[0]
+        sessions = sessions.filter(end_time__gt=from_micros(end_micros - int(config["LOOKBACK"] * 1e6)))
+        known = snapshot.columns["session_id"]
+    sessions = sessions.order_by("end_time", "id").values_list("id", "start_time", "end_time", "damage_taken")
+
+    results = []
+    last = None
+    if workers > 1:
+        with ThreadPoolExecutor(workers, thread_name_prefix="game-analytics") as pool:
+            pending = deque()
+            for chunk in _fetch_chunks(sessions, chunk_size):
+                chunk = _drop_known(chunk, known)
+                if not chunk:
+                    continue
+                last = chunk[-1]
+                pending.append(pool.submit(_chunk_stats_in_thread, chunk))
+                if len(pending) >= workers * 2:  # Bounded read-ahead
+                    results.append(pending.popleft().result())
+            results.extend(future.result() for future in pending)
+    else:
+        for chunk in _fetch_chunks(sessions, chunk_size):
+            chunk = _drop_known(chunk, known)
+            if not chunk:
+                continue
+            last = chunk[-1]
+            results.append(session_chunk_stats(chunk))
+    if last is None:
+        return 0
+
+    columns = {name: np.concatenate([result[0][name] for result in results]) for name in SESSION_COLUMNS}
+    items = {}
+    for _, chunk_items in results:
+        for item, quantity in chunk_items.items():
+            items[item] = items.get(item, 0) + quantity
+    watermark = (int(_as_micros([last[2]])[0]), last[0])
+    snapshot.extend(columns, items, max(watermark, snapshot.watermark or watermark))
+    return len(columns["session_id"])
+
+
+def _chunk_stats_in_thread(rows):
+    try:
+        return session_chunk_stats(rows)
+    finally:
+        connection.close()  # Each pool thread has its own connection
+
+
+def _percentiles(values, qs=(50, 90, 99)):
+    if not len(values):
+        return {f"p{q}": None for q in qs}
+    return {f"p{q}": float(v) for q, v in zip(qs, np.percentile(values, qs))}
+
+
+def summarize(snapshot):
+    """Aggregates over every session in `snapshot`, as a JSON-friendly dict."""
+    columns = snapshot.columns
+    count = len(snapshot)
+    duration = columns["duration"]
+    minutes = duration / 60
+    played = minutes > 0
+    apm = columns["moves"][played] / minutes[played]
+    total_minutes = float(minutes.sum())
+
+    histogram, _ = np.histogram(duration, bins=SURVIVAL_BUCKETS)
+    labels = [f"<{int(edge)}s" for edge in SURVIVAL_BUCKETS[1:-1]] + [f">={int(SURVIVAL_BUCKETS[-2])}s"]
+
+    def mean(values):
+        return float(values.mean()) if len(values) else None
+
+    return {
+        "sessions": count,
+        "survival_seconds": {"mean": mean(duration), **_percentiles(duration),
+                             "histogram": dict(zip(labels, histogram.tolist()))},
+        "actions_per_minute": {"mean": mean(apm), **_percentiles(apm)},
+        "damage_taken": {"mean": mean(columns["damage"]), **_percentiles(columns["damage"]),
+                         "total": int(columns["damage"].sum())},
+        "pickups": {
+            "per_session": mean(columns["pickups"]),
+            "per_minute": float(columns["pickups"].sum()) / total_minutes if total_minutes else None,
+            "by_item": {
+                item: {"total": total, "per_session": total / count if count else None,
+                       "per_minute": total / total_minutes if total_minutes else None}
+                for item, total in sorted(snapshot.items.items(), key=lambda pair: -pair[1])
+            },
+        },
+    }
+
+
+def run(refresh=False, workers=None, chunk_size=None):
+    """Bring the cached snapshot up to date and summarize it. Returns (summary, sessions added)."""
+    path = get_config()["CACHE_DIR"] / "sessions.npz"
+    snapshot = Snapshot() if refresh else Snapshot.load(path)
+    added = collect(snapshot, chunk_size=chunk_size, workers=workers)
+    if added or refresh:
+        snapshot.save(path)
+    return summarize(snapshot), added
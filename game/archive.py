@@ -0,0 +1,313 @@
+# game/archive.py
+"""
+Cold storage for PlayerMove rows of long-finished sessions.
+
+`MoveArchive.archive()` (the archive_moves command) copies the moves of sessions that ended more than
+GAME_MOVE_ARCHIVE["AFTER_DAYS"] days ago into columnar segments under
+GAME_MOVE_ARCHIVE["DIR"], then deletes them from the hot table in small
+batches. A segment is a directory of numpy .npy columns sorted by
+(session_id, timestamp, id):
+
+    id.npy, session_id.npy   int64
+    timestamp.npy            int64 microseconds since the Unix epoch (UTC)
+    action.npy               uint16/uint32 codes into actions.json
+    actions.json             the segment's action dictionary
+    meta.json                row count, id/session/timestamp bounds, deleted flag
+
+Dictionary-encoded actions and fixed-width columns take about a quarter of
+the space the rows take in SQLite (table plus indexes). The columns are stored
+uncompressed so they can be memory-mapped: a read binary-searches
+session_id.npy and touches only the pages of that session's slice.
+
+Crash safety: a segment is written to a temporary directory and renamed into
+place, so it is either complete or absent. If the process dies after the
+rename, before the hot rows are deleted, the next run finishes the delete
+(meta.json "deleted" is false until then). Until that happens the moves exist
+in both places; reads merge the two and drop duplicate ids.
+"""
+
+import heapq
+import json
+import os
+import shutil
+import threading
+from datetime import datetime, timedelta, timezone as dt_timezone
+from pathlib import Path
+
+import numpy as np
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Q
+from django.utils.timezone import now
+
+from .models import GameSession, PlayerMove
+
+DEFAULTS = {
+    "DIR": None,  # Defaults to BASE_DIR / "archive" / "moves"
+    "AFTER_DAYS": 30,  # Archive moves of sessions that ended longer ago than this
+    "SEGMENT_ROWS": 500_000,  # Maximum rows per segment
+    "READ_CHUNK": 5000,  # Rows fetched per query while archiving
+    "DELETE_BATCH": 2000,  # Hot rows deleted per transaction
+}
+
+COLUMNS = ("id", "session_id", "timestamp", "action")
+READ_BLOCK = 10000  # Segment rows decoded at a time
+EPOCH = datetime(1970, 1, 1, tzinfo=dt_timezone.utc)
+ONE_MICROSECOND = timedelta(microseconds=1)
+
+
+def get_config():
+    config = {**DEFAULTS, **getattr(settings, "GAME_MOVE_ARCHIVE", {})}
+    if config["DIR"] is None:
+        config["DIR"] = Path(settings.BASE_DIR) / "archive" / "moves"
+    config["DIR"] = Path(config["DIR"])
+    return config
+
+
+def to_micros(value):
+    return (value - EPOCH) // ONE_MICROSECOND
+
+
+def from_micros(value):
+    return EPOCH + timedelta(microseconds=int(value))
+
+
+class Segment:
+    """A read-only, memory-mapped archive segment."""
+
+    def __init__(self, path):
+        self.path = Path(path)
+        self.meta = json.loads((self.path / "meta.json").read_text())
+        self.actions = json.loads((self.path / "actions.json").read_text())
+        self._columns = {}
+
+    def __len__(self):
+        return self.meta["rows"]
+
+    def column(self, name):
+        array = self._columns.get(name)
+        if array is None:
+            array = self._columns[name] = np.load(self.path / f"{name}.npy", mmap_mode="r")
+        return array
+
+    def covers_session(self, session_id):
+        return self.meta["min_session_id"] <= session_id <= self.meta["max_session_id"]
+
+    def session_moves(self, session_id, after=None):
+        """(id, session_id, timestamp, action) tuples of one session, by (timestamp, id).
+
+        `after` is a (timestamp, id) keyset position to resume from. Rows are
+        decoded READ_BLOCK at a time, so memory stays flat however long the session.
+        """
+        if not self.covers_session(session_id):
+            return
+        sessions = self.column("session_id")
+        lo = int(np.searchsorted(sessions, session_id, side="left"))
+        hi = int(np.searchsorted(sessions, session_id, side="right"))
+        after_micros = after_id = None
+        if after is not None:
+            after_micros, after_id = to_micros(after[0]), after[1]
+            lo += int(np.searchsorted(self.column("timestamp")[lo:hi], after_micros, side="left"))
+        for move in self._rows(lo, hi):
+            if move[2] == after_micros and move[0] <= after_id:
+                continue
+            yield move[0], move[1], from_micros(move[2]), move[3]
+
+    def moves(self):
+        """Every (id, session_id, timestamp, action) of the segment, in its (session_id, timestamp, id) order."""
+        for move_id, session_id, micros, action in self._rows(0, len(self)):
+            yield move_id, session_id, from_micros(micros), action
+
+    def _rows(self, lo, hi):
+        # Rows lo..hi with raw microsecond timestamps, decoded READ_BLOCK at a time.
+        actions = self.actions
+        for start in range(lo, hi, READ_BLOCK):
+            end = min(start + READ_BLOCK, hi)
+            ids = self.column("id")[start:end].tolist()
+            sessions = self.column("session_id")[start:end].tolist()
+            timestamps = self.column("timestamp")[start:end].tolist()
+            codes = self.column("action")[start:end].tolist()
+            for move_id, session_id, micros, code in zip(ids, sessions, timestamps, codes):
+                yield move_id, session_id, micros, actions[code]
+
+    def mark_deleted(self):
+        self.meta["deleted"] = True
+        _write_json(self.path / "meta.json", self.meta)
+
+
+def _write_json(path, value):
+    temporary = path.with_name(f".{path.name}.tmp")
+    temporary.write_text(json.dumps(value))
+    os.replace(temporary, path)
+
+
+class MoveArchive:
+    """The segments under one directory, with session and player reads across hot and archived moves."""
+
+    def __init__(self, directory=None):
+        self._directory = directory
+        self._segments = {}  # name -> Segment
+        self._lock = threading.Lock()
+
+    @property
+    def directory(self):
+        return Path(self._directory) if self._directory is not None else get_config()["DIR"]
+
+    def segments(self):
+        """Every complete segment, oldest first."""
+        directory = self.directory
+        if not directory.is_dir():
+            return []
+        names = sorted(entry.name for entry in os.scandir(directory)
+                       if entry.is_dir() and not entry.name.startswith("."))
+        with self._lock:
+            for name in set(self._segments) - set(names):
+                del self._segments[name]
+            for name in names:
+                if name not in self._segments:
+                    self._segments[name] = Segment(directory / name)
+            return [self._segments[name] for name in names]
+
+    def write_segment(self, ids, session_ids, timestamps, actions):
+        """Write one segment from parallel columns already sorted by (session_id, timestamp, id)."""
+        dictionary, codes = np.unique(np.asarray(actions, dtype=object).astype(str), return_inverse=True)
+        code_type = np.uint16 if len(dictionary) <= np.iinfo(np.uint16).max + 1 else np.uint32
+        columns = {
+            "id": np.asarray(ids, dtype=np.int64),
+            "session_id": np.asarray(session_ids, dtype=np.int64),
+            "timestamp": np.asarray(timestamps, dtype=np.int64),
+            "action": codes.astype(code_type),
+        }
+        meta = {
+            "rows": len(ids),
+            "min_id": int(columns["id"].min()),
+            "max_id": int(columns["id"].max()),
+            "min_session_id": int(columns["session_id"][0]),
+            "max_session_id": int(columns["session_id"][-1]),
+            "min_timestamp": int(columns["timestamp"].min()),
+            "max_timestamp": int(columns["timestamp"].max()),
+            "created": now().isoformat(),
+            "deleted": False,
+        }
+
+        directory = self.directory
+        directory.mkdir(parents=True, exist_ok=True)
+        name = f"{now():%Y%m%dT%H%M%S%f}-{meta['min_id']}-{meta['max_id']}"
+        temporary = directory / f".tmp-{name}"
+        temporary.mkdir()
+        try:
+            for column, array in columns.items():
+                np.save(temporary / f"{column}.npy", array)
+            (temporary / "actions.json").write_text(json.dumps(dictionary.tolist()))
+            (temporary / "meta.json").write_text(json.dumps(meta))
+            os.replace(temporary, directory / name)
+        except BaseException:
+            shutil.rmtree(temporary, ignore_errors=True)
+            raise
+        return Segment(directory / name)
+
+    def session_moves(self, session_id, after=None):
+        """Every move of `session_id`, hot and archived, as (id, session_id, timestamp, action) by (timestamp, id).
+
+        `after` is a (timestamp, id) keyset position; only later moves are returned.
+        """
+        hot = PlayerMove.objects.filter(session_id=session_id)
+        if after is not None:
+            hot = hot.filter(Q(timestamp__gt=after[0]) | Q(timestamp=after[0], id__gt=after[1]))
+        hot = hot.order_by("timestamp", "id").values_list(*COLUMNS).iterator(chunk_size=get_config()["READ_CHUNK"])
+        sources = [segment.session_moves(session_id, after) for segment in self.segments()
+                   if segment.covers_session(session_id)]
+        if not sources:
+            yield from hot
+            return
+        last_id = None
+        for move in heapq.merge(hot, *sources, key=lambda move: (move[2], move[0])):
+            if move[0] != last_id:  # Present in a segment and (until its delete finishes) the hot table
+                last_id = move[0]
+                yield move
+
+    def all_moves(self):
+        """Every move, hot and archived, as (id, session_id, timestamp, action) by (session_id, timestamp, id)."""
+        hot = (PlayerMove.objects.order_by("session_id", "timestamp", "id").values_list(*COLUMNS)
+               .iterator(chunk_size=get_config()["READ_CHUNK"]))
+        sources = [segment.moves() for segment in self.segments()]
+        if not sources:
+            yield from hot
+            return
+        last_id = None
+        for move in heapq.merge(hot, *sources, key=lambda move: (move[1], move[2], move[0])):
+            if move[0] != last_id:
+                last_id = move[0]
+                yield move
+
+    def player_moves(self, player):
+        """Every move of `player`, session by session in start order."""
+        session_ids = (GameSession.objects.filter(player=player).order_by("start_time", "id")
+                       .values_list("id", flat=True))
+        for session_id in list(session_ids):
+            yield from self.session_moves(session_id)
+
+    def archive(self, older_than_days=None, session_ids=None):
+        """Move the moves of sessions that ended before the cutoff into new segments.
+
+        `session_ids` restricts the run to those sessions. Returns (rows archived, segments written).
+        """
+        config = get_config()
+        days = config["AFTER_DAYS"] if older_than_days is None else older_than_days
+        self.finish_deletes()
+
+        cutoff = now() - timedelta(days=days)
+        eligible = PlayerMove.objects.filter(session__end_time__lt=cutoff)
+        if session_ids is not None:
+            eligible = eligible.filter(session_id__in=session_ids)
+        eligible = eligible.order_by("session_id", "timestamp", "id")
+        archived = written = 0
+        chunks = []
+        buffered = 0
+        after = None
+        while True:
+            # Keyset pages: nothing stays open on the table while _seal() deletes from it.
+            page = eligible
+            if after is not None:
+                session_id, timestamp, move_id = after
+                page = page.filter(Q(session_id__gt=session_id)
+                                   | Q(session_id=session_id, timestamp__gt=timestamp)
+                                   | Q(session_id=session_id, timestamp=timestamp, id__gt=move_id))
+            rows = list(page.values_list(*COLUMNS)[:config["READ_CHUNK"]])
+            if rows:
+                after = (rows[-1][1], rows[-1][2], rows[-1][0])
+                ids, session_ids, timestamps, actions = zip(*rows)
+                chunks.append((np.array(ids, dtype=np.int64), np.array(session_ids, dtype=np.int64),
+                               np.array([to_micros(t) for t in timestamps], dtype=np.int64), actions))
+                buffered += len(rows)
+            if buffered and (buffered >= config["SEGMENT_ROWS"] or not rows):
+                archived += self._seal(chunks)
+                written += 1
+                chunks, buffered = [], 0
+            if not rows:
+                return archived, written
+
+    def _seal(self, chunks):
+        ids, session_ids, timestamps, actions = zip(*chunks)
+        segment = self.write_segment(np.concatenate(ids), np.concatenate(session_ids),
+                                     np.concatenate(timestamps), [a for part in actions for a in part])
+        self._delete_hot(segment)
+        return len(segment)
+
+    def finish_deletes(self):
+        """Delete hot rows of segments whose delete was interrupted."""
+        for segment in self.segments():
+            segment.meta = json.loads((segment.path / "meta.json").read_text())
+            if not segment.meta["deleted"]:
+                self._delete_hot(segment)
+
+    def _delete_hot(self, segment):
+        batch = get_config()["DELETE_BATCH"]
+        ids = segment.column("id")
+        for start in range(0, len(ids), batch):
+            with transaction.atomic():  # Short transactions keep the write lock free for live traffic
+                PlayerMove.objects.filter(id__in=ids[start:start + batch].tolist()).delete()
+        segment.mark_deleted()
+
+
+move_archive = MoveArchive()
@@ -0,0 +1,92 @@
+# game/background.py
+
+import atexit
+import logging
+import os
+import threading
+
+from django.conf import settings
+from django.db import close_old_connections
+
+logger = logging.getLogger(__name__)
+
+_workers = []
+_workers_lock = threading.Lock()
+
+
+class PeriodicWorker:
+    """Runs `func` on a daemon thread every `interval` seconds.
+
+    The thread is started lazily, once per process, so workers forked by
+    gunicorn get their own thread. Nothing is started when
+    GAME_BACKGROUND_WORKERS is off (e.g. under `manage.py test`); callers
+    then drain their buffers explicitly. On shutdown `func` runs one last
+    time so nothing buffered is left behind.
+    """
+
+    def __init__(self, name, func, interval):
+        self.name = name
+        self.func = func
+        self.interval = interval
+        self._lock = threading.Lock()
+        self._thread = None
+        self._pid = None
+        self._stop = threading.Event()
+        self._wake = threading.Event()
+
+    def _running(self):
+        return self._thread is not None and self._pid == os.getpid() and self._thread.is_alive()
+
+    def ensure_started(self):
+        """Start the thread for this process if it is not running yet."""
+        if not getattr(settings, "GAME_BACKGROUND_WORKERS", True) or not self.interval:
+            return
+        if self._running():
+            return
+        with self._lock:
+            if self._running():
+                return
+            self._stop = threading.Event()
+            self._wake = threading.Event()
+            self._pid = os.getpid()
+            self._thread = threading.Thread(target=self._run, name=self.name, daemon=True)
+            self._thread.start()
+        with _workers_lock:
+            if self not in _workers:
+                _workers.append(self)
+
+    def wake(self):
+        """Run the next iteration now instead of waiting for the interval."""
+        self._wake.set()
+
+    def stop(self, timeout=10):
+        """Stop the thread after a final run of `func`."""
+        if not self._running():
+            return
+        self._stop.set()
+        self._wake.set()
+        self._thread.join(timeout)
+
+    def _run(self):
+        while not self._stop.is_set():
+            self._wake.wait(self.interval)
+            self._wake.clear()
+            self.run_once()
+        self.run_once()
+
+    def run_once(self):
+        try:
+            self.func()
+        except Exception:
+            logger.exception("Background worker %s failed", self.name)
+        finally:
+            close_old_connections()
+
+
+@atexit.register
+def stop_all_workers():
+    """Drain every running worker, e.g. when a gunicorn worker exits."""
+    with _workers_lock:
+        workers = list(_workers)
+    for worker in workers:
+        worker.stop()
@@ -0,0 +1,57 @@
+# game/bench.py
+"""Helpers shared by the bench_* management commands."""
+
+import time
+import uuid
+from contextlib import contextmanager
+
+from django.contrib.auth import get_user_model
+
+
+@contextmanager
+def bench_players(count=1):
+    """Create throwaway players for a benchmark and delete them (and their games) afterwards."""
+    User = get_user_model()
+    tag = uuid.uuid4().hex[:8]
+    users = [User.objects.create_user(username=f"bench_{tag}_{i}") for i in range(count)]
+    try:
+        yield users
+    finally:
+        User.objects.filter(pk__in=[u.pk for u in users]).delete()
+
+
+class Stopwatch:
+    """Context manager measuring wall time in seconds."""
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        self.elapsed = 0.0
+        return self
+
+    def __exit__(self, *exc):
+        self.elapsed = time.perf_counter() - self.start
+
+
+def rate(count, seconds):
+    return count / seconds if seconds else float("inf")
+
+
+def percentile(sorted_values, q):
+    """Nearest-rank percentile (0 < q <= 100) of an already sorted list."""
+    if not sorted_values:
+        return None
+    rank = max(1, -(-len(sorted_values) * q // 100))
+    return sorted_values[int(rank) - 1]
+
+
+def summarize(latencies, elapsed):
+    """Throughput and latency percentiles (in milliseconds) for one endpoint."""
+    ordered = sorted(latencies)
+    return {
+        "requests": len(ordered),
+        "throughput": round(rate(len(ordered), elapsed), 2),
+        "p50_ms": round(percentile(ordered, 50) * 1000, 3) if ordered else None,
+        "p95_ms": round(percentile(ordered, 95) * 1000, 3) if ordered else None,
+        "p99_ms": round(percentile(ordered, 99) * 1000, 3) if ordered else None,
+        "max_ms": round(ordered[-1] * 1000, 3) if ordered else None,
+    }
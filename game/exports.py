@@ -0,0 +1,95 @@
+# game/exports.py
+"""
+Streaming CSV and NDJSON exports of whole tables for the admin dashboard.
+
+Each dataset is a list of column names and a generator of row tuples.
+Rows come from a server-side cursor (`values_list(...).iterator(chunk_size=...)`)
+and player names are joined in SQL (`player__username`), so there is one
+query per dataset rather than one per row. Archived moves are merged in from
+their segments (see archive.py). `stream()` encodes LINES_PER_CHUNK rows at a
+time, so memory use stays flat however large the table, under WSGI and ASGI
+alike (see mygame/streaming.py).
+"""
+
+import csv
+import json
+from datetime import datetime
+
+from django.contrib.auth import get_user_model
+
+from .archive import move_archive
+from .models import GameSession, Leaderboard
+
+READ_CHUNK = 5000  # Rows fetched per round trip
+LINES_PER_CHUNK = 1000  # Rows encoded into one chunk of the streaming response
+CONTENT_TYPES = {"csv": "text/csv; charset=utf-8", "ndjson": "application/x-ndjson"}
+
+
+def _sessions():
+    return (GameSession.objects.order_by("id")
+            .values_list("id", "player_id", "player__username", "start_time", "end_time", "score", "health",
+                         "damage_taken", "last_seen")
+            .iterator(chunk_size=READ_CHUNK))
+
+
+def _leaderboard():
+    rows = (Leaderboard.objects.order_by("-best_score", "player")
+            .values_list("player_id", "player__username", "best_score")
+            .iterator(chunk_size=READ_CHUNK))
+    for rank, row in enumerate(rows, 1):
+        yield (rank, *row)  # Row number, not the competition rank the leaderboard endpoints report
+
+
+def _users():
+    return (get_user_model().objects.order_by("id")
+            .values_list("id", "username", "role", "is_active", "date_joined", "last_login")
+            .iterator(chunk_size=READ_CHUNK))
+
+
+DATASETS = {
+    "sessions": (("id", "player_id", "player", "start_time", "end_time", "score", "health", "damage_taken",
+                  "last_seen"), _sessions),
+    "moves": (("id", "session_id", "timestamp", "action"), move_archive.all_moves),
+    "leaderboard": (("position", "player_id", "player", "best_score"), _leaderboard),
+    "users": (("id", "username", "role", "is_active", "date_joined", "last_login"), _users),
+}
+
+
+class _Lines:
+    """File-like target for csv.writer appending each written line to `lines`."""
+
+    def __init__(self, lines):
+        self.lines = lines
+
+    def write(self, line):
+        self.lines.append(line)
+
+
+def _plain(value):
+    return value.isoformat() if isinstance(value, datetime) else value
+
+
+def stream(dataset, file_type, lines_per_chunk=None):
+    """Yield `dataset` (a DATASETS key) encoded as `file_type` ("csv" or "ndjson") in chunks of bytes."""
+    lines_per_chunk = lines_per_chunk or LINES_PER_CHUNK
+    columns, rows = DATASETS[dataset]
+    lines = []
+    if file_type == "csv":
+        writer = csv.writer(_Lines(lines))
+        writer.writerow(columns)
+
+        def encode(row):
+            writer.writerow([_plain(value) for value in row])
+    else:
+        dumps = json.JSONEncoder(ensure_ascii=False, separators=(",", ":")).encode
+
+        def encode(row):
+            lines.append(dumps({column: _plain(value) for column, value in zip(columns, row)}) + "\n")
+
+    for row in rows():
+        encode(row)
+        if len(lines) >= lines_per_chunk:
+            yield "".join(lines).encode()
+            lines.clear()
+    if lines:
+        yield "".join(lines).encode()
@@ -0,0 +1,139 @@
+# game/ingest.py
+"""
+Buffered, append-only ingestion of PlayerMove rows.
+
+`log_move` validates the session, puts an unsaved PlayerMove on a bounded
+in-process queue and returns 202 straight away. A background writer drains the
+queue with `bulk_create`, BATCH_SIZE rows at a time, every FLUSH_INTERVAL
+seconds or as soon as a full batch is waiting. `end_game` writes the ending
+session's queued moves itself (`flush_session`), so they are stored before it
+is marked ended (analytics counts a session's moves once, when it ends). It
+leaves the rest of the queue to the writer, so ending a game costs the same
+however many moves other players have queued. When the queue is full the
+request waits up to ENQUEUE_TIMEOUT for room and is otherwise refused, so a
+slow disk pushes back on clients instead of growing memory. The writer drains
+whatever is queued when the process exits.
+"""
+
+import logging
+import queue
+import threading
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.utils.timezone import now
+
+from mygame.metrics import register_collector
+
+from .background import PeriodicWorker
+from .models import PlayerMove
+from .rollups import activity_rollups
+
+logger = logging.getLogger(__name__)
+
+DEFAULTS = {
+    "BATCH_SIZE": 500,  # Rows per bulk_create
+    "FLUSH_INTERVAL": 0.5,  # Seconds between drains of a partial batch
+    "MAX_QUEUE": 50000,  # Moves buffered before clients are pushed back
+    "ENQUEUE_TIMEOUT": 0.05,  # Seconds a request may wait for room in a full queue
+}
+
+
+def get_config():
+    return {**DEFAULTS, **getattr(settings, "GAME_MOVE_INGEST", {})}
+
+
+class MoveIngestor:
+    """Bounded queue of PlayerMove rows drained in batches by a writer thread."""
+
+    def __init__(self, batch_size=None, max_queue=None, flush_interval=None):
+        config = get_config()
+        self.batch_size = batch_size or config["BATCH_SIZE"]
+        self.enqueue_timeout = config["ENQUEUE_TIMEOUT"]
+        self._queue = queue.Queue(maxsize=max_queue or config["MAX_QUEUE"])
+        self.writer = PeriodicWorker(
+            "game-move-writer", self.drain,
+            flush_interval if flush_interval is not None else config["FLUSH_INTERVAL"],
+        )
+        self.dropped = 0
+        self._drain_lock = threading.Lock()  # Held from taking a batch until it is written
+
+    def __len__(self):
+        return self._queue.qsize()
+
+    def submit(self, session_id, action, timestamp=None):
+        """Queue a move. Returns False if the queue stayed full (caller should back off)."""
+        move = PlayerMove(session_id=session_id, action=action, timestamp=timestamp or now())
+        self.writer.ensure_started()
+        try:
+            self._queue.put_nowait(move)
+        except queue.Full:
+            self.writer.wake()
+            try:
+                self._queue.put(move, timeout=self.enqueue_timeout)
+            except queue.Full:
+                return False
+        if self._queue.qsize() >= self.batch_size:
+            self.writer.wake()
+        return True
+
+    def drain(self):
+        """Write everything currently queued. Returns the number of rows written."""
+        written = 0
+        while True:
+            with self._drain_lock:  # So a drain returns only once batches taken by others are written too
+                batch = []
+                try:
+                    while len(batch) < self.batch_size:
+                        batch.append(self._queue.get_nowait())
+                except queue.Empty:
+                    pass
+                if not batch:
+                    return written
+                written += self._write(batch)
+
+    def flush_session(self, session_id):
+        """Write the queued moves of `session_id`, leaving the others queued. Returns the number of rows written."""
+        with self._drain_lock:  # Also waits for a batch the writer has taken but not written yet
+            with self._queue.mutex:
+                pending = self._queue.queue
+                moves = [move for move in pending if move.session_id == session_id]
+                if moves:
+                    others = [move for move in pending if move.session_id != session_id]
+                    pending.clear()
+                    pending.extend(others)
+                    self._queue.not_full.notify(len(moves))
+            return sum(self._write(moves[i:i + self.batch_size]) for i in range(0, len(moves), self.batch_size))
+
+    def _write(self, batch):
+        try:
+            with transaction.atomic():
+                PlayerMove.objects.bulk_create(batch)
+            activity_rollups.add_moves(move.timestamp for move in batch)
+            return len(batch)
+        except IntegrityError:
+            # A session was deleted while its moves were queued; keep the rest.
+            written = 0
+            for move in batch:
+                move.pk = None
+                try:
+                    with transaction.atomic():
+                        move.save(force_insert=True)
+                    activity_rollups.add(move.timestamp, moves=1)
+                    written += 1
+                except IntegrityError:
+                    self.dropped += 1
+                    logger.warning("Dropped move for missing session %s", move.session_id)
+            return written
+
+
+move_ingestor = MoveIngestor()
+
+
+@register_collector
+def move_ingest_metrics():
+    return [
+        ("game_move_queue_depth", "gauge", "PlayerMove rows waiting to be written.", (), len(move_ingestor)),
+        ("game_moves_dropped_total", "counter", "Queued moves dropped because their session vanished.", (),
+         move_ingestor.dropped),
+    ]
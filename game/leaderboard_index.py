@@ -0,0 +1,179 @@
+# game/leaderboard_index.py
+"""
+In-memory ranked index over the Leaderboard table.
+
+Players are kept in a SortedList keyed by (-best_score, player_id), so the
+top N, keyset pages, a player's rank and the players around it are all
+O(log n) lookups plus the size of the answer. The index is built from the
+database on first use and updated in place when `end_game` improves a best
+score. Other worker processes pick up those changes when their copy is
+rebuilt, every GAME_LEADERBOARD_INDEX["RELOAD_INTERVAL"] seconds.
+
+`top_version()` versions the TOP_N best entries (the leaderboard page) with
+a digest of their contents. It changes only when a submitted score or a
+reload changes the top, so a cache key or ETag built on it always matches
+the entries this process serves. Each worker process keeps its own index,
+so workers agree on the version only while their copies agree. A worker
+that has not yet reloaded since another one changed the top keeps serving
+and validating the previous top, for at most RELOAD_INTERVAL seconds. There
+is no shared "changed at" time, which is why the leaderboard page sends no
+Last-Modified.
+"""
+
+import hashlib
+import threading
+import time
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from sortedcontainers import SortedList
+
+from .models import Leaderboard
+
+DEFAULTS = {
+    "RELOAD_INTERVAL": 60,  # Seconds before the index is rebuilt from the database
+}
+
+TOP_N = 10  # Entries covered by top_version()
+
+
+def get_config():
+    return {**DEFAULTS, **getattr(settings, "GAME_LEADERBOARD_INDEX", {})}
+
+
+def make_cursor(entry):
+    """Opaque keyset cursor pointing just after `entry`."""
+    return f"{entry.best_score}:{entry.player_id}"
+
+
+def parse_cursor(cursor):
+    """Inverse of make_cursor. Raises ValueError on garbage."""
+    score, player_id = cursor.split(":")
+    return (-int(score), int(player_id))
+
+
+class LeaderboardIndex:
+    """Sorted (score, player) index with rank lookups."""
+
+    def __init__(self):
+        self._keys = SortedList()  # (-best_score, player_id)
+        self._players = {}  # player_id -> (best_score, username)
+        self._ids_by_name = {}  # username -> player_id
+        self._lock = threading.RLock()
+        self._loaded_at = None
+        self._top = None  # ((best_score, player_id, username), ...) of the TOP_N best
+        self._top_version = None
+
+    def __len__(self):
+        self.ensure_loaded()
+        return len(self._keys)
+
+    def ensure_loaded(self):
+        loaded_at = self._loaded_at
+        if loaded_at is None or time.monotonic() - loaded_at > get_config()["RELOAD_INTERVAL"]:
+            self.load()
+
+    def load(self):
+        """(Re)build the index from the Leaderboard table."""
+        rows = Leaderboard.objects.values_list("player_id", "best_score", "player__username")
+        players = {}
+        ids_by_name = {}
+        for player_id, best_score, username in rows.iterator(chunk_size=5000):
+            players[player_id] = (best_score, username)
+            ids_by_name[username] = player_id
+        keys = SortedList((-score, player_id) for player_id, (score, _) in players.items())
+        with self._lock:
+            self._keys, self._players, self._ids_by_name = keys, players, ids_by_name
+            self._loaded_at = time.monotonic()
+            self._refresh_top()
+
+    def invalidate(self):
+        self._loaded_at = None
+
+    def submit(self, player, score):
+        """Record `score` for `player`. Returns True if it improved their best score."""
+        self.ensure_loaded()
+        with self._lock:
+            current = self._players.get(player.pk)
+            if current is not None and score <= current[0]:
+                return False
+            # Keys sort best first: the new score reaches the top if it sorts before the last top key.
+            last_top = self._keys[TOP_N - 1] if len(self._keys) >= TOP_N else None
+            touches_top = last_top is None or (-score, player.pk) <= last_top
+            if current is not None:
+                self._keys.remove((-current[0], player.pk))
+            self._keys.add((-score, player.pk))
+            self._players[player.pk] = (score, player.username)
+            self._ids_by_name[player.username] = player.pk
+            if touches_top:
+                self._refresh_top()
+            return True
+
+    def _refresh_top(self):
+        # Caller holds self._lock.
+        top = tuple((-key[0], key[1], self._players[key[1]][1]) for key in self._keys.islice(0, TOP_N))
+        if top != self._top:
+            self._top = top
+            self._top_version = hashlib.blake2b(repr(top).encode(), digest_size=8).hexdigest()
+
+    def top_version(self):
+        """Digest of the TOP_N best entries."""
+        self.ensure_loaded()
+        with self._lock:
+            return self._top_version
+
+    def _entry(self, key):
+        score, username = self._players[key[1]]
+        User = get_user_model()
+        return Leaderboard(player=User(id=key[1], username=username), best_score=score)
+
+    def _rank_of_score(self, score):
+        # Competition ranking: tied players share the better rank.
+        return self._keys.bisect_left((-score, float("-inf"))) + 1
+
+    def top(self, limit=10):
+        """The `limit` best entries as unsaved Leaderboard objects."""
+        return self.page(limit=limit)[0]
+
+    def page(self, after=None, limit=50):
+        """Entries after keyset cursor `after`, and the cursor of the next page (or None)."""
+        self.ensure_loaded()
+        with self._lock:
+            start = 0 if after is None else self._keys.bisect_right(parse_cursor(after))
+            keys = list(self._keys.islice(start, start + limit))
+            entries = [self._entry(key) for key in keys]
+            has_more = start + limit < len(self._keys)
+        next_cursor = make_cursor(entries[-1]) if entries and has_more else None
+        return entries, next_cursor
+
+    def player_id(self, username):
+        self.ensure_loaded()
+        return self._ids_by_name.get(username)
+
+    def rank(self, player_id):
+        """(rank, entry) for `player_id`, or None if they have no score yet."""
+        self.ensure_loaded()
+        with self._lock:
+            current = self._players.get(player_id)
+            if current is None:
+                return None
+            return self._rank_of_score(current[0]), self._entry((-current[0], player_id))
+
+    def around(self, player_id, radius=5):
+        """Up to `radius` entries either side of `player_id`, with their ranks."""
+        self.ensure_loaded()
+        with self._lock:
+            current = self._players.get(player_id)
+            if current is None:
+                return []
+            position = self._keys.index((-current[0], player_id))
+            start = max(0, position - radius)
+            keys = self._keys.islice(start, position + radius + 1)
+            return [(self._rank_of_score(-key[0]), self._entry(key)) for key in keys]
+
+    def ranks(self, entries):
+        with self._lock:
+            return [self._rank_of_score(entry.best_score) for entry in entries]
+
+
+leaderboard_index = LeaderboardIndex()
@@ -0,0 +1,317 @@
+# game/live_state.py
+"""
+Write-behind store for the mutable state of active game sessions.
+
+`enemy_attack` and `collect_item` mutate a `LiveSession` held in process
+memory instead of loading and saving a `GameSession` row per request. Dirty
+sessions are written back with one `bulk_update` per batch (plus one
+InventoryItem counter upsert) by a background flusher every
+GAME_LIVE_STATE["FLUSH_INTERVAL"] seconds.
+
+Crash safety: a hard crash loses at most FLUSH_INTERVAL seconds of health and
+inventory changes. Heartbeats only mark a session dirty once its last_seen is
+LAST_SEEN_INTERVAL seconds ahead of the stored value, so an idle but
+connected player costs one row write per interval, not one per heartbeat. Everything else is written synchronously: game over
+(health reaching 0), `end_game`, eviction of a dirty session, and process
+shutdown (the flusher drains on exit).
+
+The store is per process. Run it behind session affinity (one worker serves a
+given session, e.g. `gunicorn --workers 1 --threads N`, or sticky routing);
+otherwise set MAX_SESSIONS to 0, which turns it into a write-through cache.
+"""
+
+import sys
+import threading
+import time
+from collections import Counter, OrderedDict
+
+from django.conf import settings
+from django.db import transaction
+from django.utils.timezone import now
+
+from .background import PeriodicWorker
+from .models import GameSession, InventoryItem
+
+DEFAULTS = {
+    "MAX_SESSIONS": 10000,  # Sessions held in memory before LRU eviction
+    "IDLE_TIMEOUT": 300,  # Seconds without activity before a session is dropped
+    "FLUSH_INTERVAL": 2,  # Seconds between write-behind flushes
+    "BATCH_SIZE": 500,  # Rows per bulk_update
+    "LAST_SEEN_INTERVAL": 30,  # Seconds a heartbeat may go unpersisted
+}
+
+PERSISTED_FIELDS = ["health", "damage_taken", "last_seen"]  # Not score: only end_game sets it
+
+
+def get_config():
+    return {**DEFAULTS, **getattr(settings, "GAME_LIVE_STATE", {})}
+
+
+class LiveSession:
+    """In-memory copy of a GameSession's mutable fields.
+
+    The stored inventory is read once, when the session is loaded; `items`
+    then tracks it in memory. Pickups also accumulate in `pending_items`,
+    which are written as counter increments.
+
+    While the session is simulated by a TickEngine (see ticks.py), `health`
+    and `damage_taken` live in the engine's arrays and `lock` is the engine's
+    lock, so actions and ticks never interleave on the same session.
+    """
+
+    __slots__ = ("session_id", "player_id", "_health", "score", "_damage_taken", "start_time", "last_seen",
+                 "persisted_seen", "items", "pending_items", "dirty", "last_touched", "lock", "engine", "slot")
+
+    def __init__(self, session_id, player_id, health, score, damage_taken=0, start_time=None, last_seen=None,
+                 items=None):
+        self.session_id = session_id
+        self.player_id = player_id
+        self.engine = None
+        self.slot = None
+        self._health = health
+        self.score = score
+        self._damage_taken = damage_taken
+        self.start_time = start_time
+        self.last_seen = self.persisted_seen = last_seen or now()
+        self.items = Counter(items or {})
+        self.pending_items = Counter()
+        self.dirty = False
+        self.last_touched = time.monotonic()
+        self.lock = threading.Lock()
+
+    @property
+    def health(self):
+        engine = self.engine
+        return self._health if engine is None else int(engine.health[self.slot])
+
+    @health.setter
+    def health(self, value):
+        engine = self.engine
+        if engine is None:
+            self._health = value
+        else:
+            engine.set_health(self.slot, value)
+
+    @property
+    def damage_taken(self):
+        engine = self.engine
+        return self._damage_taken if engine is None else int(engine.damage_taken[self.slot])
+
+    @damage_taken.setter
+    def damage_taken(self, value):
+        engine = self.engine
+        if engine is None:
+            self._damage_taken = value
+        else:
+            engine.set_damage_taken(self.slot, value)
+
+    def is_alive(self):
+        """Check if player is still alive."""
+        return self.health > 0
+
+    def survival_time(self):
+        """Seconds since the game started, by the server's clock."""
+        return (now() - self.start_time).total_seconds()
+
+    def heartbeat(self):
+        """Record that the player is still there. Returns True when last_seen is due to be written."""
+        with self.lock:
+            self.last_seen = now()
+            if (self.last_seen - self.persisted_seen).total_seconds() >= get_config()["LAST_SEEN_INTERVAL"]:
+                self.dirty = True
+            return self.dirty
+
+    def take_damage(self, damage):
+        """Reduce player health."""
+        with self.lock:
+            self.health = max(0, self.health - damage)
+            self.damage_taken += damage
+            self.dirty = True
+
+    def heal(self, amount, max_health=100):
+        """Restore player health, capped at `max_health`."""
+        with self.lock:
+            self.health = min(max_health, self.health + amount)
+            self.dirty = True
+
+    def collect_item(self, item, quantity=1):
+        """Add item to inventory."""
+        with self.lock:
+            self.items[item] += quantity
+            self.pending_items[item] += quantity
+            self.dirty = True
+
+    def get_inventory(self):
+        """Inventory as {item: quantity}, including pickups not yet written."""
+        with self.lock:
+            return dict(self.items)
+
+    def checkpoint(self, force=False):
+        """Take the state to persist: (unsaved GameSession, item increments), or None if it is not dirty."""
+        with self.lock:
+            if not (self.dirty or force):
+                return None  # Written (or finished) since the caller picked it
+            self.dirty = False
+            pending, self.pending_items = self.pending_items, Counter()
+            self.persisted_seen = self.last_seen
+            return GameSession(id=self.session_id, health=self.health,
+                               damage_taken=self.damage_taken, last_seen=self.last_seen), pending
+
+    def restore(self, pending):
+        """Put back item increments whose write failed."""
+        with self.lock:
+            self.pending_items.update(pending)
+            self.dirty = True
+
+
+class LiveSessionStore:
+    """Bounded LRU of LiveSession objects with a write-behind flusher."""
+
+    def __init__(self):
+        self._sessions = OrderedDict()
+        self._pins = Counter()  # session_id -> open connections holding it resident
+        self._lock = threading.Lock()
+        self.flusher = PeriodicWorker("game-live-state-flusher", self.flush,
+                                      get_config()["FLUSH_INTERVAL"])
+
+    def __len__(self):
+        return len(self._sessions)
+
+    def get(self, session_id, player):
+        """Return the live state of `player`'s session, or None if it is not theirs or has ended."""
+        try:
+            session_id = int(session_id)
+        except (TypeError, ValueError):
+            return None
+        with self._lock:
+            live = self._sessions.get(session_id)
+            if live is not None:
+                self._sessions.move_to_end(session_id)
+        if live is None:
+            live = _simulated(session_id)
+        if live is None:
+            row = (GameSession.objects.filter(id=session_id, player=player, end_time__isnull=True)
+                   .values_list("id", "player_id", "health", "score", "damage_taken", "start_time", "last_seen")
+                   .first())
+            if row is None:
+                return None
+            items = InventoryItem.objects.filter(session_id=session_id).values_list("item", "quantity")
+            live = LiveSession(*row, items=dict(items))
+            live = self._insert(live)
+        if live.player_id != player.pk:
+            return None
+        live.last_touched = time.monotonic()
+        return live
+
+    def _insert(self, live):
+        max_sessions = get_config()["MAX_SESSIONS"]
+        if max_sessions <= 0:
+            return live
+        evicted = []
+        with self._lock:
+            existing = self._sessions.get(live.session_id)
+            if existing is not None:
+                return existing
+            self._sessions[live.session_id] = live
+            excess = len(self._sessions) - max_sessions
+            if excess > 0:
+                victims = []
+                for key, candidate in self._sessions.items():  # Least recently used first
+                    if key not in self._pins and candidate.engine is None:
+                        victims.append(key)
+                        if len(victims) == excess:
+                            break
+                evicted = [self._sessions.pop(key) for key in victims]
+        self._write([s for s in evicted if s.dirty])
+        return live
+
+    def pin(self, live):
+        """Keep `live` resident (exempt from eviction) until unpin(), e.g. for a WebSocket's lifetime."""
+        with self._lock:
+            self._pins[live.session_id] += 1
+
+    def unpin(self, live):
+        with self._lock:
+            self._pins[live.session_id] -= 1
+            if self._pins[live.session_id] <= 0:
+                del self._pins[live.session_id]
+
+    def commit(self, live):
+        """Called after mutating `live`; decides between write-behind and write-through."""
+        if live.is_alive() and live.session_id in self._sessions:
+            self.flusher.ensure_started()
+        else:
+            self._write([live])
+
+    def sync_last_seen(self, session_ids, since):
+        """Write the heartbeats held here for `session_ids` that are newer than `since`. Returns their ids."""
+        with self._lock:
+            fresh = [self._sessions[key] for key in session_ids
+                     if key in self._sessions and self._sessions[key].last_seen >= since]
+        self._write(fresh, force=True)  # A fresh heartbeat need not have made the session dirty
+        return {live.session_id for live in fresh}
+
+    def finish(self, session_id):
+        """Remove a session (e.g. at end_game), write it back and return its live state, if any."""
+        with self._lock:
+            live = self._sessions.pop(session_id, None)
+        if live is None:
+            live = _simulated(session_id)  # Not kept here (MAX_SESSIONS = 0) but still ticking
+        if live is not None:
+            if live.engine is not None:
+                live.engine.unregister(live)
+            self._write([live])
+        return live
+
+    def flush(self):
+        """Write every dirty session back and drop idle ones."""
+        idle_before = time.monotonic() - get_config()["IDLE_TIMEOUT"]
+        with self._lock:
+            dirty = [s for s in self._sessions.values() if s.dirty]
+            idle = [key for key, s in self._sessions.items() if s.last_touched < idle_before]
+        self._write(dirty)
+        with self._lock:
+            for key in idle:
+                live = self._sessions.get(key)
+                if (live is not None and not live.dirty and live.last_touched < idle_before
+                        and key not in self._pins and live.engine is None):
+                    del self._sessions[key]
+        return len(dirty)
+
+    def clear(self):
+        """Flush and forget every session."""
+        self.flush()
+        with self._lock:
+            self._sessions.clear()
+
+    def _write(self, sessions, force=False):
+        checkpoints = []
+        for live in sessions:
+            checkpoint = live.checkpoint(force)
+            if checkpoint is not None:
+                checkpoints.append((live,) + checkpoint)
+        if not checkpoints:
+            return
+        increments = [(live.session_id, item, quantity)
+                      for live, _, pending in checkpoints for item, quantity in pending.items()]
+        try:
+            with transaction.atomic():
+                GameSession.objects.bulk_update(
+                    [row for _, row, _ in checkpoints], PERSISTED_FIELDS,
+                    batch_size=get_config()["BATCH_SIZE"],
+                )
+                if increments:
+                    InventoryItem.objects.add_items(increments)
+        except Exception:
+            for live, _, pending in checkpoints:
+                live.restore(pending)
+            raise
+
+
+def _simulated(session_id):
+    """The tick engine's LiveSession for `session_id`, if the engine is loaded and simulates it."""
+    ticks = sys.modules.get("game.ticks")  # Imported only once the engine is enabled
+    return ticks.tick_engine.get(session_id) if ticks is not None else None
+
+
+live_sessions = LiveSessionStore()
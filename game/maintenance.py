@@ -0,0 +1,143 @@
+# game/maintenance.py
+"""
+Batched cleanup of the tables that grow without bound.
+
+* django_session: every login leaves a row, and SESSION_SAVE_EVERY_REQUEST
+  keeps sliding them forward, so rows of players who never come back
+  accumulate. Expired rows are deleted BATCH_SIZE at a time.
+* game_gamesession: games whose tab was closed stay open (end_time NULL).
+  They are ended by the session reaper (reaper.py), one batch per call.
+
+Every batch is its own short transaction, and a Throttle sleeps between
+batches so cleanup holds SQLite's write lock for at most DUTY_CYCLE of the
+wall time. Live traffic waits for at most one batch, never for the whole
+cleanup. Run it with `manage.py cleanup` (from cron, or with --every), or
+in-process on a background thread by setting GAME_MAINTENANCE["INTERVAL"].
+"""
+
+import logging
+import time
+
+from django.conf import settings
+from django.contrib.sessions.models import Session
+from django.db import transaction
+from django.utils.timezone import now
+
+from .background import PeriodicWorker
+from .reaper import reap_stale_sessions
+
+logger = logging.getLogger(__name__)
+
+DEFAULTS = {
+    "INTERVAL": 0,  # Seconds between in-process runs; 0 leaves cleanup to `manage.py cleanup`
+    "BATCH_SIZE": 500,  # Rows per transaction
+    "DUTY_CYCLE": 0.25,  # Largest fraction of wall time spent in write transactions
+    "MAX_PAUSE": 1.0,  # Seconds; upper bound of one sleep between batches
+}
+
+
+def get_config():
+    return {**DEFAULTS, **getattr(settings, "GAME_MAINTENANCE", {})}
+
+
+class Throttle:
+    """Sleeps after each batch long enough that batches take at most `duty_cycle` of the wall time."""
+
+    def __init__(self, duty_cycle=None, max_pause=None, sleep=time.sleep):
+        config = get_config()
+        self.duty_cycle = config["DUTY_CYCLE"] if duty_cycle is None else duty_cycle
+        self.max_pause = config["MAX_PAUSE"] if max_pause is None else max_pause
+        self.sleep = sleep
+        self.slept = 0.0
+
+    def pause_for(self, busy):
+        if self.duty_cycle >= 1:
+            return 0.0
+        return min(self.max_pause, busy * (1 - self.duty_cycle) / self.duty_cycle)
+
+    def __call__(self, busy):
+        pause = self.pause_for(busy)
+        if pause > 0:
+            self.sleep(pause)
+            self.slept += pause
+
+
+class TaskReport:
+    """Rows one cleanup task processed and how long it took."""
+
+    def __init__(self, name):
+        self.name = name
+        self.rows = 0
+        self.batches = 0
+        self.busy = 0.0  # Seconds spent in the batches themselves
+        self.seconds = 0.0  # Wall time, throttling included
+
+    @property
+    def rate(self):
+        return self.rows / self.seconds if self.seconds else 0.0
+
+    def __str__(self):
+        return (f"{self.name}: {self.rows} rows in {self.batches} batch(es), {self.seconds:.2f}s "
+                f"({self.rate:.0f} rows/s, {self.busy:.2f}s writing)")
+
+
+def _run_batches(report, batch, batch_size, max_batches, throttle):
+    """Call `batch()` (returns rows processed) until it comes back short, throttling in between."""
+    started = time.perf_counter()
+    while max_batches is None or report.batches < max_batches:
+        batch_started = time.perf_counter()
+        rows = batch()
+        busy = time.perf_counter() - batch_started
+        report.rows += rows
+        report.batches += 1
+        report.busy += busy
+        if rows < batch_size:
+            break
+        throttle(busy)
+    report.seconds = time.perf_counter() - started
+    return report
+
+
+def purge_expired_sessions(batch_size=None, max_batches=None, throttle=None):
+    """Delete django_session rows that expired, `batch_size` per transaction. Returns a TaskReport."""
+    batch_size = batch_size or get_config()["BATCH_SIZE"]
+    cutoff = now()
+
+    def batch():
+        keys = list(Session.objects.filter(expire_date__lt=cutoff).order_by("expire_date")
+                    .values_list("session_key", flat=True)[:batch_size])
+        if not keys:
+            return 0
+        with transaction.atomic():
+            # Re-checked under the lock: a session refreshed since the read is kept.
+            Session.objects.filter(session_key__in=keys, expire_date__lt=cutoff).delete()
+        return len(keys)  # Refreshed ones count too, or a batch of them would end the run early
+
+    return _run_batches(TaskReport("expired sessions"), batch, batch_size, max_batches, throttle or Throttle())
+
+
+def close_abandoned_games(batch_size=None, max_batches=None, throttle=None):
+    """End game sessions that stopped heartbeating (see reaper.py), one batch per call. Returns a TaskReport."""
+    batch_size = batch_size or get_config()["BATCH_SIZE"]
+
+    def batch():
+        # Fewer than batch_size when some were kept alive by this process; the next run picks up the rest.
+        return reap_stale_sessions(batch_size=batch_size, max_batches=1)
+
+    return _run_batches(TaskReport("abandoned games"), batch, batch_size, max_batches, throttle or Throttle())
+
+
+def run(batch_size=None, max_batches=None, throttle=None):
+    """Every cleanup task, in turn. Returns their TaskReports."""
+    throttle = throttle or Throttle()
+    reports = [
+        purge_expired_sessions(batch_size, max_batches, throttle),
+        close_abandoned_games(batch_size, max_batches, throttle),
+    ]
+    for report in reports:
+        if report.rows:
+            logger.info("Cleanup %s", report)
+    return reports
+
+
+maintenance_worker = PeriodicWorker("game-maintenance", run, get_config()["INTERVAL"])
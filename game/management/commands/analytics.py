@@ -0,0 +1,28 @@
+# game/management/commands/analytics.py
+
+import json
+
+from django.core.management.base import BaseCommand
+
+from game.analytics import get_config, run
+from game.bench import Stopwatch
+
+
+class Command(BaseCommand):
+    help = (
+        "Survival time, actions per minute, damage taken and item pickup rates over all finished sessions. "
+        "Per-session results are cached (see game/analytics.py), so reruns only read new sessions."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--refresh", action="store_true", help="Ignore the cache and recompute everything")
+        parser.add_argument("--workers", type=int, default=None, help="Threads processing session chunks")
+        parser.add_argument("--chunk-size", type=int, default=None, help="Sessions per chunk")
+
+    def handle(self, *args, **options):
+        with Stopwatch() as timer:
+            summary, added = run(refresh=options["refresh"], workers=options["workers"],
+                                 chunk_size=options["chunk_size"])
+        self.stdout.write(json.dumps(summary, indent=2))
+        self.stderr.write(f"{added} new session(s) processed in {timer.elapsed:.2f}s; "
+                          f"cache: {get_config()['CACHE_DIR']}")
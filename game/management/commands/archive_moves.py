@@ -0,0 +1,34 @@
+# game/management/commands/archive_moves.py
+
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+from game.archive import get_config, move_archive
+from game.bench import Stopwatch, rate
+
+
+class Command(BaseCommand):
+    help = (
+        "Move PlayerMove rows of sessions that ended more than --days days ago into columnar archive "
+        "segments (see game/archive.py) and delete them from the database."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--days", type=int, default=None,
+                            help="Age of ended sessions to archive (default: GAME_MOVE_ARCHIVE['AFTER_DAYS'])")
+        parser.add_argument("--every", type=float, default=None,
+                            help="Keep running, archiving every this many seconds")
+
+    def handle(self, *args, **options):
+        self.stdout.write(f"Archiving into {get_config()['DIR']}")
+        while True:
+            with Stopwatch() as timer:
+                archived, segments = move_archive.archive(options["days"])
+            self.stdout.write(f"{archived} moves archived into {segments} segment(s) in {timer.elapsed:.2f}s "
+                              f"({rate(archived, timer.elapsed):.0f} moves/s)")
+            if options["every"] is None:
+                return
+            close_old_connections()
+            time.sleep(options["every"])
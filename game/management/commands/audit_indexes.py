@@ -0,0 +1,35 @@
+# game/management/commands/audit_indexes.py
+
+from django.core.management.base import BaseCommand, CommandError
+
+from game.query_audit import audit
+
+
+class Command(BaseCommand):
+    help = (
+        "Play the hot paths (game/query_audit.py) in a rolled-back transaction, print SQLite's query "
+        "plan for every statement they send and flag full table scans and unindexed sorts."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--fail-on-scan", action="store_true",
+                            help="Exit with an error if any query is flagged (for CI).")
+        parser.add_argument("--sql", action="store_true", help="Also print each statement.")
+
+    def handle(self, *args, **options):
+        flagged = 0
+        for query, statements in audit():
+            problems = [step for _, _, found in statements for step in found]
+            status = self.style.ERROR("SCAN") if problems else self.style.SUCCESS("ok")
+            self.stdout.write(f"[{status}] {query.label}{' (full read expected)' if query.allow_scan else ''}")
+            for sql, plan, found in statements:
+                if options["sql"]:
+                    self.stdout.write(f"    {sql}")
+                for step in plan or ["(no lookup)"]:
+                    marker = "!!" if step in found else "  "
+                    self.stdout.write(f"  {marker} {step}")
+            flagged += bool(problems)
+
+        self.stdout.write(f"{flagged} flagged quer{'y' if flagged == 1 else 'ies'}.")
+        if flagged and options["fail_on_scan"]:
+            raise CommandError(f"{flagged} hot-path queries scan or sort without an index.")
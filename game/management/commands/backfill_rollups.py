@@ -0,0 +1,22 @@
+# game/management/commands/backfill_rollups.py
+
+from django.core.management.base import BaseCommand
+
+from game.bench import Stopwatch
+from game.rollups import activity_rollups, backfill
+
+
+class Command(BaseCommand):
+    help = (
+        "Rebuild the hourly and daily activity rollups (see game/rollups.py) of every hour before the current "
+        "one from GameSession, PlayerMove and the move archive."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--chunk-size", type=int, default=50000, help="Rows read and counted at a time")
+
+    def handle(self, *args, **options):
+        activity_rollups.flush()  # This process's buffered counts first, so the current hour is complete
+        with Stopwatch() as timer:
+            rows = backfill(chunk_size=options["chunk_size"])
+        self.stdout.write(f"{rows} rollup rows rebuilt in {timer.elapsed:.2f}s")
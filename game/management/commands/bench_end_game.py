@@ -0,0 +1,93 @@
+# game/management/commands/bench_end_game.py
+
+import random
+import threading
+
+from django.core.management.base import BaseCommand
+from django.db import connection
+from rest_framework.test import APIRequestFactory, force_authenticate
+
+from game.bench import Stopwatch, bench_players, rate
+from game.models import GameSession, Leaderboard
+from game.scores import score_submitter
+from game.views import end_game
+
+
+def legacy_submit(player, score):
+    """end_game's leaderboard update before the upsert: get_or_create, compare, save."""
+    leaderboard, _ = Leaderboard.objects.get_or_create(player=player)
+    if score > leaderboard.best_score:
+        leaderboard.best_score = score
+        leaderboard.save()
+
+
+def upsert_submit(player, score):
+    score_submitter.submit(player.pk, score)
+
+
+class Command(BaseCommand):
+    help = "Hammer end_game's leaderboard update from N threads and check for lost updates."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--threads", type=int, default=8)
+        parser.add_argument("--requests", type=int, default=200, help="Submissions per thread")
+        parser.add_argument("--players", type=int, default=4, help="Players sharing the submissions")
+        parser.add_argument("--view", action="store_true",
+                            help="Also run the whole end_game view (session update included)")
+
+    def handle(self, *args, **options):
+        runs = [("legacy get_or_create", legacy_submit), ("atomic upsert", upsert_submit)]
+        if options["view"]:
+            runs.append(("end_game view", None))
+        for label, submit in runs:
+            self.run(label, submit, options)
+
+    def run(self, label, submit, options):
+        threads, per_thread = options["threads"], options["requests"]
+        factory = APIRequestFactory()
+        errors = []
+        best = {}
+        best_lock = threading.Lock()
+
+        with bench_players(options["players"]) as players:
+            sessions = {p.pk: GameSession.objects.create(player=p) for p in players}
+
+            def worker(seed):
+                rng = random.Random(seed)
+                try:
+                    for _ in range(per_thread):
+                        player = rng.choice(players)
+                        score = rng.randint(0, 1_000_000)
+                        try:
+                            if submit is None:
+                                request = factory.post("/api/game/end/", {"session_id": sessions[player.pk].id,
+                                                                          "score": score}, format="json")
+                                force_authenticate(request, user=player)
+                                if end_game(request).status_code != 200:
+                                    raise RuntimeError("end_game failed")
+                            else:
+                                submit(player, score)
+                        except Exception as exc:
+                            errors.append(exc)
+                            continue
+                        with best_lock:
+                            best[player.pk] = max(best.get(player.pk, 0), score)
+                finally:
+                    connection.close()
+
+            workers = [threading.Thread(target=worker, args=(i,)) for i in range(threads)]
+            with Stopwatch() as timer:
+                for thread in workers:
+                    thread.start()
+                for thread in workers:
+                    thread.join()
+                score_submitter.flush()
+
+            stored = dict(Leaderboard.objects.filter(player__in=players).values_list("player_id", "best_score"))
+            lost = sum(1 for player_id, score in best.items() if stored.get(player_id) != score)
+
+        total = threads * per_thread
+        self.stdout.write(
+            f"{label:<22} {total:>7} submissions  {timer.elapsed:7.3f}s  {rate(total, timer.elapsed):9.0f}/s  "
+            f"errors={len(errors)}  lost_updates={lost}"
+        )
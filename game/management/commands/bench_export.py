@@ -0,0 +1,79 @@
+# game/management/commands/bench_export.py
+
+import gc
+import tracemalloc
+
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from rest_framework.renderers import JSONRenderer
+from rest_framework.test import APIRequestFactory, force_authenticate
+
+from authentication.views import admin_export
+from game.bench import Stopwatch, bench_players, rate
+from game.models import GameSession
+from mygame.metrics import QueryCounter
+
+
+class Command(BaseCommand):
+    help = (
+        "Export the sessions table through the streaming admin export (CSV and NDJSON) and, for comparison, "
+        "by rendering a list of model instances that look up player.username per row: time, queries and "
+        "peak traced memory."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--sessions", type=int, default=200_000, help="Sessions added to the table")
+        parser.add_argument("--players", type=int, default=200)
+        parser.add_argument("--naive-sessions", type=int, default=20_000,
+                            help="Sessions rendered by the all-at-once baseline (its memory grows with this)")
+
+    def handle(self, *args, **options):
+        with bench_players(options["players"] + 1) as users:
+            admin, players = users[0], users[1:]
+            admin.role = "admin"
+            admin.save(update_fields=["role"])
+            with Stopwatch() as timer:
+                self.populate(players, options["sessions"])
+            rows = GameSession.objects.count()
+            self.stdout.write(f"inserted {options['sessions']} sessions in {timer.elapsed:.1f}s ({rows} in the table)")
+
+            naive = min(rows, options["naive_sessions"])
+            self.measure(f"model list ({naive})", naive, self.render_all(naive))
+            self.measure("stream sessions.csv", rows, lambda: self.stream(admin, "sessions", "csv"))
+            self.measure("stream sessions.ndjson", rows, lambda: self.stream(admin, "sessions", "ndjson"))
+
+    def populate(self, players, count, batch=10000):
+        for offset in range(0, count, batch):
+            with transaction.atomic():
+                GameSession.objects.bulk_create([GameSession(player=players[i % len(players)], score=i)
+                                                 for i in range(offset, min(offset + batch, count))])
+
+    def render_all(self, limit):
+        def run():
+            sessions = GameSession.objects.order_by("id")[:limit]
+            rows = [{"id": s.id, "player": s.player.username, "start_time": s.start_time, "score": s.score}
+                    for s in sessions]
+            return len(JSONRenderer().render(rows))
+        return run
+
+    def stream(self, admin, dataset, file_type):
+        request = APIRequestFactory().get(f"/api/auth/admin-dashboard/export/{dataset}.{file_type}")
+        force_authenticate(request, user=admin)
+        response = admin_export(request, dataset=dataset, file_type=file_type)
+        return sum(len(chunk) for chunk in response.streaming_content)
+
+    def measure(self, label, rows, run):
+        gc.collect()
+        queries = QueryCounter()
+        with connection.execute_wrapper(queries), Stopwatch() as timer:
+            size = run()
+        gc.collect()
+        tracemalloc.start()
+        try:
+            run()
+            peak = tracemalloc.get_traced_memory()[1]
+        finally:
+            tracemalloc.stop()
+        self.stdout.write(f"{label:<24} {rows:>9} rows  {size / 1e6:7.1f} MB out  {timer.elapsed:6.2f}s  "
+                          f"{rate(rows, timer.elapsed):8.0f} rows/s  {queries.count:>6} queries  "
+                          f"peak {peak / 1e6:7.1f} MB traced")
@@ -0,0 +1,50 @@
+# game/management/commands/bench_leaderboard_page.py
+
+from django.core.cache import cache
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.test import Client
+
+from game.bench import Stopwatch, bench_players, rate
+from game.leaderboard_index import TOP_N, leaderboard_index
+from game.models import Leaderboard
+from mygame.metrics import QueryCounter
+from mygame.staticfiles import build_version
+
+URL = "/api/game/leaderboard/"
+
+
+class Command(BaseCommand):
+    help = ("Leaderboard page cost per request: table re-rendered every time (as before), "
+            "cached table, and a conditional request answered 304.")
+
+    def add_arguments(self, parser):
+        parser.add_argument("--requests", type=int, default=2000)
+
+    def handle(self, *args, **options):
+        count = options["requests"]
+        with bench_players(TOP_N + 2) as players:
+            Leaderboard.objects.bulk_create(Leaderboard(player=player, best_score=1000 + i)
+                                            for i, player in enumerate(players))
+            leaderboard_index.load()
+            client = Client()
+            client.force_login(players[0])
+            etag = client.get(URL)["ETag"]
+            table_key = f"game:leaderboard-table:{build_version()}:{leaderboard_index.top_version()}"
+
+            self.report("re-rendered table", count, client, {}, before=lambda: cache.delete(table_key))
+            self.report("cached table", count, client, {})
+            self.report("If-None-Match (304)", count, client, {"HTTP_IF_NONE_MATCH": etag})
+        leaderboard_index.invalidate()
+
+    def report(self, label, count, client, headers, before=None):
+        queries = QueryCounter()
+        statuses = set()
+        with connection.execute_wrapper(queries), Stopwatch() as timer:
+            for _ in range(count):
+                if before is not None:
+                    before()
+                statuses.add(client.get(URL, **headers).status_code)
+        self.stdout.write(f"{label:<22} {count:>6} requests  {timer.elapsed / count * 1e6:7.0f} µs/request  "
+                          f"{rate(count, timer.elapsed):7.0f} req/s  {queries.count / count:4.1f} queries/request  "
+                          f"status {sorted(statuses)}")
@@ -0,0 +1,132 @@
+# game/management/commands/bench_login_burst.py
+
+import http.client
+import os
+import signal
+import subprocess
+import sys
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+from urllib.parse import urlencode
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.core.management.base import BaseCommand, CommandError
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from game.bench import bench_players, percentile
+
+from .bench_startup import free_port
+
+GAMEPLAY_PATH = "/api/game/leaderboard/top/"
+PASSWORD = "burst-password"
+
+
+class Command(BaseCommand):
+    help = ("Gameplay latency under a login burst, against gunicorn (one worker, GUNICORN_THREADS threads): "
+            "password hashing on the request threads vs the bounded hashing pool.")
+
+    def add_arguments(self, parser):
+        parser.add_argument("--seconds", type=float, default=10)
+        parser.add_argument("--login-clients", type=int, default=16, help="Concurrent clients logging in back to back")
+        parser.add_argument("--gameplay-clients", type=int, default=4)
+        parser.add_argument("--threads", type=int, default=8, help="gunicorn threads")
+
+    def handle(self, *args, **options):
+        with bench_players(options["login_clients"] + 1) as players:
+            get_user_model().objects.filter(pk__in=[p.pk for p in players]).update(password=make_password(PASSWORD))
+            token = str(RefreshToken.for_user(players[0]).access_token)
+            usernames = [player.username for player in players[1:]]
+            for label, workers in (("hashing on request threads", "0"), ("bounded hashing pool", None)):
+                env = {"AUTH_HASHING_WORKERS": workers} if workers is not None else {}
+                with self.server(options["threads"], env) as port:
+                    idle = self.run(port, token, [], options["gameplay_clients"], options["seconds"] / 2)
+                    burst = self.run(port, token, usernames, options["gameplay_clients"], options["seconds"])
+                self.report(label, idle, burst)
+
+    @contextmanager
+    def server(self, threads, extra):
+        port = free_port()
+        env = {**os.environ, "DJANGO_SETTINGS_MODULE": "mygame.settings", "DJANGO_PRODUCTION": "False",
+               "GUNICORN_BIND": f"127.0.0.1:{port}", "WEB_CONCURRENCY": "1", "GUNICORN_THREADS": str(threads),
+               **extra}
+        process = subprocess.Popen([sys.executable, "-m", "gunicorn", "-c", "gunicorn.conf.py"],
+                                   cwd=settings.BASE_DIR, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        try:
+            self.wait_for(port, process)
+            yield port
+        finally:
+            process.send_signal(signal.SIGTERM)
+            process.wait(30)
+
+    def wait_for(self, port, process):
+        deadline = time.monotonic() + 60
+        while time.monotonic() < deadline:
+            if process.poll() is not None:
+                raise CommandError(f"gunicorn exited with status {process.returncode}")
+            try:
+                request(http.client.HTTPConnection("127.0.0.1", port, timeout=5), "GET", "/")
+                return
+            except OSError:
+                time.sleep(0.05)
+        raise CommandError("gunicorn did not answer within 60 seconds")
+
+    def run(self, port, token, usernames, gameplay_clients, seconds):
+        deadline = time.monotonic() + seconds
+        gameplay, logins, statuses, lock = [], [], Counter(), threading.Lock()
+
+        def play():
+            connection = http.client.HTTPConnection("127.0.0.1", port, timeout=60)
+            headers = {"Authorization": f"Bearer {token}"}
+            while time.monotonic() < deadline:
+                started = time.perf_counter()
+                request(connection, "GET", GAMEPLAY_PATH, headers=headers)
+                with lock:
+                    gameplay.append(time.perf_counter() - started)
+                time.sleep(0.01)
+
+        def log_in(username):
+            connection = http.client.HTTPConnection("127.0.0.1", port, timeout=60)
+            body = urlencode({"username": username, "password": PASSWORD})
+            headers = {"Content-Type": "application/x-www-form-urlencoded"}
+            while time.monotonic() < deadline:
+                started = time.perf_counter()
+                status = request(connection, "POST", "/api/auth/login/", body, headers)
+                with lock:
+                    statuses[status] += 1
+                    if status == 200:
+                        logins.append(time.perf_counter() - started)
+                if status == 503:
+                    time.sleep(1)  # Honour Retry-After
+
+        threads = [threading.Thread(target=play) for _ in range(gameplay_clients)]
+        threads += [threading.Thread(target=log_in, args=(username,)) for username in usernames]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        return {"gameplay": sorted(gameplay), "logins": sorted(logins), "statuses": statuses, "seconds": seconds}
+
+    def report(self, label, idle, burst):
+        def ms(values, q):
+            return f"{percentile(values, q) * 1000:7.1f}" if values else "      -"
+
+        self.stdout.write(f"{label}:")
+        for phase, result in (("gameplay alone", idle), ("during login burst", burst)):
+            self.stdout.write(f"  {phase:<20} gameplay p50 {ms(result['gameplay'], 50)} ms  "
+                              f"p95 {ms(result['gameplay'], 95)} ms  p99 {ms(result['gameplay'], 99)} ms  "
+                              f"{len(result['gameplay']) / result['seconds']:6.1f} req/s")
+        statuses = burst["statuses"]
+        self.stdout.write(f"  logins: {statuses[200]} ok ({len(burst['logins']) / burst['seconds']:.1f}/s, "
+                          f"p50 {ms(burst['logins'], 50)} ms), {statuses[503]} shed with 503, "
+                          f"{sum(statuses.values()) - statuses[200] - statuses[503]} other")
+
+
+def request(connection, method, path, body=None, headers=None):
+    connection.request(method, path, body=body, headers=headers or {})
+    response = connection.getresponse()
+    response.read()
+    return response.status
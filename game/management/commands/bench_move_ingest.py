@@ -0,0 +1,47 @@
+# game/management/commands/bench_move_ingest.py
+
+from django.core.management.base import BaseCommand
+
+from game.bench import Stopwatch, bench_players, rate
+from game.ingest import MoveIngestor
+from game.models import GameSession, PlayerMove
+
+
+class Command(BaseCommand):
+    help = "Compare per-row PlayerMove inserts with the buffered ingestion pipeline at several batch sizes."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--moves", type=int, default=5000, help="Moves inserted per run")
+        parser.add_argument("--batch-sizes", default="1,10,100,500,1000",
+                            help="Comma-separated batch sizes for the buffered runs")
+
+    def handle(self, *args, **options):
+        moves = options["moves"]
+        batch_sizes = [int(size) for size in options["batch_sizes"].split(",")]
+
+        with bench_players() as (player,):
+            session = GameSession.objects.create(player=player)
+
+            with Stopwatch() as timer:
+                for i in range(moves):
+                    PlayerMove.objects.create(session=session, action=f"move-{i}")
+            self.report("per-row create", moves, timer.elapsed)
+
+            for batch_size in batch_sizes:
+                ingestor = MoveIngestor(batch_size=batch_size, max_queue=max(batch_size * 4, 1000),
+                                        flush_interval=0.05)
+                with Stopwatch() as timer:
+                    for i in range(moves):
+                        while not ingestor.submit(session.id, f"move-{i}"):
+                            pass
+                    ingestor.writer.stop()
+                    ingestor.drain()
+                self.report(f"buffered batch={batch_size}", moves, timer.elapsed)
+
+            written = PlayerMove.objects.filter(session=session).count()
+            expected = moves * (len(batch_sizes) + 1)
+            if written != expected:
+                self.stderr.write(f"Lost moves: wrote {written}, expected {expected}")
+
+    def report(self, label, moves, elapsed):
+        self.stdout.write(f"{label:<24} {moves:>8} moves  {elapsed:8.3f}s  {rate(moves, elapsed):12.0f} moves/s")
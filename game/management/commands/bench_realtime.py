@@ -0,0 +1,71 @@
+# game/management/commands/bench_realtime.py
+
+import itertools
+import json
+
+from asgiref.sync import async_to_sync
+from asgiref.testing import ApplicationCommunicator
+from django.core.management.base import BaseCommand
+from django.test import Client, override_settings
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from game.bench import Stopwatch, bench_players, rate
+from game.ingest import move_ingestor
+from game.live_state import live_sessions
+from mygame.asgi import application
+
+# One round of a typical player loop; the potion keeps the player alive.
+ROUND = [
+    ("move", "/api/game/move/", {"action": "walk"}),
+    ("attack", "/api/game/enemy-attack/", {}),
+    ("move", "/api/game/move/", {"action": "jump"}),
+    ("collect", "/api/game/collect-item/", {"item": "Health Potion"}),
+]
+
+
+class Command(BaseCommand):
+    help = "Messages per second for one worker: REST endpoints vs the /ws/game/ WebSocket channel."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--messages", type=int, default=2000)
+
+    def handle(self, *args, **options):
+        count = options["messages"]
+        # One player sends thousands of actions; measure the channels, not the per-user rate limit.
+        with override_settings(GAME_THROTTLE={"ENABLED": False}), bench_players() as (player,):
+            token = str(RefreshToken.for_user(player).access_token)
+            self.report("REST", count, self.bench_rest(token, count))
+            self.report("WebSocket", count, self.bench_websocket(token, count))
+            move_ingestor.drain()
+            live_sessions.clear()
+
+    def bench_rest(self, token, count):
+        client = Client(HTTP_AUTHORIZATION=f"Bearer {token}")
+        session_id = client.post("/api/game/start/").json()["session_id"]
+        with Stopwatch() as timer:
+            for _, url, data in itertools.islice(itertools.cycle(ROUND), count):
+                response = client.post(url, {"session_id": session_id, **data}, content_type="application/json")
+                if response.status_code >= 300:
+                    raise RuntimeError(f"{url} answered {response.status_code}: {response.content!r}")
+        return timer.elapsed
+
+    def bench_websocket(self, token, count):
+        async def run():
+            socket = ApplicationCommunicator(application, {"type": "websocket", "path": "/ws/game/"})
+            await socket.send_input({"type": "websocket.connect"})
+            await socket.receive_output()
+            await socket.send_input({"type": "websocket.receive", "text": json.dumps({"type": "auth", "token": token})})
+            await socket.receive_output()
+            with Stopwatch() as timer:
+                for kind, _, data in itertools.islice(itertools.cycle(ROUND), count):
+                    await socket.send_input({"type": "websocket.receive", "text": json.dumps({"type": kind, **data})})
+                    reply = json.loads((await socket.receive_output())["text"])
+                    if reply["type"] == "error":
+                        raise RuntimeError(reply["error"])
+            await socket.send_input({"type": "websocket.disconnect", "code": 1000})
+            await socket.wait()
+            return timer.elapsed
+        return async_to_sync(run)()
+
+    def report(self, label, count, elapsed):
+        self.stdout.write(f"{label:<10} {count:>7} messages  {elapsed:7.3f}s  {rate(count, elapsed):9.0f} msg/s")
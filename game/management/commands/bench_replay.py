@@ -0,0 +1,86 @@
+# game/management/commands/bench_replay.py
+
+import gc
+import tempfile
+import tracemalloc
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.test import override_settings
+from django.urls import reverse
+from django.utils.timezone import now
+from rest_framework.renderers import JSONRenderer
+from rest_framework.test import APIRequestFactory, force_authenticate
+
+from game.archive import move_archive
+from game.bench import Stopwatch, bench_players, rate
+from game.models import GameSession, PlayerMove
+from game.serializers import PlayerMoveSerializer
+from game.views import session_replay
+
+ACTIONS = ["move-left", "move-right", "jump", "attack", "block"]
+
+
+class Command(BaseCommand):
+    help = (
+        "Replay one long session: time and peak traced memory of the NDJSON streaming endpoint "
+        "(hot rows, then archived) against serializing the whole queryset at once."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--moves", type=int, default=1_000_000, help="Moves in the replayed session")
+        parser.add_argument("--naive-moves", type=int, default=200_000,
+                            help="Moves serialized by the all-at-once baseline (its memory grows with this)")
+
+    def handle(self, *args, **options):
+        moves = options["moves"]
+        with bench_players() as (player,), tempfile.TemporaryDirectory() as directory, \
+                override_settings(GAME_MOVE_ARCHIVE={"DIR": directory}):
+            start = now() - timedelta(days=60)
+            session = GameSession.objects.create(player=player, start_time=start, end_time=start)
+            with Stopwatch() as timer:
+                self.populate(session, start, moves)
+            self.stdout.write(f"inserted {moves} moves in {timer.elapsed:.1f}s")
+
+            naive = min(moves, options["naive_moves"])
+            self.measure(f"serialize all ({naive})", naive, lambda: self.serialize_all(session, naive))
+            self.measure("stream, hot rows", moves, lambda: self.stream(player, session))
+            with Stopwatch() as timer:
+                archived, _ = move_archive.archive(older_than_days=30, session_ids=[session.id])
+            self.stdout.write(f"archived {archived} moves in {timer.elapsed:.1f}s")
+            self.measure("stream, archived", moves, lambda: self.stream(player, session))
+
+    def populate(self, session, start, moves, batch=10000):
+        for offset in range(0, moves, batch):
+            with transaction.atomic():
+                PlayerMove.objects.bulk_create([
+                    PlayerMove(session=session, action=ACTIONS[i % len(ACTIONS)],
+                               timestamp=start + timedelta(milliseconds=i))
+                    for i in range(offset, min(offset + batch, moves))
+                ])
+
+    def serialize_all(self, session, limit):
+        queryset = PlayerMove.objects.filter(session=session).order_by("timestamp", "id")[:limit]
+        body = JSONRenderer().render(PlayerMoveSerializer(queryset, many=True).data)
+        return len(body)
+
+    def stream(self, player, session):
+        request = APIRequestFactory().get(reverse("game:session-replay", args=[session.id]))
+        force_authenticate(request, user=player)
+        response = session_replay(request, session_id=session.id)
+        return sum(len(chunk) for chunk in response.streaming_content)
+
+    def measure(self, label, moves, run):
+        gc.collect()
+        with Stopwatch() as timer:
+            size = run()
+        gc.collect()
+        tracemalloc.start()
+        try:
+            run()
+            peak = tracemalloc.get_traced_memory()[1]
+        finally:
+            tracemalloc.stop()
+        self.stdout.write(f"{label:<28} {moves:>9} moves  {size / 1e6:8.1f} MB out  {timer.elapsed:7.2f}s  "
+                          f"{rate(moves, timer.elapsed):9.0f} moves/s  peak {peak / 1e6:8.1f} MB traced")
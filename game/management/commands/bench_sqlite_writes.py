@@ -0,0 +1,89 @@
+# game/management/commands/bench_sqlite_writes.py
+
+import os
+import sqlite3
+import tempfile
+import threading
+
+from django.core.management.base import BaseCommand
+
+from game.bench import Stopwatch, rate
+from mygame.sqlite_tuned.base import PRAGMAS
+
+CONFIGS = [
+    # (label, pragmas, BEGIN statement) -- the first mirrors the stock django.db.backends.sqlite3 setup.
+    ("stock (rollback journal)", {}, "BEGIN"),
+    ("tuned (WAL + IMMEDIATE)", PRAGMAS, "BEGIN IMMEDIATE"),
+]
+
+
+class Command(BaseCommand):
+    help = (
+        "Concurrent write benchmark on a scratch SQLite file: throughput and 'database is locked' rate "
+        "for the stock configuration vs mygame.sqlite_tuned."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--threads", type=int, default=8)
+        parser.add_argument("--transactions", type=int, default=300, help="Transactions per thread")
+        parser.add_argument("--timeout", type=float, default=5.0, help="sqlite3.connect timeout (seconds)")
+
+    def handle(self, *args, **options):
+        for label, pragmas, begin in CONFIGS:
+            with tempfile.TemporaryDirectory() as directory:
+                path = os.path.join(directory, "bench.sqlite3")
+                self.run(label, path, pragmas, begin, options)
+
+    def connect(self, path, pragmas, timeout):
+        conn = sqlite3.connect(path, timeout=timeout, isolation_level=None, check_same_thread=False)
+        for name, value in pragmas.items():
+            conn.execute(f"PRAGMA {name} = {value}")
+        return conn
+
+    def run(self, label, path, pragmas, begin, options):
+        setup = self.connect(path, pragmas, options["timeout"])
+        setup.execute("CREATE TABLE session (id INTEGER PRIMARY KEY, health INTEGER NOT NULL)")
+        setup.execute("CREATE TABLE move (id INTEGER PRIMARY KEY, session_id INTEGER NOT NULL, action TEXT)")
+        setup.executemany("INSERT INTO session (id, health) VALUES (?, 100)", [(i,) for i in range(64)])
+        setup.close()
+
+        committed = [0]
+        locked = [0]
+        lock = threading.Lock()
+
+        def worker(n):
+            conn = self.connect(path, pragmas, options["timeout"])
+            ok = errors = 0
+            for i in range(options["transactions"]):
+                session_id = (n * 7 + i) % 64
+                try:
+                    # The enemy_attack/log_move shape: read the session, then write.
+                    conn.execute(begin)
+                    conn.execute("SELECT health FROM session WHERE id = ?", (session_id,)).fetchone()
+                    conn.execute("UPDATE session SET health = MAX(0, health - 1) WHERE id = ?", (session_id,))
+                    conn.execute("INSERT INTO move (session_id, action) VALUES (?, 'attack')", (session_id,))
+                    conn.execute("COMMIT")
+                    ok += 1
+                except sqlite3.OperationalError as exc:
+                    if "locked" not in str(exc) and "busy" not in str(exc):
+                        raise
+                    errors += 1
+                    if conn.in_transaction:
+                        conn.execute("ROLLBACK")
+            conn.close()
+            with lock:
+                committed[0] += ok
+                locked[0] += errors
+
+        threads = [threading.Thread(target=worker, args=(n,)) for n in range(options["threads"])]
+        with Stopwatch() as timer:
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+
+        attempted = options["threads"] * options["transactions"]
+        self.stdout.write(
+            f"{label:<26} {committed[0]:>6}/{attempted} committed  {rate(committed[0], timer.elapsed):8.0f} tx/s  "
+            f"locked errors {locked[0]:>5} ({locked[0] / attempted:6.1%})"
+        )
@@ -0,0 +1,148 @@
+# game/management/commands/bench_startup.py
+
+import http.client
+import json
+import os
+import signal
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from game.bench import percentile
+
+# Runs in a fresh interpreter: time to a loaded app with every view imported, and its memory.
+STARTUP_SCRIPT = """
+import json, os, sys, time
+start = time.perf_counter()
+import django
+django.setup()
+from django.urls import get_resolver
+get_resolver().url_patterns
+elapsed = time.perf_counter() - start
+rss = next(int(line.split()[1]) for line in open("/proc/self/status") if line.startswith("VmRSS:"))
+print(json.dumps({"seconds": elapsed, "rss_kb": rss, "numpy": "numpy" in sys.modules,
+                  "apps": len(django.apps.apps.get_app_configs())}))
+"""
+
+
+def memory(pid):
+    """Rss, Pss and private (unshared) memory of a process in KiB, from /proc/<pid>/smaps_rollup."""
+    values = {}
+    with open(f"/proc/{pid}/smaps_rollup") as handle:
+        for line in handle:
+            parts = line.split()
+            if len(parts) == 3 and parts[2] == "kB":
+                values[parts[0].rstrip(":")] = int(parts[1])
+    return {"rss": values["Rss"], "pss": values["Pss"],
+            "private": values["Private_Clean"] + values["Private_Dirty"]}
+
+
+def children(pid):
+    path = Path(f"/proc/{pid}/task/{pid}/children")
+    return [int(child) for child in path.read_text().split()] if path.exists() else []
+
+
+def get(port, path):
+    """Any answer counts (production settings redirect plain HTTP to HTTPS)."""
+    connection = http.client.HTTPConnection("127.0.0.1", port, timeout=10)
+    try:
+        connection.request("GET", path)
+        return connection.getresponse().read()
+    finally:
+        connection.close()
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+class Command(BaseCommand):
+    help = (
+        "Startup cost: time and RSS to a loaded app in a fresh interpreter (production vs. dev apps), "
+        "and gunicorn time-to-first-response plus memory per worker with and without preload_app."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--runs", type=int, default=5, help="Fresh interpreters per variant")
+        parser.add_argument("--workers", type=int, default=4, help="gunicorn workers")
+        parser.add_argument("--skip-gunicorn", action="store_true")
+
+    def handle(self, *args, **options):
+        if not Path("/proc/self/smaps_rollup").exists():
+            raise CommandError("bench_startup reads /proc and runs on Linux only.")
+        for label, env in (("production", {"DJANGO_PRODUCTION": "True"}),
+                           ("development", {"DJANGO_PRODUCTION": "False"})):
+            self.interpreter(label, env, options["runs"])
+        if not options["skip_gunicorn"]:
+            for preload in (False, True):
+                self.gunicorn(preload, options["workers"])
+
+    def environment(self, **extra):
+        env = {**os.environ, "DJANGO_SETTINGS_MODULE": "mygame.settings", **extra}
+        env.pop("DJANGO_DEV_APPS", None)
+        return env
+
+    def interpreter(self, label, extra, runs):
+        results = []
+        for _ in range(runs):
+            output = subprocess.run([sys.executable, "-c", STARTUP_SCRIPT], cwd=settings.BASE_DIR, check=True,
+                                    env=self.environment(**extra), capture_output=True, text=True).stdout
+            results.append(json.loads(output.strip().splitlines()[-1]))
+        seconds = sorted(result["seconds"] for result in results)
+        rss = sorted(result["rss_kb"] for result in results)
+        self.stdout.write(f"{label:<12} app loaded in p50 {percentile(seconds, 50) * 1000:7.1f} ms  "
+                          f"RSS {percentile(rss, 50) / 1024:6.1f} MiB  apps {results[0]['apps']}  "
+                          f"numpy loaded: {results[0]['numpy']}")
+
+    def gunicorn(self, preload, workers):
+        port = free_port()
+        with tempfile.TemporaryDirectory() as metrics_dir:
+            env = self.environment(DJANGO_PRODUCTION="True", GUNICORN_PRELOAD=str(preload),
+                                   GUNICORN_BIND=f"127.0.0.1:{port}", WEB_CONCURRENCY=str(workers),
+                                   METRICS_DIR=metrics_dir)
+            started = time.perf_counter()
+            master = subprocess.Popen([sys.executable, "-m", "gunicorn", "-c", "gunicorn.conf.py"],
+                                      cwd=settings.BASE_DIR, env=env,
+                                      stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+            try:
+                ready = self.wait_for(port, started, master)
+                while len(children(master.pid)) < workers and time.perf_counter() - started < 60:
+                    time.sleep(0.05)
+                # Every worker has loaded the app once each of them answered a request or two.
+                for _ in range(workers * 4):
+                    get(port, "/api/game/leaderboard/top/")
+                time.sleep(0.5)
+                master_memory = memory(master.pid)
+                worker_memory = [memory(pid) for pid in children(master.pid)]
+            finally:
+                master.send_signal(signal.SIGTERM)
+                master.wait(30)
+
+        def mib(key):
+            return sum(item[key] for item in worker_memory) / len(worker_memory) / 1024
+
+        total_pss = (master_memory["pss"] + sum(item["pss"] for item in worker_memory)) / 1024
+        self.stdout.write(
+            f"gunicorn preload={str(preload):<5} {len(worker_memory)} workers: first response {ready * 1000:7.1f} ms  "
+            f"per worker RSS {mib('rss'):6.1f} MiB, PSS {mib('pss'):6.1f} MiB, private {mib('private'):6.1f} MiB  "
+            f"total PSS {total_pss:6.1f} MiB"
+        )
+
+    def wait_for(self, port, started, process):
+        while time.perf_counter() - started < 60:
+            if process.poll() is not None:
+                raise CommandError(f"gunicorn exited with status {process.returncode}")
+            try:
+                get(port, "/")
+                return time.perf_counter() - started
+            except OSError:
+                time.sleep(0.01)
+        raise CommandError("gunicorn did not answer within 60 seconds")
@@ -0,0 +1,38 @@
+# game/management/commands/bench_throttle.py
+
+import os
+import tempfile
+import time
+
+from django.core.management.base import BaseCommand
+from django.test import override_settings
+
+from game.bench import rate
+from game.throttling import limiter
+
+
+class Command(BaseCommand):
+    help = "Cost of one rate-limit check (game/throttling.py), per-process buckets vs the shared bucket file."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--checks", type=int, default=200_000)
+        parser.add_argument("--users", type=int, default=10_000)
+
+    def handle(self, *args, **options):
+        with tempfile.TemporaryDirectory() as directory:
+            for label, shared_file in (("in-process", None), ("shared file", os.path.join(directory, "buckets"))):
+                # Allowed: ample buckets. Refused: empty ones, so every check also counts a shed request.
+                for outcome, rates in (("allowed", (1e9, 1e9)), ("refused", (1e-9, 1.0))):
+                    config = {"SHARED_FILE": shared_file, "RATES": {"attack": rates, "collect": rates, "move": rates}}
+                    with override_settings(GAME_THROTTLE=config):
+                        self.report(f"{label}, {outcome}", options["checks"], options["users"])
+
+    def report(self, label, checks, users):
+        take = limiter.take
+        take("move", 0)  # Open the store
+        started = time.perf_counter()
+        for i in range(checks):
+            take("move", i % users)
+        elapsed = time.perf_counter() - started
+        self.stdout.write(f"{label:<24} {checks:>8} checks  {elapsed / checks * 1e6:6.2f} µs/check  "
+                          f"{rate(checks, elapsed):10.0f} checks/s")
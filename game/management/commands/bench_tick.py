@@ -0,0 +1,95 @@
+# game/management/commands/bench_tick.py
+
+import asyncio
+import random
+import time
+
+from django.core.management.base import BaseCommand
+from django.test import override_settings
+
+from game.bench import Stopwatch, bench_players, percentile
+from game.live_state import LiveSession
+from game.models import GameSession
+from game.ticks import TickEngine
+
+
+class Command(BaseCommand):
+    help = (
+        "Tick cost for N concurrent sessions: the vectorized TickEngine against a per-session Python loop, "
+        "the asyncio scheduler against its tick budget, and optionally batched persistence."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--sessions", type=int, default=100_000)
+        parser.add_argument("--ticks", type=int, default=50, help="Ticks timed per variant")
+        parser.add_argument("--interval", type=float, default=0.1, help="Tick budget for the scheduler run (s)")
+        parser.add_argument("--chance", type=float, default=0.1, help="Attack chance per session per tick")
+        parser.add_argument("--persist", action="store_true",
+                            help="Also create the sessions in the database and time one batched write")
+
+    def handle(self, *args, **options):
+        count = options["sessions"]
+        config = {"ATTACK_CHANCE": options["chance"], "TICK_INTERVAL": options["interval"],
+                  "MIN_DAMAGE": 0, "MAX_DAMAGE": 1,  # Keep everyone alive so each tick does full work
+                  "INITIAL_CAPACITY": count}
+
+        lives = [LiveSession(i + 1, 1, 10**9, 0) for i in range(count)]
+        self.python_loop(lives, options)
+
+        engine = TickEngine(config)
+        with Stopwatch() as timer:
+            for live in lives:
+                engine.register(live)
+        self.stdout.write(f"registered {count} sessions in {timer.elapsed:.2f}s")
+        durations = []
+        for _ in range(options["ticks"]):
+            with Stopwatch() as timer:
+                engine.tick()
+            durations.append(timer.elapsed)
+        self.report("vectorized tick", durations)
+
+        self.scheduler(engine, options["interval"])
+        if options["persist"]:
+            self.persist(count, config)
+
+    def python_loop(self, lives, options):
+        durations = []
+        for _ in range(max(1, options["ticks"] // 10)):
+            with Stopwatch() as timer:
+                for live in lives:
+                    if random.random() < options["chance"]:
+                        live.take_damage(random.randint(0, 1))
+            durations.append(timer.elapsed)
+        self.report("per-session Python loop", durations)
+
+    def scheduler(self, engine, interval):
+        async def run_for(seconds):
+            task = asyncio.create_task(engine.run())
+            await asyncio.sleep(seconds)
+            task.cancel()
+
+        engine.ticks = engine.overruns = 0
+        engine.persist_due = lambda: False  # No database in this part
+        seconds = max(2.0, interval * 30)
+        asyncio.run(run_for(seconds))
+        self.stdout.write(f"asyncio scheduler: {engine.ticks} ticks in {seconds:.1f}s at a {interval * 1000:.0f} ms "
+                          f"budget, {engine.overruns} overruns")
+
+    def persist(self, count, config):
+        with bench_players() as (player,), override_settings(GAME_BACKGROUND_WORKERS=False):
+            sessions = GameSession.objects.bulk_create([GameSession(player=player) for _ in range(count)],
+                                                       batch_size=5000)
+            engine = TickEngine(config)
+            for session in sessions:
+                engine.register(LiveSession(session.id, player.id, 100, 0))
+            engine.tick()
+            started = time.perf_counter()
+            rows = engine.persist()
+            elapsed = time.perf_counter() - started
+            self.stdout.write(f"batched persist: {rows} rows in {elapsed * 1000:.0f} ms "
+                              f"(runs off the tick, on a worker thread)")
+
+    def report(self, label, durations):
+        durations = sorted(durations)
+        self.stdout.write(f"{label:<26} p50 {percentile(durations, 50) * 1000:8.2f} ms  "
+                          f"p99 {percentile(durations, 99) * 1000:8.2f} ms  max {durations[-1] * 1000:8.2f} ms")
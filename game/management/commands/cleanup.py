@@ -0,0 +1,35 @@
+# game/management/commands/cleanup.py
+
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+from game import maintenance
+
+
+class Command(BaseCommand):
+    help = (
+        "Delete expired django_session rows and end abandoned game sessions in small, throttled "
+        "transactions (see game/maintenance.py)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=None,
+                            help="Rows per transaction (default: GAME_MAINTENANCE['BATCH_SIZE'])")
+        parser.add_argument("--max-batches", type=int, default=None, help="Stop each task after this many batches")
+        parser.add_argument("--duty-cycle", type=float, default=None,
+                            help="Largest fraction of wall time spent writing (default: GAME_MAINTENANCE['DUTY_CYCLE'])")
+        parser.add_argument("--every", type=float, default=None,
+                            help="Keep running, cleaning up every this many seconds")
+
+    def handle(self, *args, **options):
+        while True:
+            throttle = maintenance.Throttle(options["duty_cycle"])
+            for report in maintenance.run(options["batch_size"], options["max_batches"], throttle):
+                self.stdout.write(str(report))
+            self.stdout.write(f"throttled for {throttle.slept:.2f}s")
+            if options["every"] is None:
+                return
+            close_old_connections()
+            time.sleep(options["every"])
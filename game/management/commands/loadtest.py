@@ -0,0 +1,179 @@
+# game/management/commands/loadtest.py
+
+import http.client
+import json
+import random
+import socket
+import subprocess
+import threading
+import time
+import uuid
+from collections import defaultdict
+from urllib.parse import urlsplit
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.core.servers.basehttp import ThreadedWSGIServer, WSGIRequestHandler
+from django.core.wsgi import get_wsgi_application
+
+from game.bench import Stopwatch, summarize
+
+
+class QuietHandler(WSGIRequestHandler):
+    def setup(self):
+        super().setup()
+        # Headers and body are written separately; don't let Nagle hold the body back.
+        self.connection.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+
+    def log_message(self, *args):
+        pass
+
+
+class Player:
+    """One simulated player with its own keep-alive HTTP connection."""
+
+    def __init__(self, base_url, record, timeout=30):
+        parts = urlsplit(base_url)
+        connection_class = http.client.HTTPSConnection if parts.scheme == "https" else http.client.HTTPConnection
+        self.connection = connection_class(parts.hostname, parts.port, timeout=timeout)
+        self.prefix = parts.path.rstrip("/")
+        self.record = record
+        self.token = None
+
+    def call(self, label, method, path, payload=None, expect=(200, 201, 202)):
+        headers = {"Content-Type": "application/json", "Accept": "application/json"}
+        if self.token:
+            headers["Authorization"] = f"Bearer {self.token}"
+        body = json.dumps(payload) if payload is not None else None
+        start = time.perf_counter()
+        try:
+            self.connection.request(method, self.prefix + path, body=body, headers=headers)
+            response = self.connection.getresponse()
+            data = response.read()
+            status = response.status
+        except (OSError, http.client.HTTPException):
+            self.connection.close()
+            status, data = None, b""
+        self.record(label, time.perf_counter() - start, status in expect)
+        try:
+            return json.loads(data) if data else {}
+        except ValueError:
+            return {}
+
+    def journey(self, username, moves, attacks, items):
+        """Register, log in, play one game and look at the leaderboard."""
+        password = uuid.uuid4().hex
+        self.call("register", "POST", "/api/auth/register/", {"username": username, "password": password})
+        tokens = self.call("login", "POST", "/api/auth/login/", {"username": username, "password": password})
+        self.token = tokens.get("tokens", {}).get("access")
+        session_id = self.call("start", "POST", "/api/game/start/").get("session_id")
+
+        actions = ["move"] * moves + ["attack"] * attacks + ["collect"] * items
+        random.shuffle(actions)
+        for action in actions:
+            if action == "move":
+                self.call("move", "POST", "/api/game/move/", {"session_id": session_id, "action": "walk"})
+            elif action == "attack":
+                self.call("attack", "POST", "/api/game/enemy-attack/", {"session_id": session_id},
+                          expect=(200, 400))  # 400 once the player is dead
+            else:
+                self.call("collect", "POST", "/api/game/collect-item/",
+                          {"session_id": session_id, "item": "Health Potion"}, expect=(200, 400))
+
+        self.call("end", "POST", "/api/game/end/", {"session_id": session_id, "score": random.randint(0, 10000)})
+        self.call("leaderboard", "GET", "/api/game/leaderboard/top/")
+        self.token = None
+
+
+class Command(BaseCommand):
+    help = (
+        "Run scripted player journeys (register, login, start, moves, attacks, pickups, end, leaderboard) "
+        "at a given concurrency and report throughput and p50/p95/p99 latency per endpoint."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--url", help="Base URL of a running server. Omitted: serve this project in-process.")
+        parser.add_argument("--concurrency", type=int, default=8, help="Simultaneous players")
+        parser.add_argument("--journeys", type=int, default=5, help="Games played per simulated player")
+        parser.add_argument("--moves", type=int, default=20)
+        parser.add_argument("--attacks", type=int, default=5)
+        parser.add_argument("--items", type=int, default=3)
+        parser.add_argument("--json", dest="json_path", help="Write the machine-readable report here")
+        parser.add_argument("--cleanup", action="store_true",
+                            help="Delete the generated players afterwards (same database only)")
+
+    def handle(self, *args, **options):
+        server = None
+        base_url = options["url"]
+        if base_url is None:
+            server = ThreadedWSGIServer(("127.0.0.1", 0), QuietHandler)
+            server.set_app(get_wsgi_application())
+            threading.Thread(target=server.serve_forever, daemon=True).start()
+            base_url = f"http://127.0.0.1:{server.server_address[1]}"
+
+        tag = uuid.uuid4().hex[:8]
+        latencies = defaultdict(list)
+        failures = defaultdict(int)
+        lock = threading.Lock()
+
+        def record(label, seconds, ok):
+            with lock:
+                latencies[label].append(seconds)
+                if not ok:
+                    failures[label] += 1
+
+        def run(worker):
+            player = Player(base_url, record)
+            for journey in range(options["journeys"]):
+                player.journey(f"loadtest_{tag}_{worker}_{journey}",
+                               options["moves"], options["attacks"], options["items"])
+
+        threads = [threading.Thread(target=run, args=(i,)) for i in range(options["concurrency"])]
+        try:
+            with Stopwatch() as timer:
+                for thread in threads:
+                    thread.start()
+                for thread in threads:
+                    thread.join()
+        finally:
+            if server is not None:
+                server.shutdown()
+                server.server_close()
+            if options["cleanup"]:
+                get_user_model().objects.filter(username__startswith=f"loadtest_{tag}_").delete()
+
+        report = self.report(options, base_url, timer.elapsed, latencies, failures)
+        if options["json_path"]:
+            with open(options["json_path"], "w") as fh:
+                json.dump(report, fh, indent=2, sort_keys=True)
+        if not report["total"]["requests"]:
+            raise CommandError("No requests completed.")
+
+    def report(self, options, base_url, elapsed, latencies, failures):
+        endpoints = {}
+        for label in sorted(latencies):
+            endpoints[label] = {**summarize(latencies[label], elapsed), "errors": failures[label]}
+        every = [value for values in latencies.values() for value in values]
+        report = {
+            "commit": self.commit(),
+            "target": base_url,
+            "config": {key: options[key] for key in ("concurrency", "journeys", "moves", "attacks", "items")},
+            "elapsed_s": round(elapsed, 3),
+            "endpoints": endpoints,
+            "total": {**summarize(every, elapsed), "errors": sum(failures.values())},
+        }
+
+        self.stdout.write(f"{'endpoint':<12} {'requests':>8} {'req/s':>9} {'p50 ms':>9} {'p95 ms':>9} "
+                          f"{'p99 ms':>9} {'errors':>7}")
+        for label, row in [*endpoints.items(), ("TOTAL", report["total"])]:
+            self.stdout.write(f"{label:<12} {row['requests']:>8} {row['throughput']:>9.1f} {row['p50_ms']:>9.2f} "
+                              f"{row['p95_ms']:>9.2f} {row['p99_ms']:>9.2f} {row['errors']:>7}")
+        return report
+
+    def commit(self):
+        try:
+            return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=settings.BASE_DIR,
+                                  capture_output=True, text=True, check=True).stdout.strip()
+        except (OSError, subprocess.CalledProcessError):
+            return None
@@ -0,0 +1,65 @@
+# Generated by Django 5.1.5 on 2026-10-18 17:51
+
+import json
+from collections import Counter
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def items_to_inventory(apps, schema_editor):
+    """Turn each session's JSON item list into (session, item, quantity) rows."""
+    GameSession = apps.get_model('game', 'GameSession')
+    InventoryItem = apps.get_model('game', 'InventoryItem')
+    rows = []
+    sessions = GameSession.objects.exclude(items__in=['', '[]']).values_list('id', 'items')
+    for session_id, items in sessions.iterator(chunk_size=2000):
+        try:
+            counts = Counter(str(item)[:100] for item in json.loads(items) if item is not None)
+        except (TypeError, ValueError):
+            continue
+        rows.extend(
+            InventoryItem(session_id=session_id, item=item, quantity=quantity)
+            for item, quantity in counts.items()
+        )
+        if len(rows) >= 2000:
+            InventoryItem.objects.bulk_create(rows)
+            rows = []
+    InventoryItem.objects.bulk_create(rows)
+
+
+def inventory_to_items(apps, schema_editor):
+    GameSession = apps.get_model('game', 'GameSession')
+    InventoryItem = apps.get_model('game', 'InventoryItem')
+    inventories = {}
+    for session_id, item, quantity in InventoryItem.objects.values_list('session_id', 'item', 'quantity').iterator():
+        inventories.setdefault(session_id, []).extend([item] * quantity)
+    for session_id, items in inventories.items():
+        GameSession.objects.filter(id=session_id).update(items=json.dumps(items))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('game', '0003_gamesession_health_gamesession_items'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='InventoryItem',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('item', models.CharField(max_length=100)),
+                ('quantity', models.PositiveIntegerField(default=0)),
+                ('session', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='inventory_items', to='game.gamesession')),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('session', 'item'), name='unique_inventory_item')],
+            },
+        ),
+        migrations.RunPython(items_to_inventory, inventory_to_items),
+        migrations.RemoveField(
+            model_name='gamesession',
+            name='items',
+        ),
+    ]
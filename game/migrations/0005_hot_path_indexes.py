@@ -0,0 +1,43 @@
+# Generated by Django 5.1.5 on 2026-10-18 18:04
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('game', '0004_inventoryitem'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='gamesession',
+            name='player',
+            field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AlterField(
+            model_name='inventoryitem',
+            name='session',
+            field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='inventory_items', to='game.gamesession'),
+        ),
+        migrations.AlterField(
+            model_name='playermove',
+            name='session',
+            field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, to='game.gamesession'),
+        ),
+        migrations.AddIndex(
+            model_name='gamesession',
+            index=models.Index(fields=['player', '-start_time'], name='session_player_start_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='leaderboard',
+            index=models.Index(fields=['-best_score', 'player'], name='leaderboard_best_score_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='playermove',
+            index=models.Index(fields=['session', 'timestamp', 'id'], name='move_session_time_idx'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.1.5 on 2026-10-18 18:19
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('game', '0005_hot_path_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='gamesession',
+            name='damage_taken',
+            field=models.PositiveIntegerField(default=0),
+        ),
+    ]
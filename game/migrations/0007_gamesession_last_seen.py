@@ -0,0 +1,32 @@
+# Generated by Django 5.1.5 on 2026-10-18 18:23
+
+import django.utils.timezone
+from django.conf import settings
+from django.db import migrations, models
+
+
+def seen_at_start(apps, schema_editor):
+    """Existing sessions were last seen, as far as we know, when they started."""
+    GameSession = apps.get_model('game', 'GameSession')
+    GameSession.objects.update(last_seen=models.F('start_time'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('game', '0006_gamesession_damage_taken'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='gamesession',
+            name='last_seen',
+            field=models.DateTimeField(default=django.utils.timezone.now),
+        ),
+        migrations.RunPython(seen_at_start, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='gamesession',
+            index=models.Index(condition=models.Q(('end_time__isnull', True)), fields=['last_seen'], name='session_active_seen_idx'),
+        ),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 5.1.5 on 2026-10-18 18:45
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('game', '0007_gamesession_last_seen'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ActivityRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('period', models.CharField(choices=[('hour', 'Hour'), ('day', 'Day')], max_length=4)),
+                ('bucket_start', models.DateTimeField()),
+                ('sessions_started', models.PositiveIntegerField(default=0)),
+                ('sessions_ended', models.PositiveIntegerField(default=0)),
+                ('score_total', models.BigIntegerField(default=0)),
+                ('moves', models.PositiveBigIntegerField(default=0)),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('period', 'bucket_start'), name='unique_activity_rollup')],
+            },
+        ),
+    ]
@@ -1,18 +1,40 @@
 # game/models.py
 
-from django.db import models
+from django.db import connections, models
 from django.conf import settings
 from django.utils.timezone import now
-import json  # Needed for inventory storage
+
+class GameSessionManager(models.Manager):
+    def write_health(self, rows):
+        """Store health and damage taken in one executemany; `rows` are (health, damage_taken, session_id)."""
+        connection = connections[self.db]
+        qn = connection.ops.quote_name
+        sql = (
+            f"UPDATE {qn(self.model._meta.db_table)} SET {qn('health')} = %s, {qn('damage_taken')} = %s "
+            f"WHERE {qn('id')} = %s"
+        )
+        with connection.cursor() as cursor:
+            cursor.executemany(sql, list(rows))
 
 class GameSession(models.Model):
     """Tracks when a player starts & ends a game session."""
-    player = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE)
+    player = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE,
+                               db_index=False)  # Covered by session_player_start_idx
     start_time = models.DateTimeField(default=now)
     end_time = models.DateTimeField(null=True, blank=True)
     score = models.IntegerField(default=0)
     health = models.IntegerField(default=100)  # New field: Health
-    items = models.TextField(default="[]")  # JSON-encoded inventory list
+    damage_taken = models.PositiveIntegerField(default=0)  # Total enemy damage over the session
+    last_seen = models.DateTimeField(default=now)  # Last heartbeat, persisted lazily (see live_state.py)
+
+    objects = GameSessionManager()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["player", "-start_time"], name="session_player_start_idx"),  # Player history
+            models.Index(fields=["last_seen"], condition=models.Q(end_time__isnull=True),
+                         name="session_active_seen_idx"),  # Stale session reaper
+        ]
 
     def __str__(self):
         return f"{self.player.username} - {self.score} points"
@@ -21,28 +43,139 @@ class GameSession(models.Model):
         """Check if player is still alive."""
         return self.health > 0
 
+    def survival_time(self):
+        """Seconds from start to end (or to now, while the game is running)."""
+        return ((self.end_time or now()) - self.start_time).total_seconds()
+
     def take_damage(self, damage):
         """Reduce player health."""
         self.health = max(0, self.health - damage)
-        self.save()
+        self.damage_taken += damage
+        self.save(update_fields=["health", "damage_taken"])
+
+    def collect_item(self, item, quantity=1):
+        """Add item to inventory (atomic counter increment)."""
+        InventoryItem.objects.add_items([(self.pk, item, quantity)])
+
+    def inventory(self):
+        """Inventory as {item: quantity}."""
+        return dict(self.inventory_items.values_list("item", "quantity"))
 
-    def collect_item(self, item):
-        """Add item to inventory."""
-        inventory = json.loads(self.items)  # Convert JSON string to list
-        inventory.append(item)
-        self.items = json.dumps(inventory)  # Convert back to JSON string
-        self.save()
+class InventoryItemManager(models.Manager):
+    def add_items(self, rows):
+        """Increment counters in one upsert; `rows` are (session_id, item, quantity) tuples."""
+        connection = connections[self.db]
+        qn = connection.ops.quote_name
+        table = qn(self.model._meta.db_table)
+        sql = (
+            f"INSERT INTO {table} ({qn('session_id')}, {qn('item')}, {qn('quantity')}) VALUES (%s, %s, %s) "
+            f"ON CONFLICT ({qn('session_id')}, {qn('item')}) "
+            f"DO UPDATE SET {qn('quantity')} = {table}.{qn('quantity')} + excluded.{qn('quantity')}"
+        )
+        with connection.cursor() as cursor:
+            cursor.executemany(sql, list(rows))
+
+class InventoryItem(models.Model):
+    """How many of an item a session holds."""
+    session = models.ForeignKey(GameSession, on_delete=models.CASCADE, related_name="inventory_items",
+                                db_index=False)  # Covered by unique_inventory_item
+    item = models.CharField(max_length=100)  # e.g., "Health Potion"
+    quantity = models.PositiveIntegerField(default=0)
+
+    objects = InventoryItemManager()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["session", "item"], name="unique_inventory_item"),
+        ]
+
+    def __str__(self):
+        return f"{self.item} x{self.quantity}"
 
 class PlayerMove(models.Model):
     """Logs actions taken by the player."""
-    session = models.ForeignKey(GameSession, on_delete=models.CASCADE)
+    session = models.ForeignKey(GameSession, on_delete=models.CASCADE,
+                                db_index=False)  # Covered by move_session_time_idx
     timestamp = models.DateTimeField(default=now)
     action = models.CharField(max_length=100)  # e.g., "clicked", "solved_puzzle"
 
+    class Meta:
+        indexes = [
+            models.Index(fields=["session", "timestamp", "id"], name="move_session_time_idx"),  # Session timeline
+        ]
+
+class LeaderboardManager(models.Manager):
+    def submit_scores(self, scores):
+        """Raise best scores in one conditional upsert; `scores` maps player_id -> score.
+
+        Rows are created if missing and only rewritten when the new score is
+        higher, so concurrent submissions can never lower a best score.
+        """
+        connection = connections[self.db]
+        qn = connection.ops.quote_name
+        table = qn(self.model._meta.db_table)
+        sql = (
+            f"INSERT INTO {table} ({qn('player_id')}, {qn('best_score')}) VALUES (%s, %s) "
+            f"ON CONFLICT ({qn('player_id')}) DO UPDATE SET {qn('best_score')} = excluded.{qn('best_score')} "
+            f"WHERE excluded.{qn('best_score')} > {table}.{qn('best_score')}"
+        )
+        with connection.cursor() as cursor:
+            cursor.executemany(sql, list(scores.items()))
+
 class Leaderboard(models.Model):
     """Tracks top players & scores."""
     player = models.OneToOneField(settings.AUTH_USER_MODEL, on_delete=models.CASCADE)
     best_score = models.IntegerField(default=0)
 
+    objects = LeaderboardManager()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["-best_score", "player"], name="leaderboard_best_score_idx"),  # Rankings
+        ]
+
     def __str__(self):
         return f"{self.player.username} - Best Score: {self.best_score}"
+
+class ActivityRollupManager(models.Manager):
+    def add_counts(self, rows):
+        """Add to bucket counters in one upsert.
+
+        `rows` are (period, bucket_start, sessions_started, sessions_ended, score_total, moves) tuples.
+        """
+        connection = connections[self.db]
+        qn = connection.ops.quote_name
+        table = qn(self.model._meta.db_table)
+        counters = ("sessions_started", "sessions_ended", "score_total", "moves")
+        columns = ", ".join(qn(name) for name in ("period", "bucket_start") + counters)
+        updates = ", ".join(f"{qn(name)} = {table}.{qn(name)} + excluded.{qn(name)}" for name in counters)
+        sql = (
+            f"INSERT INTO {table} ({columns}) VALUES (%s, %s, %s, %s, %s, %s) "
+            f"ON CONFLICT ({qn('period')}, {qn('bucket_start')}) DO UPDATE SET {updates}"
+        )
+        adapt = connection.ops.adapt_datetimefield_value
+        with connection.cursor() as cursor:
+            cursor.executemany(sql, [(period, adapt(start), *counts) for period, start, *counts in rows])
+
+class ActivityRollup(models.Model):
+    """Activity counters of one hour or day (UTC), maintained incrementally (see rollups.py)."""
+    HOUR = "hour"
+    DAY = "day"
+    PERIOD_CHOICES = [(HOUR, "Hour"), (DAY, "Day")]
+
+    period = models.CharField(max_length=4, choices=PERIOD_CHOICES)
+    bucket_start = models.DateTimeField()
+    sessions_started = models.PositiveIntegerField(default=0)
+    sessions_ended = models.PositiveIntegerField(default=0)
+    score_total = models.BigIntegerField(default=0)  # Final scores of the sessions ended in the bucket
+    moves = models.PositiveBigIntegerField(default=0)
+
+    objects = ActivityRollupManager()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["period", "bucket_start"], name="unique_activity_rollup"),
+        ]
+
+    def __str__(self):
+        return f"{self.period} {self.bucket_start:%Y-%m-%d %H:%M}"
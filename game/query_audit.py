@@ -0,0 +1,192 @@
+# game/query_audit.py
+"""
+EXPLAIN QUERY PLAN audit of the queries on the request hot paths.
+
+`hot_queries()` lists the hot paths: the API views, called through the test
+client as a game client would call them, and the background workers, called
+directly. `audit()` plays them in order for a throwaway admin player, inside
+one transaction that is rolled back, so nothing it writes is kept. Every
+statement is explained by a connection.execute_wrapper (PlanCollector) just
+before it runs, so the audited SQL is what the code actually sends, ORM
+querysets and the raw upserts in models.py alike. A query added to a view
+or worker is audited without anyone listing it here.
+
+A plan step is flagged when it scans a whole table without an index or sorts
+into a temporary b-tree. "SCAN ... USING INDEX" is an index walked in order
+(a top-N query stopping at its LIMIT) and passes. Entries that read a whole table on purpose (the
+leaderboard index rebuild) set allow_scan. Run it with
+`manage.py audit_indexes`; the test suite runs it too, so a new query or a
+dropped index shows up as a failing test.
+"""
+
+import json
+from collections import namedtuple
+from datetime import timedelta
+
+from django.contrib.auth import get_user_model
+from django.contrib.sessions.backends.db import SessionStore
+from django.db import connection, transaction
+from django.test import Client, override_settings
+from django.utils.timezone import now
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from authentication.authentication import token_cache, user_cache
+from .ingest import move_ingestor
+from .leaderboard_index import leaderboard_index
+from .live_state import live_sessions
+from .maintenance import purge_expired_sessions
+from .models import GameSession
+from .reaper import reap_stale_sessions
+from .rollups import activity_rollups
+from .throttling import limiter
+
+HotQuery = namedtuple("HotQuery", "label run allow_scan")
+
+PASSWORD = "audit-password"
+
+
+class PlanCollector:
+    """execute_wrapper that records the query plan of each statement, then runs it."""
+
+    def __init__(self):
+        self.plans = []  # (sql, [plan detail, ...])
+
+    def __call__(self, execute, sql, params, many, context):
+        if many:
+            params = list(params)
+        cursor = context["cursor"].cursor  # Backend cursor: no wrappers, placeholders still converted
+        cursor.execute("EXPLAIN QUERY PLAN " + sql, params[0] if many and params else params)
+        self.plans.append((sql, [row[-1] for row in cursor.fetchall()]))
+        return execute(sql, params, many, context)
+
+
+class _Rollback(Exception):
+    pass
+
+
+class Player:
+    """A throwaway admin with a game in progress and a game abandoned an hour ago."""
+
+    def __init__(self):
+        User = get_user_model()
+        self.user = User.objects.create_user(username=f"query-audit-{now().timestamp()}", password=PASSWORD,
+                                             role="admin")
+        token = RefreshToken.for_user(self.user).access_token
+        self.api = Client(headers={"authorization": f"Bearer {token}"})
+        self.browser = Client()
+        self.browser.force_login(self.user)
+        an_hour_ago = now() - timedelta(hours=1)
+        GameSession.objects.create(player=self.user, start_time=an_hour_ago, last_seen=an_hour_ago)
+        expired = SessionStore()
+        expired.set_expiry(-1)
+        expired.create()
+        self.session_id = None
+
+    def call(self, method, path, data=None):
+        client = self.browser if method == "PAGE" else self.api
+        if method == "POST":
+            response = client.post(path, data or {}, content_type="application/json")
+        else:
+            response = client.get(path, data or {})
+        if response.status_code >= 400:
+            raise RuntimeError(f"{method} {path} answered {response.status_code}; the audit scenario is broken.")
+        if response.streaming:
+            return b"".join(response.streaming_content)
+        return response.content
+
+    def start(self):
+        self.session_id = json.loads(self.call("POST", "/api/game/start/"))["session_id"]
+
+    def move(self):
+        self.call("POST", "/api/game/move/", {"session_id": self.session_id, "action": "jump"})
+        move_ingestor.flush_session(self.session_id)
+
+
+def hot_queries(player):
+    """The hot paths, in the order a game goes through them, for `player`."""
+    def session(**data):
+        return {"session_id": player.session_id, **data}  # Known once the start call has run
+
+    return [
+        # authentication
+        HotQuery("POST /api/auth/login/", lambda: player.call(
+            "POST", "/api/auth/login/", {"username": player.user.username, "password": PASSWORD}
+        ), False),
+        # game/views.py; the first API call also loads the JWT user
+        HotQuery("POST /api/game/start/", player.start, False),
+        HotQuery("POST /api/game/heartbeat/", lambda: player.call("POST", "/api/game/heartbeat/", session()), False),
+        HotQuery("POST /api/game/move/ (and its batch insert)", player.move, False),
+        HotQuery("POST /api/game/enemy-attack/", lambda: player.call(
+            "POST", "/api/game/enemy-attack/", session()
+        ), False),
+        HotQuery("POST /api/game/collect-item/", lambda: player.call(
+            "POST", "/api/game/collect-item/", session(item="Sword")
+        ), False),
+        HotQuery("live state flush", live_sessions.flush, False),
+        HotQuery("GET /api/game/survival-time/", lambda: player.call(
+            "GET", "/api/game/survival-time/", session()
+        ), False),
+        HotQuery("GET /api/game/sessions/<id>/replay/", lambda: player.call(
+            "GET", f"/api/game/sessions/{player.session_id}/replay/"
+        ), False),
+        HotQuery("leaderboard index rebuild", leaderboard_index.load, True),
+        HotQuery("POST /api/game/end/", lambda: player.call("POST", "/api/game/end/", session(score=10)), False),
+        HotQuery("GET /api/game/leaderboard/top/", lambda: player.call("GET", "/api/game/leaderboard/top/"), False),
+        HotQuery("GET /api/game/leaderboard/page/", lambda: player.call("GET", "/api/game/leaderboard/page/"), False),
+        HotQuery("GET /api/game/leaderboard/around/", lambda: player.call(
+            "GET", "/api/game/leaderboard/around/"
+        ), False),
+        HotQuery("GET /api/game/leaderboard/ (page, session login)", lambda: player.call(
+            "PAGE", "/api/game/leaderboard/"
+        ), False),
+        HotQuery("GET /api/auth/admin-dashboard/", lambda: player.call("GET", "/api/auth/admin-dashboard/"), False),
+        # Background workers
+        HotQuery("stale session reaper", reap_stale_sessions, False),
+        HotQuery("expired session purge", lambda: purge_expired_sessions(max_batches=1), False),
+        HotQuery("rollup counter flush", activity_rollups.flush, False),
+    ]
+
+
+def find_problems(plan):
+    """Plan steps that read a whole table or sort without an index."""
+    return [step for step in plan
+            if (step.startswith("SCAN ") and " USING " not in step) or "TEMP B-TREE" in step]
+
+
+def explain(run):
+    """Plans of every statement `run` issues, as [(sql, [detail, ...]), ...]."""
+    if connection.vendor != "sqlite":
+        raise NotImplementedError("The query audit reads SQLite's EXPLAIN QUERY PLAN output.")
+    collector = PlanCollector()
+    with connection.execute_wrapper(collector):
+        run()
+    return collector.plans
+
+
+def audit(queries=None):
+    """[(HotQuery, [(sql, plan, problems), ...]), ...] for hot_queries() (or `queries`).
+
+    Runs with the background workers off (the scenario drains what it queues)
+    and rolls back everything it wrote, then drops what the in-process caches
+    learnt about the throwaway player.
+    """
+    results = []
+    try:
+        with override_settings(GAME_BACKGROUND_WORKERS=False), transaction.atomic():
+            for query in queries if queries is not None else hot_queries(Player()):
+                statements = []
+                for sql, plan in explain(query.run):
+                    problems = [] if query.allow_scan else find_problems(plan)
+                    statements.append((sql, plan, problems))
+                results.append((query, statements))
+            live_sessions.clear()  # Writes back what is still buffered before it is rolled back
+            raise _Rollback
+    except _Rollback:
+        pass
+    finally:
+        leaderboard_index.invalidate()
+        activity_rollups.clear()
+        token_cache.clear()
+        user_cache.clear()
+        limiter.reset()
+    return results
@@ -0,0 +1,171 @@
+# game/realtime.py
+"""
+WebSocket game channel, mounted at /ws/game/ by mygame/asgi.py.
+
+A client authenticates once, binds to a GameSession and then streams actions
+over the same connection, skipping per-request authentication, middleware and
+session lookups. The session's live state stays pinned in memory for the
+connection's lifetime. Protocol (JSON text frames):
+
+    -> {"type": "auth", "token": "<JWT access token>", "session_id": 12}
+    <- {"type": "ready", "session_id": 12, "health": 100}
+    -> {"type": "attack"}
+    -> {"type": "collect", "item": "Health Potion"}
+    -> {"type": "move", "action": "jump"}
+    -> {"type": "heartbeat"}                (any message counts as one)
+    -> {"type": "end", "score": 120}      (the server closes the socket afterwards)
+    <- {"type": "tick", "remaining_health": 85, ...}   (pushed when the tick engine is enabled,
+    <- {"type": "game_over", ...}                        see ticks.py)
+
+Omit "session_id" in the auth message to start a new game. Replies carry the
+request's "type" (plus its "ref", if given) and the same fields as the REST
+endpoints; refusals come back as {"type": "error", "error": "..."}. Attacks, collects and
+moves share the REST endpoints' per-user rate limits (throttling.py).
+"""
+
+import asyncio
+import json
+import math
+
+from asgiref.sync import sync_to_async
+from rest_framework import status
+from rest_framework_simplejwt.exceptions import AuthenticationFailed, InvalidToken, TokenError
+
+from authentication.authentication import CachedJWTAuthentication
+
+from . import actions
+from .actions import GameActionError, ticks_enabled
+from .live_state import live_sessions
+from .throttling import limiter
+
+CLOSE_NORMAL = 1000
+CLOSE_UNAUTHORIZED = 4401
+CLOSE_NOT_FOUND = 4404
+THROTTLED = {"attack", "collect", "move"}  # Message types that take a token (scopes in throttling.py)
+
+
+class GameConnection:
+    """State of one WebSocket connection: the player and their pinned session."""
+
+    def __init__(self, notify=None):
+        self.player = None
+        self.session = None
+        self.notify = notify  # (event loop, async callable) receiving tick engine pushes
+
+    def handle(self, message):
+        """Run one client message. Returns (reply, keep_open)."""
+        kind = message.get("type")
+        if not isinstance(kind, str):
+            raise GameActionError("Malformed message!")
+        if kind == "auth":
+            return self.authenticate(message), True
+        if self.session is None:
+            raise GameActionError("Authenticate first!", status.HTTP_401_UNAUTHORIZED)
+        actions.seen(self.session)
+        if kind == "heartbeat":
+            return actions.heartbeat(self.session), True
+        if kind in THROTTLED:
+            wait = limiter.take(kind, self.player.pk)
+            if wait:
+                raise GameActionError(f"Too many {kind} messages; retry in {math.ceil(wait)}s.",
+                                      status.HTTP_429_TOO_MANY_REQUESTS, {"Retry-After": str(math.ceil(wait))})
+        if kind == "attack":
+            return actions.enemy_attack(self.session), True
+        if kind == "collect":
+            return actions.collect_item(self.session, message.get("item")), True
+        if kind == "move":
+            return actions.log_move(self.session, message.get("action")), True
+        if kind == "end":
+            score = actions.parse_score(message.get("score", 0))
+            result = actions.end_game(self.player, self.session.session_id, score)
+            self.release()
+            return result, False
+        raise GameActionError(f"Unknown message type {kind!r}!")
+
+    def authenticate(self, message):
+        if self.session is not None:
+            raise GameActionError("Already bound to a session!")
+        auth = CachedJWTAuthentication()
+        try:
+            player = auth.get_user(auth.get_validated_token(str(message.get("token", ""))))
+        except (InvalidToken, TokenError, AuthenticationFailed):
+            raise GameActionError("Invalid token!", status.HTTP_401_UNAUTHORIZED)
+
+        session_id = message.get("session_id")
+        if session_id is None:
+            session_id = actions.start_game(player)["session_id"]
+        session = actions.get_session(session_id, player)
+        live_sessions.pin(session)
+        if ticks_enabled() and self.notify is not None and session.is_alive():
+            from .ticks import tick_engine
+
+            tick_engine.register(session, self.notify)
+        self.player, self.session = player, session
+        return {"session_id": session.session_id, "health": session.health}
+
+    def release(self):
+        if self.session is not None:
+            if self.session.engine is not None:
+                self.session.engine.unsubscribe(self.session)
+            live_sessions.unpin(self.session)
+            self.session = None
+
+
+async def game_socket(scope, receive, send):
+    """ASGI application for one WebSocket connection."""
+
+    async def push(message):
+        try:
+            await send({"type": "websocket.send", "text": json.dumps(message)})
+        except Exception:  # The socket closed under us; release() unsubscribes
+            pass
+
+    connection = GameConnection(notify=(asyncio.get_running_loop(), push))
+    handle = sync_to_async(connection.handle)
+    if ticks_enabled():
+        from .ticks import tick_engine
+
+        tick_engine.ensure_running()
+    try:
+        while True:
+            event = await receive()
+            if event["type"] == "websocket.connect":
+                await send({"type": "websocket.accept"})
+            elif event["type"] == "websocket.disconnect":
+                break
+            elif event["type"] == "websocket.receive":
+                keep_open, close_code = True, CLOSE_NORMAL
+                try:
+                    message = json.loads(event.get("text") or event.get("bytes") or b"")
+                    if not isinstance(message, dict):
+                        raise ValueError(message)
+                except ValueError:
+                    reply = {"type": "error", "error": "Malformed message!"}
+                else:
+                    try:
+                        result, keep_open = await handle(message)
+                        reply = {"type": message.get("type"), **result}
+                    except GameActionError as error:
+                        reply = {"type": "error", "error": error.message}
+                        if error.status == status.HTTP_401_UNAUTHORIZED:
+                            keep_open, close_code = False, CLOSE_UNAUTHORIZED
+                    if message.get("type") == "auth" and keep_open:
+                        reply["type"] = "ready"
+                    if "ref" in message:
+                        reply["ref"] = message["ref"]
+                await send({"type": "websocket.send", "text": json.dumps(reply)})
+                if not keep_open:
+                    await send({"type": "websocket.close", "code": close_code})
+                    break
+    finally:
+        await sync_to_async(connection.release)()
+
+
+async def websocket_router(scope, receive, send):
+    """Dispatch WebSocket connections by path."""
+    if scope["path"] == "/ws/game/":
+        await game_socket(scope, receive, send)
+        return
+    event = await receive()
+    if event["type"] == "websocket.connect":
+        await send({"type": "websocket.close", "code": CLOSE_NOT_FOUND})
@@ -0,0 +1,79 @@
+# game/reaper.py
+"""
+Auto-ending of abandoned game sessions.
+
+Clients send heartbeats (or any session action) while a game is open; the
+live state keeps the latest one in memory and persists it lazily (see
+live_state.py). Sessions whose last_seen is older than
+GAME_SESSION_REAPER["TIMEOUT"] seconds are ended in batches, with end_time
+set to their last heartbeat, so survival times stay accurate and open
+sessions cannot pile up.
+
+Before ending a batch the reaper writes out any newer heartbeat held by this
+process, and the end itself is a conditional UPDATE (still open, still
+stale), so a session kept alive by another worker process is never ended as
+long as TIMEOUT exceeds GAME_LIVE_STATE["LAST_SEEN_INTERVAL"] plus
+GAME_LIVE_STATE["FLUSH_INTERVAL"].
+"""
+
+import time
+from collections import Counter
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F
+from django.utils.timezone import now
+
+from .background import PeriodicWorker
+from .live_state import live_sessions
+from .models import GameSession
+from .rollups import activity_rollups, hour_start
+
+DEFAULTS = {
+    "TIMEOUT": 120,  # Seconds without a heartbeat before a session is ended
+    "INTERVAL": 30,  # Seconds between reaper runs
+    "BATCH_SIZE": 500,  # Sessions ended per UPDATE
+}
+
+
+def get_config():
+    return {**DEFAULTS, **getattr(settings, "GAME_SESSION_REAPER", {})}
+
+
+def reap_stale_sessions(timeout=None, batch_size=None, max_batches=None, pause=0):
+    """End open sessions not seen for `timeout` seconds, `batch_size` at a time.
+
+    Sleeps `pause` seconds between batches. Returns the number of sessions ended.
+    """
+    config = get_config()
+    timeout = config["TIMEOUT"] if timeout is None else timeout
+    batch_size = batch_size or config["BATCH_SIZE"]
+    cutoff = now() - timedelta(seconds=timeout)
+    ended = batches = 0
+    while True:
+        candidates = list(GameSession.objects.filter(end_time__isnull=True, last_seen__lt=cutoff)
+                          .order_by("last_seen").values_list("id", flat=True)[:batch_size])
+        if not candidates:
+            break
+        fresh = live_sessions.sync_last_seen(candidates, cutoff)
+        stale = [session_id for session_id in candidates if session_id not in fresh]
+        for session_id in stale:
+            live_sessions.finish(session_id)  # Write back buffered health/inventory first
+        with transaction.atomic():
+            ending = GameSession.objects.filter(id__in=stale, end_time__isnull=True, last_seen__lt=cutoff)
+            end_times = list(ending.values_list("last_seen", flat=True))
+            batch_ended = ending.update(end_time=F("last_seen"))
+        # Counted in the hour they ended in, as backfill() does. Abandoned games score 0.
+        for hour, count in Counter(hour_start(end_time) for end_time in end_times).items():
+            activity_rollups.add(hour, sessions_ended=count)
+        ended += batch_ended
+        batches += 1
+        if len(candidates) < batch_size or (max_batches is not None and batches >= max_batches):
+            break
+        if pause:
+            time.sleep(pause)
+    return ended
+
+
+session_reaper = PeriodicWorker("game-session-reaper", reap_stale_sessions, get_config()["INTERVAL"])
@@ -0,0 +1,59 @@
+# game/replay.py
+"""
+NDJSON replay of a session's moves.
+
+`stream_moves` yields the moves of one session, hot and archived (see
+archive.py), as one JSON object per line in (timestamp, id) order with the
+fields of PlayerMoveSerializer. Rows come from a server-side cursor
+(`iterator(chunk_size=...)`) and memory-mapped segment slices and are encoded
+a batch of lines at a time, so memory use does not grow with the length of
+the session, under WSGI and ASGI alike (see mygame/streaming.py). A client
+that lost the stream resumes from the last line it received with
+`after=<timestamp>,<id>`.
+"""
+
+import json
+
+from django.utils.dateparse import parse_datetime
+from rest_framework import serializers
+
+from .archive import move_archive
+from .serializers import PlayerMoveSerializer
+
+FIELDS = PlayerMoveSerializer.Meta.fields
+LINES_PER_CHUNK = 500  # Lines joined into one chunk of the streaming response
+
+
+def make_cursor(line):
+    """The `after` value resuming just past a decoded NDJSON line."""
+    return f"{line['timestamp']},{line['id']}"
+
+
+def parse_cursor(raw):
+    """(timestamp, id) from `after`, None for no cursor. Raises ValueError on garbage."""
+    if not raw:
+        return None
+    timestamp, move_id = raw.rsplit(",", 1)
+    parsed = parse_datetime(timestamp)
+    if parsed is None or parsed.tzinfo is None:
+        raise ValueError(f"Invalid timestamp {timestamp!r}")
+    return parsed, int(move_id)
+
+
+def stream_moves(session_id, after=None, lines_per_chunk=None):
+    """Yield NDJSON-encoded moves of `session_id` in chunks of `lines_per_chunk` lines."""
+    lines_per_chunk = lines_per_chunk or LINES_PER_CHUNK
+    timestamp_field = serializers.DateTimeField()
+    encode = json.JSONEncoder(ensure_ascii=False, separators=(",", ":")).encode
+    lines = []
+    for move_id, session, timestamp, action in move_archive.session_moves(session_id, after):
+        row = {"id": move_id, "session": session, "timestamp": timestamp_field.to_representation(timestamp),
+               "action": action}
+        lines.append(encode({field: row[field] for field in FIELDS}))
+        if len(lines) >= lines_per_chunk:
+            lines.append("")
+            yield "\n".join(lines).encode()
+            lines = []
+    if lines:
+        lines.append("")
+        yield "\n".join(lines).encode()
@@ -0,0 +1,227 @@
+# game/rollups.py
+"""
+Hourly and daily activity counters for the admin dashboard.
+
+Starting a game, ending one (by the player or the reaper) and writing moves
+add to per-bucket counters held in process memory: sessions started,
+sessions ended, the sum of their final scores, and moves. A background
+flusher adds them to the ActivityRollup rows every FLUSH_INTERVAL seconds
+with one additive upsert, so every worker process can contribute to the same
+bucket. `dashboard_stats()` reads the rollup rows of the last HOURS_SHOWN
+hours and DAYS_SHOWN days plus this process's unflushed counts; it never
+aggregates GameSession or PlayerMove.
+
+Buckets are UTC hours and days. Sessions are counted in the bucket of their
+start and of their end. The reaper ends a session at its last heartbeat,
+so such a session counts in the hour of its last_seen, not in the hour the
+reaper ran. `backfill()` (the backfill_rollups command) rebuilds every
+bucket before the current hour from the tables and the move archive with
+numpy, and reads the same end_time. Counts still buffered in other processes for
+those hours (at most FLUSH_INTERVAL seconds' worth) are added on top
+when they flush.
+"""
+
+import threading
+from collections import defaultdict
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Q
+from django.utils.timezone import now
+
+from .background import PeriodicWorker
+from .models import ActivityRollup, GameSession, PlayerMove
+
+DEFAULTS = {
+    "FLUSH_INTERVAL": 10,  # Seconds between additive upserts of the buffered counts
+    "HOURS_SHOWN": 24,  # Hourly buckets in the dashboard
+    "DAYS_SHOWN": 30,  # Daily buckets the average score is taken over
+}
+
+COUNTERS = ("sessions_started", "sessions_ended", "score_total", "moves")
+HOUR = timedelta(hours=1)
+DAY = timedelta(days=1)
+
+
+def get_config():
+    return {**DEFAULTS, **getattr(settings, "GAME_ROLLUPS", {})}
+
+
+def hour_start(moment):
+    return moment.replace(minute=0, second=0, microsecond=0)
+
+
+def day_start(moment):
+    return moment.replace(hour=0, minute=0, second=0, microsecond=0)
+
+
+class RollupCounters:
+    """Per-bucket counts of this process not yet added to the ActivityRollup table."""
+
+    def __init__(self, flush_interval=None):
+        self._lock = threading.Lock()
+        self._pending = defaultdict(lambda: [0] * len(COUNTERS))  # (period, bucket_start) -> counts
+        self.writer = PeriodicWorker(
+            "game-rollup-flusher", self.flush,
+            flush_interval if flush_interval is not None else get_config()["FLUSH_INTERVAL"],
+        )
+
+    def add(self, moment, sessions_started=0, sessions_ended=0, score_total=0, moves=0):
+        """Count activity that happened at `moment` (an aware datetime)."""
+        counts = (sessions_started, sessions_ended, score_total, moves)
+        hour = hour_start(moment)
+        with self._lock:
+            for key in ((ActivityRollup.HOUR, hour), (ActivityRollup.DAY, day_start(hour))):
+                bucket = self._pending[key]
+                for i, count in enumerate(counts):
+                    bucket[i] += count
+        self.writer.ensure_started()
+
+    def add_moves(self, timestamps):
+        """Count a batch of moves by the hour of each timestamp."""
+        hours = defaultdict(int)
+        for timestamp in timestamps:
+            hours[hour_start(timestamp)] += 1
+        for hour, count in hours.items():
+            self.add(hour, moves=count)
+
+    def pending(self):
+        with self._lock:
+            return {key: list(counts) for key, counts in self._pending.items()}
+
+    def flush(self):
+        """Add the buffered counts to the table. Returns the number of buckets written."""
+        with self._lock:
+            pending, self._pending = self._pending, defaultdict(lambda: [0] * len(COUNTERS))
+        if not pending:
+            return 0
+        try:
+            ActivityRollup.objects.add_counts((period, start, *counts) for (period, start), counts in pending.items())
+        except Exception:
+            with self._lock:  # Keep them for the next flush
+                for key, counts in pending.items():
+                    bucket = self._pending[key]
+                    for i, count in enumerate(counts):
+                        bucket[i] += count
+            raise
+        return len(pending)
+
+    def clear(self):
+        with self._lock:
+            self._pending.clear()
+
+
+activity_rollups = RollupCounters()
+
+
+def dashboard_stats(counters=activity_rollups):
+    """Operational stats from the rollup rows plus `counters`' unflushed counts."""
+    config = get_config()
+    current = now()
+    this_hour, today = hour_start(current), day_start(current)
+    first_hour = this_hour - (config["HOURS_SHOWN"] - 1) * HOUR
+    first_day = today - (config["DAYS_SHOWN"] - 1) * DAY
+
+    buckets = defaultdict(lambda: [0] * len(COUNTERS))
+    rows = (ActivityRollup.objects
+            .filter(Q(period=ActivityRollup.HOUR, bucket_start__gte=first_hour)
+                    | Q(period=ActivityRollup.DAY, bucket_start__gte=first_day))
+            .values_list("period", "bucket_start", *COUNTERS))
+    for period, start, *counts in rows:
+        buckets[(period, start)] = counts
+    for key, counts in counters.pending().items():
+        bucket = buckets[key]
+        for i, count in enumerate(counts):
+            bucket[i] += count
+
+    def counts(period, start):
+        return dict(zip(COUNTERS, buckets.get((period, start), [0] * len(COUNTERS))))
+
+    hours = [first_hour + i * HOUR for i in range(config["HOURS_SHOWN"])]
+    per_hour = [{"hour": hour.isoformat(), "sessions_started": counts(ActivityRollup.HOUR, hour)["sessions_started"],
+                 "sessions_ended": counts(ActivityRollup.HOUR, hour)["sessions_ended"]} for hour in hours]
+    days = [counts(ActivityRollup.DAY, first_day + i * DAY) for i in range(config["DAYS_SHOWN"])]
+    ended = sum(day["sessions_ended"] for day in days)
+    current_hour = counts(ActivityRollup.HOUR, this_hour)
+    previous_hour = counts(ActivityRollup.HOUR, this_hour - HOUR)
+    minutes = max((current - this_hour).total_seconds() / 60, 1)
+
+    return {
+        "active_sessions": GameSession.objects.filter(end_time__isnull=True).count(),  # Partial index count
+        "sessions_per_hour": per_hour,
+        "sessions_today": counts(ActivityRollup.DAY, today)["sessions_started"],
+        "average_score": sum(day["score_total"] for day in days) / ended if ended else None,
+        "moves_per_minute": {
+            "current_hour": current_hour["moves"] / minutes,
+            "previous_hour": previous_hour["moves"] / 60,
+        },
+    }
+
+
+def backfill(before=None, chunk_size=50000):
+    """Rebuild the rollup rows of every hour before `before` (default: the current hour) from history.
+
+    Today's daily row keeps the hourly rows from `before` on. Returns the number of rows written.
+    """
+    import numpy as np  # Only the backfill needs numpy; keep it out of worker startup
+
+    from .analytics import _as_micros, _fetch_chunks
+    from .archive import from_micros, move_archive, to_micros
+
+    before = hour_start(before or now())
+    limit = to_micros(before)
+    hour_micros = 3600 * 10**6
+    missing = np.iinfo(np.int64).min  # NULL datetimes become NaT
+    totals = {name: defaultdict(int) for name in COUNTERS}  # counter -> {hour number: count}
+
+    def count(name, micros, weights=None):
+        keep = (micros != missing) & (micros < limit)
+        hours, inverse = np.unique(micros[keep] // hour_micros, return_inverse=True)
+        sums = np.bincount(inverse, weights=None if weights is None else weights[keep], minlength=len(hours))
+        for hour, total in zip(hours.tolist(), sums.tolist()):
+            totals[name][hour] += int(total)
+
+    sessions = GameSession.objects.filter(start_time__lt=before).values_list("start_time", "end_time", "score")
+    for rows in _fetch_chunks(sessions, chunk_size):
+        starts, ends, scores = zip(*rows)
+        count("sessions_started", _as_micros(starts))
+        ends = _as_micros(ends)
+        count("sessions_ended", ends)
+        count("score_total", ends, np.array(scores, np.int64))
+    for rows in _fetch_chunks(PlayerMove.objects.filter(timestamp__lt=before).values_list("timestamp"), chunk_size):
+        count("moves", _as_micros([row[0] for row in rows]))
+    for segment in move_archive.segments():
+        if not segment.meta.get("deleted"):
+            continue  # Its rows are still (partly) in the hot table, counted above
+        column = segment.column("timestamp")
+        for start in range(0, len(column), chunk_size):
+            count("moves", np.asarray(column[start:start + chunk_size]))
+
+    hourly = defaultdict(lambda: [0] * len(COUNTERS))
+    for i, name in enumerate(COUNTERS):
+        for hour, total in totals[name].items():
+            hourly[hour][i] = total
+    daily = defaultdict(lambda: [0] * len(COUNTERS))
+    for hour, counts in hourly.items():
+        day = daily[hour // 24]
+        for i, total in enumerate(counts):
+            day[i] += total
+    today = day_start(before)
+    with transaction.atomic():
+        # Today's row also covers the hours from `before` on, which only the live counters have counted.
+        later = (ActivityRollup.objects.filter(period=ActivityRollup.HOUR, bucket_start__gte=before,
+                                               bucket_start__lt=today + DAY).values_list(*COUNTERS))
+        for counts in later:
+            day = daily[to_micros(today) // (24 * hour_micros)]
+            for i, total in enumerate(counts):
+                day[i] += total
+
+        ActivityRollup.objects.filter(period=ActivityRollup.HOUR, bucket_start__lt=before).delete()
+        ActivityRollup.objects.filter(period=ActivityRollup.DAY, bucket_start__lte=today).delete()
+        objects = [ActivityRollup(period=ActivityRollup.HOUR, bucket_start=from_micros(hour * hour_micros),
+                                  **dict(zip(COUNTERS, counts))) for hour, counts in hourly.items()]
+        objects += [ActivityRollup(period=ActivityRollup.DAY, bucket_start=from_micros(day * 24 * hour_micros),
+                                   **dict(zip(COUNTERS, counts))) for day, counts in daily.items()]
+        ActivityRollup.objects.bulk_create(objects, batch_size=1000)
+    return len(objects)
@@ -0,0 +1,63 @@
+# game/scores.py
+"""
+Best-score submission for end_game.
+
+Each submission is a single conditional upsert (`Leaderboard.objects.submit_scores`),
+so there is no read-modify-write in Python and concurrent submissions for the
+same player cannot lose the higher score. Submissions arriving within
+GAME_SCORE_SUBMISSION["COALESCE_WINDOW"] seconds are merged per player (keeping
+the max) and written together, so a burst for one player costs one write.
+"""
+
+import threading
+
+from django.conf import settings
+
+from .background import PeriodicWorker
+from .models import Leaderboard
+
+DEFAULTS = {
+    "COALESCE_WINDOW": 0.05,  # Seconds; 0 writes every submission immediately
+}
+
+
+def get_config():
+    return {**DEFAULTS, **getattr(settings, "GAME_SCORE_SUBMISSION", {})}
+
+
+class ScoreSubmitter:
+    """Coalesces best-score submissions per player and upserts them in one statement."""
+
+    def __init__(self, window=None):
+        self.window = get_config()["COALESCE_WINDOW"] if window is None else window
+        self._pending = {}  # player_id -> highest pending score
+        self._lock = threading.Lock()
+        self.writer = PeriodicWorker("game-score-writer", self.flush, self.window)
+
+    def submit(self, player_id, score):
+        """Raise `player_id`'s best score to at least `score`."""
+        if not self.window or not getattr(settings, "GAME_BACKGROUND_WORKERS", True):
+            Leaderboard.objects.submit_scores({player_id: score})
+            return
+        with self._lock:
+            if score > self._pending.get(player_id, score - 1):
+                self._pending[player_id] = score
+        self.writer.ensure_started()
+
+    def flush(self):
+        """Write all pending scores. Returns the number of players written."""
+        with self._lock:
+            pending, self._pending = self._pending, {}
+        if pending:
+            try:
+                Leaderboard.objects.submit_scores(pending)
+            except Exception:
+                with self._lock:
+                    for player_id, score in pending.items():
+                        if score > self._pending.get(player_id, score - 1):
+                            self._pending[player_id] = score
+                raise
+        return len(pending)
+
+
+score_submitter = ScoreSubmitter()
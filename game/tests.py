@@ -1,8 +1,41 @@
 # game/tests.py
-from django.test import TestCase
+import gzip
+import json
+import os
+import shutil
+import tempfile
+import threading
+from datetime import timedelta
+from unittest import mock
+import numpy as np
+from asgiref.sync import async_to_sync
+from asgiref.testing import ApplicationCommunicator
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
 from django.contrib.auth import get_user_model
-from .models import GameSession, PlayerMove, Leaderboard
+from django.db import connection
+from rest_framework import status
+from rest_framework.test import APITestCase, APITransactionTestCase
+from rest_framework_simplejwt.tokens import RefreshToken
+from mygame.asgi import application
+from .models import ActivityRollup, GameSession, PlayerMove, Leaderboard, InventoryItem
+from .live_state import live_sessions
+from .ingest import MoveIngestor, move_ingestor
+from .leaderboard_index import leaderboard_index
+from .scores import ScoreSubmitter
+from .bench import percentile, summarize
+from .query_audit import HotQuery, audit
+from .archive import MoveArchive, move_archive, to_micros
+from .replay import make_cursor
+from .reaper import reap_stale_sessions
+from .rollups import activity_rollups
+from .ticks import TickEngine
+from .throttling import LocalBuckets, SharedBuckets, SHED_METRIC, limiter
+from . import actions, analytics, maintenance, replay, rollups
 from django.utils.timezone import now
+from mygame.metrics import registry
 
 User = get_user_model()
 
@@ -60,7 +93,935 @@ class GameMechanicsTests(TestCase):
     def test_collect_item(self):
         """Test if collecting an item works."""
         self.game_session.collect_item("Health Potion")
-        self.assertIn("Health Potion", self.game_session.items)
+        self.assertIn("Health Potion", self.game_session.inventory())
 
         # Ensure health is restored
-        self.assertEqual(self.game_session.health, min(100, self.game_session.health + 20))
\ No newline at end of file
+        self.assertEqual(self.game_session.health, min(100, self.game_session.health + 20))
+
+class LiveSessionStateTests(APITestCase):
+    """Health and inventory changes are buffered in memory and written back in batches."""
+
+    def setUp(self):
+        self.user = User.objects.create_user(username="liveuser", password="password123")
+        self.game_session = GameSession.objects.create(player=self.user)
+        self.client.force_authenticate(self.user)
+
+    def tearDown(self):
+        live_sessions.clear()
+
+    def test_attack_is_written_back_on_flush(self):
+        response = self.client.post("/api/game/enemy-attack/", {"session_id": self.game_session.id})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.game_session.refresh_from_db()
+        self.assertEqual(self.game_session.health, 100)
+
+        live_sessions.flush()
+        self.game_session.refresh_from_db()
+        self.assertEqual(self.game_session.health, response.data["remaining_health"])
+
+    def test_end_game_persists_buffered_state(self):
+        self.client.post("/api/game/collect-item/", {"session_id": self.game_session.id, "item": "Sword"})
+        self.client.post("/api/game/end/", {"session_id": self.game_session.id, "score": 10}, format="json")
+
+        self.assertEqual(self.game_session.inventory(), {"Sword": 1})
+        self.assertEqual(len(live_sessions), 0)
+
+    @override_settings(GAME_TICK_ENGINE={"ENABLED": True})
+    def test_ended_session_is_not_reloaded(self):
+        actions.end_game(self.user, self.game_session.id, 10)
+        response = self.client.post("/api/game/enemy-attack/", {"session_id": self.game_session.id})
+        self.assertEqual(response.data["error"], "Invalid session!")
+        self.assertEqual(len(live_sessions), 0)
+
+    def test_other_players_session_is_rejected(self):
+        other = User.objects.create_user(username="intruder", password="password123")
+        self.client.force_authenticate(other)
+        response = self.client.post("/api/game/enemy-attack/", {"session_id": self.game_session.id})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_end_game_during_a_flush_keeps_the_final_score(self):
+        live = live_sessions.get(self.game_session.id, self.user)
+        live.take_damage(10)
+        write = live_sessions._write
+        racing = []
+
+        def end_game_then_write(sessions, force=False):
+            if not racing:  # Between flush()'s dirty snapshot and its write
+                racing.append(True)
+                actions.end_game(self.user, self.game_session.id, 77)
+            return write(sessions, force)
+
+        with mock.patch.object(live_sessions, "_write", end_game_then_write):
+            live_sessions.flush()
+        self.game_session.refresh_from_db()
+        self.assertEqual((self.game_session.score, self.game_session.health), (77, 90))
+
+    def test_game_over_is_written_through(self):
+        live = live_sessions.get(self.game_session.id, self.user)
+        live.take_damage(100)
+        live_sessions.commit(live)
+        self.game_session.refresh_from_db()
+        self.assertEqual(self.game_session.health, 0)
+
+
+class MoveIngestionTests(APITestCase):
+    """log_move queues moves and a writer inserts them in batches."""
+
+    def setUp(self):
+        self.user = User.objects.create_user(username="mover", password="password123")
+        self.game_session = GameSession.objects.create(player=self.user)
+        self.client.force_authenticate(self.user)
+
+    def tearDown(self):
+        move_ingestor.drain()
+        live_sessions.clear()
+
+    def test_moves_are_accepted_then_bulk_inserted(self):
+        for action in ("jump", "run", "duck"):
+            response = self.client.post("/api/game/move/", {"session_id": self.game_session.id, "action": action})
+            self.assertEqual(response.status_code, status.HTTP_202_ACCEPTED)
+        self.assertEqual(PlayerMove.objects.count(), 0)
+
+        self.assertEqual(move_ingestor.drain(), 3)
+        actions = PlayerMove.objects.filter(session=self.game_session).order_by("timestamp", "id")
+        self.assertEqual([m.action for m in actions], ["jump", "run", "duck"])
+
+    def test_end_game_writes_queued_moves_first(self):
+        other = GameSession.objects.create(player=User.objects.create_user(username="bystander", password="pw"))
+        move_ingestor.submit(other.id, "wait")
+        self.client.post("/api/game/move/", {"session_id": self.game_session.id, "action": "jump"})
+        move_ingestor.submit(other.id, "wait")
+        actions.end_game(self.user, self.game_session.id, 10)
+        self.assertEqual(PlayerMove.objects.filter(session=self.game_session).count(), 1)
+        self.assertEqual(len(move_ingestor), 2)  # Other sessions' moves are left to the writer
+        self.assertEqual(move_ingestor.drain(), 2)
+
+    def test_full_queue_pushes_back(self):
+        ingestor = MoveIngestor(batch_size=10, max_queue=1)
+        self.assertTrue(ingestor.submit(self.game_session.id, "jump"))
+        self.assertFalse(ingestor.submit(self.game_session.id, "jump"))
+        self.assertEqual(ingestor.drain(), 1)
+
+    def test_missing_action_is_rejected(self):
+        response = self.client.post("/api/game/move/", {"session_id": self.game_session.id})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_non_string_action_is_rejected(self):
+        response = self.client.post("/api/game/move/", {"session_id": self.game_session.id, "action": 5},
+                                    format="json")
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(response.data["error"], "Invalid action!")
+
+
+class LeaderboardIndexTests(APITestCase):
+    """Ranked leaderboard API served from the in-memory index."""
+
+    def setUp(self):
+        self.users = []
+        for name, score in [("ann", 50), ("bob", 80), ("cid", 80), ("dee", 20), ("eve", 65)]:
+            user = User.objects.create_user(username=name, password="password123")
+            Leaderboard.objects.create(player=user, best_score=score)
+            self.users.append(user)
+        leaderboard_index.invalidate()
+        self.client.force_authenticate(self.users[0])
+
+    def test_top_is_ordered_with_shared_ranks_for_ties(self):
+        response = self.client.get("/api/game/leaderboard/top/?limit=3")
+        self.assertEqual(
+            [(row["rank"], row["player_name"], row["best_score"]) for row in response.data["results"]],
+            [(1, "bob", 80), (1, "cid", 80), (3, "eve", 65)],
+        )
+
+    def test_keyset_pages_cover_everyone_once(self):
+        names, after = [], None
+        while True:
+            url = "/api/game/leaderboard/page/?limit=2" + (f"&after={after}" if after else "")
+            response = self.client.get(url)
+            names += [row["player_name"] for row in response.data["results"]]
+            after = response.data["next"]
+            if after is None:
+                break
+        self.assertEqual(names, ["bob", "cid", "eve", "ann", "dee"])
+
+    def test_rank_and_neighbours(self):
+        response = self.client.get("/api/game/leaderboard/rank/")
+        self.assertEqual(response.data["rank"], 4)
+
+        response = self.client.get("/api/game/leaderboard/around/?player=eve&radius=1")
+        self.assertEqual([row["player_name"] for row in response.data["results"]], ["cid", "eve", "ann"])
+
+    def test_end_game_updates_index(self):
+        session = GameSession.objects.create(player=self.users[3])
+        self.client.force_authenticate(self.users[3])
+        self.client.post("/api/game/end/", {"session_id": session.id, "score": 100}, format="json")
+        live_sessions.clear()
+
+        response = self.client.get("/api/game/leaderboard/rank/")
+        self.assertEqual((response.data["rank"], response.data["best_score"]), (1, 100))
+
+
+class ScoreSubmissionTests(TestCase):
+    """Best scores are raised by a conditional upsert, never lowered."""
+
+    def setUp(self):
+        self.user = User.objects.create_user(username="scorer", password="password123")
+
+    def test_upsert_creates_then_keeps_the_higher_score(self):
+        Leaderboard.objects.submit_scores({self.user.pk: 40})
+        Leaderboard.objects.submit_scores({self.user.pk: 90})
+        Leaderboard.objects.submit_scores({self.user.pk: 70})
+        self.assertEqual(Leaderboard.objects.get(player=self.user).best_score, 90)
+
+    def test_burst_is_coalesced_to_the_max(self):
+        submitter = ScoreSubmitter(window=1)
+        with self.settings(GAME_BACKGROUND_WORKERS=True), mock.patch.object(submitter.writer, "ensure_started"):
+            for score in (10, 60, 30):
+                submitter.submit(self.user.pk, score)
+        self.assertFalse(Leaderboard.objects.filter(player=self.user).exists())
+        self.assertEqual(submitter.flush(), 1)
+        self.assertEqual(Leaderboard.objects.get(player=self.user).best_score, 60)
+
+
+class InventoryTests(APITestCase):
+    """Inventory is a per-session item counter."""
+
+    def setUp(self):
+        self.user = User.objects.create_user(username="collector", password="password123")
+        self.game_session = GameSession.objects.create(player=self.user)
+        self.client.force_authenticate(self.user)
+
+    def tearDown(self):
+        live_sessions.clear()
+
+    def test_pickups_increment_counters(self):
+        self.game_session.collect_item("Sword")
+        self.game_session.collect_item("Sword")
+        self.game_session.collect_item("Shield", quantity=3)
+        self.assertEqual(self.game_session.inventory(), {"Sword": 2, "Shield": 3})
+        self.assertEqual(InventoryItem.objects.filter(session=self.game_session).count(), 2)
+
+    def test_collect_item_reports_buffered_inventory(self):
+        self.game_session.collect_item("Sword")
+        self.client.post("/api/game/collect-item/", {"session_id": self.game_session.id, "item": "Sword"})
+        response = self.client.post("/api/game/collect-item/", {"session_id": self.game_session.id, "item": "Gem"})
+        self.assertEqual(response.data["inventory"], {"Sword": 2, "Gem": 1})
+
+        live_sessions.flush()
+        self.assertEqual(self.game_session.inventory(), {"Sword": 2, "Gem": 1})
+
+    def test_inventory_is_read_once_per_loaded_session(self):
+        self.game_session.collect_item("Sword")
+        live = live_sessions.get(self.game_session.id, self.user)
+        with CaptureQueriesContext(connection) as queries:
+            actions.collect_item(live, "Gem")
+            live_sessions.flush()
+            reply = actions.collect_item(live, "Gem")
+        self.assertEqual(reply["inventory"], {"Sword": 1, "Gem": 2})
+        self.assertFalse([q for q in queries if q["sql"].startswith("SELECT") and "inventoryitem" in q["sql"]])
+
+
+class WebSocketChannelTests(TestCase):
+    """Actions streamed over the /ws/game/ WebSocket."""
+
+    def setUp(self):
+        self.user = User.objects.create_user(username="socketeer", password="password123")
+        self.token = str(RefreshToken.for_user(self.user).access_token)
+
+    def tearDown(self):
+        move_ingestor.drain()
+        live_sessions.clear()
+
+    def converse(self, messages):
+        async def scenario():
+            socket = ApplicationCommunicator(application, {"type": "websocket", "path": "/ws/game/"})
+            await socket.send_input({"type": "websocket.connect"})
+            replies = [await socket.receive_output()]
+            for message in messages:
+                await socket.send_input({"type": "websocket.receive", "text": json.dumps(message)})
+                replies.append(await socket.receive_output())
+            if not await socket.receive_nothing():
+                replies.append(await socket.receive_output())
+            await socket.send_input({"type": "websocket.disconnect", "code": 1000})
+            await socket.wait()
+            return replies
+        return async_to_sync(scenario)()
+
+    def test_session_lifecycle(self):
+        replies = self.converse([
+            {"type": "auth", "token": self.token},
+            {"type": "attack", "ref": 1},
+            {"type": "move", "action": "jump"},
+            {"type": "collect", "item": "Gem"},
+            {"type": "end", "score": 42},
+        ])
+        self.assertEqual(replies[0]["type"], "websocket.accept")
+        ready, attack, move, collect, end = [json.loads(r["text"]) for r in replies[1:6]]
+        self.assertEqual(ready["type"], "ready")
+        self.assertEqual((attack["type"], attack["ref"]), ("attack", 1))
+        self.assertEqual(collect["inventory"], {"Gem": 1})
+        self.assertEqual(end["final_score"], 42)
+        self.assertEqual(replies[6], {"type": "websocket.close", "code": 1000})
+
+        session = GameSession.objects.get(id=ready["session_id"])
+        self.assertEqual((session.score, session.health), (42, attack["remaining_health"]))
+        self.assertIsNotNone(session.end_time)
+        self.assertEqual(PlayerMove.objects.filter(session=session).count(), 1)  # Written by end_game
+
+    def test_actions_require_authentication(self):
+        replies = self.converse([{"type": "attack"}])
+        self.assertEqual(json.loads(replies[1]["text"])["type"], "error")
+        self.assertEqual(replies[2]["code"], 4401)
+
+    def test_mistyped_fields_are_refused(self):
+        replies = self.converse([
+            {"type": "auth", "token": self.token},
+            {"type": ["attack"], "ref": 1},
+            {"type": "collect", "item": {"name": "Gem"}, "ref": 2},
+            {"type": "move", "action": 5, "ref": 3},
+            {"type": "heartbeat", "ref": 4},
+        ])
+        kind, collect, move, heartbeat = [json.loads(r["text"]) for r in replies[2:6]]
+        self.assertEqual((kind["error"], collect["error"], move["error"]),
+                         ("Malformed message!", "Invalid item!", "Invalid action!"))
+        self.assertEqual((heartbeat["type"], heartbeat["health"]), ("heartbeat", 100))
+
+
+class BenchmarkReportTests(TestCase):
+    """Latency summaries used by the loadtest command."""
+
+    def test_percentiles_use_nearest_rank(self):
+        latencies = [i / 1000 for i in range(1, 101)]  # 1..100 ms
+        summary = summarize(latencies, elapsed=2)
+        self.assertEqual((summary["p50_ms"], summary["p95_ms"], summary["p99_ms"]), (50, 95, 99))
+        self.assertEqual(summary["throughput"], 50)
+        self.assertIsNone(percentile([], 50))
+
+
+class DatabaseTuningTests(TestCase):
+    """The tuned SQLite backend applies its pragmas to every connection."""
+
+    def test_pragmas_are_applied(self):
+        with connection.cursor() as cursor:
+            cursor.execute("PRAGMA busy_timeout")
+            self.assertEqual(cursor.fetchone()[0], 5000)
+            cursor.execute("PRAGMA synchronous")
+            self.assertEqual(cursor.fetchone()[0], 1)  # NORMAL
+        self.assertEqual(connection.transaction_mode, "IMMEDIATE")
+
+
+class QueryPlanAuditTests(TestCase):
+    """Every hot-path query is answered from an index (see game/query_audit.py)."""
+
+    def test_hot_queries_do_not_scan(self):
+        users, sessions = User.objects.count(), GameSession.objects.count()
+        results = audit()
+        flagged = {query.label: problems for query, statements in results
+                   for _, _, problems in statements if problems}
+        self.assertEqual(flagged, {})
+        audited = {query.label: [sql for sql, _, _ in statements] for query, statements in results}
+        self.assertTrue(any(sql.startswith('INSERT INTO "game_leaderboard"') for sql in audited["POST /api/game/end/"]))
+        self.assertEqual((User.objects.count(), GameSession.objects.count()), (users, sessions))  # Rolled back
+
+    def test_unindexed_lookup_is_flagged(self):
+        unindexed = HotQuery("by action", lambda: list(PlayerMove.objects.filter(action="jump")), False)
+        [(_, [(_, _, problems)])] = audit([unindexed])
+        self.assertEqual(problems, ["SCAN game_playermove"])
+
+
+class MoveArchiveTests(TestCase):
+    """Moves of old finished sessions move to archive segments and stay readable."""
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory)
+        self.archive = MoveArchive(self.directory)
+        self.user = User.objects.create_user(username="archivist", password="password123")
+        long_ago = now() - timedelta(days=90)
+        self.old = GameSession.objects.create(player=self.user, start_time=long_ago, end_time=long_ago)
+        self.current = GameSession.objects.create(player=self.user)
+        for i in range(5):
+            PlayerMove.objects.create(session=self.old, action=f"step-{i % 2}", timestamp=long_ago + timedelta(seconds=i))
+        PlayerMove.objects.create(session=self.current, action="jump")
+
+    def moves(self, session):
+        return list(PlayerMove.objects.filter(session=session).order_by("timestamp", "id")
+                    .values_list("id", "session_id", "timestamp", "action"))
+
+    def test_old_moves_are_archived_and_read_back(self):
+        expected = self.moves(self.old)
+        self.assertEqual(self.archive.archive(older_than_days=30), (5, 1))
+
+        self.assertFalse(PlayerMove.objects.filter(session=self.old).exists())
+        self.assertEqual(PlayerMove.objects.filter(session=self.current).count(), 1)
+        self.assertEqual(list(self.archive.session_moves(self.old.id)), expected)
+        self.assertEqual([move[3] for move in self.archive.player_moves(self.user)],
+                         ["step-0", "step-1", "step-0", "step-1", "step-0", "jump"])
+        [segment] = self.archive.segments()
+        self.assertEqual(segment.actions, ["step-0", "step-1"])
+        self.assertEqual(segment.column("action").dtype, np.uint16)
+
+    def test_interrupted_delete_is_finished_without_duplicates(self):
+        expected = self.moves(self.old)
+        ids, session_ids, timestamps, actions = zip(*expected)
+        self.archive.write_segment(ids, session_ids, [to_micros(t) for t in timestamps], actions)
+
+        self.assertEqual(list(self.archive.session_moves(self.old.id)), expected)
+        self.archive.finish_deletes()
+        self.assertFalse(PlayerMove.objects.filter(session=self.old).exists())
+        self.assertEqual(list(self.archive.session_moves(self.old.id)), expected)
+
+
+class SessionReplayTests(APITestCase):
+    """The replay endpoint streams hot and archived moves as NDJSON."""
+
+    def setUp(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        archive_settings = override_settings(GAME_MOVE_ARCHIVE={"DIR": directory})
+        archive_settings.enable()
+        self.addCleanup(archive_settings.disable)
+
+        self.user = User.objects.create_user(username="replayer", password="password123")
+        start = now() - timedelta(days=60)
+        self.session = GameSession.objects.create(player=self.user, start_time=start, end_time=start)
+        for i in range(3):
+            PlayerMove.objects.create(session=self.session, action=f"old-{i}", timestamp=start + timedelta(seconds=i))
+        move_archive.archive(older_than_days=30, session_ids=[self.session.id])
+        for i in range(3):
+            PlayerMove.objects.create(session=self.session, action=f"new-{i}", timestamp=now())
+        self.url = reverse("game:session-replay", args=[self.session.id])
+        self.client.force_authenticate(user=self.user)
+
+    def replay(self, **params):
+        response = self.client.get(self.url, params)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response["Content-Type"], "application/x-ndjson")
+        body = b"".join(response.streaming_content).decode()
+        return [json.loads(line) for line in body.splitlines()]
+
+    def test_streams_archived_then_hot_moves(self):
+        lines = self.replay()
+        self.assertEqual([line["action"] for line in lines], ["old-0", "old-1", "old-2", "new-0", "new-1", "new-2"])
+        self.assertEqual(set(lines[0]), {"id", "session", "timestamp", "action"})
+
+    def test_resumes_after_cursor(self):
+        lines = self.replay()
+        resumed = self.replay(after=make_cursor(lines[1]))
+        self.assertEqual(resumed, lines[2:])
+        self.assertEqual(self.client.get(self.url, {"after": "yesterday,1"}).status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_only_owner_or_admin(self):
+        self.client.force_authenticate(user=User.objects.create_user(username="snoop", password="password123"))
+        self.assertEqual(self.client.get(self.url).status_code, status.HTTP_404_NOT_FOUND)
+        self.client.force_authenticate(user=User.objects.create_user(username="boss", password="password123",
+                                                                     role="admin"))
+        self.assertEqual(len(self.replay()), 6)
+
+
+class SessionReplayStreamingTests(APITransactionTestCase):
+    """Under ASGI the replay reaches the client chunk by chunk, not buffered whole."""
+
+    setUp = SessionReplayTests.setUp  # Committed rows: the ASGI handler serves the view on a thread of its own
+
+    def test_asgi_streams_chunks_as_they_are_produced(self):
+        released = threading.Event()
+        stream_moves = replay.stream_moves
+
+        def held_back(*args, **kwargs):
+            chunks = stream_moves(*args, **kwargs)
+            yield next(chunks)
+            released.wait(5)  # The rest only comes once the first chunk has reached the client
+            yield from chunks
+
+        token = str(RefreshToken.for_user(self.user).access_token)
+        scope = {"type": "http", "method": "GET", "path": self.url, "query_string": b"",
+                 "headers": [(b"host", b"testserver"), (b"authorization", f"Bearer {token}".encode())]}
+
+        async def scenario():
+            http = ApplicationCommunicator(application, scope)
+            await http.send_input({"type": "http.request", "body": b"", "more_body": False})
+            start = await http.receive_output(timeout=5)
+            first = await http.receive_output(timeout=2)  # Times out if the whole stream is buffered
+            released.set()
+            body, message = [first["body"]], first
+            while message.get("more_body"):
+                message = await http.receive_output(timeout=5)
+                body.append(message.get("body", b""))
+            return start["status"], first["body"], b"".join(body)
+
+        with mock.patch.object(replay, "LINES_PER_CHUNK", 2), mock.patch.object(replay, "stream_moves", held_back):
+            status_code, first, body = async_to_sync(scenario)()
+        self.assertEqual(status_code, 200)
+        self.assertEqual(len(first.splitlines()), 2)
+        self.assertEqual([json.loads(line)["action"] for line in body.splitlines()],
+                         ["old-0", "old-1", "old-2", "new-0", "new-1", "new-2"])
+
+
+class AnalyticsTests(TestCase):
+    """Vectorized gameplay aggregates, cached and extended incrementally."""
+
+    def setUp(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        analytics_settings = override_settings(GAME_ANALYTICS={"CACHE_DIR": f"{directory}/cache"},
+                                               GAME_MOVE_ARCHIVE={"DIR": f"{directory}/archive"})
+        analytics_settings.enable()
+        self.addCleanup(analytics_settings.disable)
+        self.user = User.objects.create_user(username="analyst", password="password123")
+
+    def finished_session(self, minutes, moves, damage, items, days_ago=0):
+        start = now() - timedelta(days=days_ago, minutes=minutes)
+        session = GameSession.objects.create(player=self.user, start_time=start,
+                                             end_time=start + timedelta(minutes=minutes), damage_taken=damage)
+        PlayerMove.objects.bulk_create([PlayerMove(session=session, action="step") for _ in range(moves)])
+        if items:
+            InventoryItem.objects.add_items([(session.id, item, quantity) for item, quantity in items.items()])
+        return session
+
+    def test_aggregates_are_incremental(self):
+        old = self.finished_session(2, moves=60, damage=30, items={"Sword": 1}, days_ago=60)
+        move_archive.archive(older_than_days=30, session_ids=[old.id])
+        self.finished_session(1, moves=30, damage=10, items={"Health Potion": 3})
+        GameSession.objects.create(player=self.user)  # Still running: not counted
+
+        summary, added = analytics.run()
+        self.assertEqual((summary["sessions"], added), (2, 2))
+        self.assertAlmostEqual(summary["survival_seconds"]["mean"], 90, places=3)
+        self.assertAlmostEqual(summary["actions_per_minute"]["mean"], 30)
+        self.assertEqual(summary["damage_taken"]["total"], 40)
+        self.assertEqual(summary["pickups"]["by_item"]["Health Potion"]["total"], 3)
+        self.assertAlmostEqual(summary["pickups"]["per_minute"], 4 / 3)
+
+        self.finished_session(3, moves=0, damage=0, items={})
+        summary, added = analytics.run()
+        self.assertEqual((summary["sessions"], added), (3, 1))
+        self.assertEqual(summary["survival_seconds"]["histogram"]["<300s"], 2)  # 120s and 180s
+        self.assertEqual(analytics.run(refresh=True, workers=1)[0], summary)
+
+    def test_sessions_reaped_behind_the_watermark_are_picked_up_once(self):
+        self.finished_session(1, moves=5, damage=0, items={})
+        self.assertEqual(analytics.run()[1], 1)
+        abandoned = GameSession.objects.create(player=self.user, start_time=now() - timedelta(minutes=5),
+                                               last_seen=now() - timedelta(minutes=2))
+        PlayerMove.objects.create(session=abandoned, action="step")
+        self.assertEqual(reap_stale_sessions(timeout=60), 1)  # end_time = last_seen, before the watermark
+
+        summary, added = analytics.run()
+        self.assertEqual((summary["sessions"], added), (2, 1))
+        self.assertEqual(analytics.run()[1], 0)
+        self.assertEqual(analytics.run(refresh=True)[0], summary)
+
+
+class HeartbeatTests(APITestCase):
+    """Survival time comes from the server's clock; silent sessions are ended by the reaper."""
+
+    def setUp(self):
+        self.user = User.objects.create_user(username="survivor", password="password123")
+        self.client.force_authenticate(self.user)
+        started = now() - timedelta(minutes=10)
+        self.game_session = GameSession.objects.create(player=self.user, start_time=started, last_seen=started)
+
+    def tearDown(self):
+        live_sessions.clear()
+
+    def test_heartbeat_reports_survival_time_without_writing(self):
+        response = self.client.post("/api/game/heartbeat/", {"session_id": self.game_session.id})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertGreaterEqual(response.data["survival_time"], 600)
+        live_sessions.flush()  # The stored last_seen was stale, so this heartbeat marked the session dirty
+        self.game_session.refresh_from_db()
+        self.assertGreater(self.game_session.last_seen, now() - timedelta(seconds=5))
+
+        with CaptureQueriesContext(connection) as queries:
+            self.client.post("/api/game/heartbeat/", {"session_id": self.game_session.id})
+        self.assertEqual(len(queries), 0)
+
+        response = self.client.get("/api/game/survival-time/", {"session_id": self.game_session.id})
+        self.assertTrue(response.data["active"])
+        self.assertGreaterEqual(response.data["survival_time"], 600)
+
+    def test_stale_sessions_end_at_their_last_heartbeat(self):
+        fresh = GameSession.objects.create(player=self.user)
+        self.assertEqual(reap_stale_sessions(timeout=120, batch_size=1), 1)
+
+        self.game_session.refresh_from_db()
+        self.assertEqual(self.game_session.end_time, self.game_session.last_seen)
+        fresh.refresh_from_db()
+        self.assertIsNone(fresh.end_time)
+        response = self.client.get("/api/game/survival-time/", {"session_id": self.game_session.id})
+        self.assertFalse(response.data["active"])
+        self.assertAlmostEqual(response.data["survival_time"], 0, places=3)
+
+    def test_heartbeat_held_in_memory_prevents_reaping(self):
+        live = live_sessions.get(self.game_session.id, self.user)
+        live.last_seen = now()  # Newer than the stored value, not yet written
+        self.assertEqual(reap_stale_sessions(timeout=120), 0)
+        self.game_session.refresh_from_db()
+        self.assertIsNone(self.game_session.end_time)
+        self.assertEqual(self.game_session.last_seen, live.last_seen)
+
+
+class TickEngineTests(APITestCase):
+    """Vectorized enemy attacks on every registered session."""
+
+    def setUp(self):
+        self.user = User.objects.create_user(username="target", password="password123")
+        self.client.force_authenticate(self.user)
+        self.engine = TickEngine({"ATTACK_CHANCE": 1.0, "MIN_DAMAGE": 40, "MAX_DAMAGE": 40, "INITIAL_CAPACITY": 1})
+        self.sessions = [GameSession.objects.create(player=self.user) for _ in range(3)]
+        self.lives = [live_sessions.get(session.id, self.user) for session in self.sessions]
+        for live in self.lives:
+            self.engine.register(live)
+
+    def tearDown(self):
+        for live in self.lives:
+            self.engine.unregister(live)
+        live_sessions.clear()
+
+    def test_ticks_damage_everyone_and_detect_game_over(self):
+        self.engine.tick()
+        self.assertEqual([live.health for live in self.lives], [60, 60, 60])
+        self.lives[0].heal(20)  # Actions and ticks share the engine's arrays
+        self.engine.tick()
+        result = self.engine.tick()
+        self.assertEqual([live.health for live in self.lives], [0, 0, 0])
+        self.assertEqual(len(result.dead), 3)
+        self.assertEqual(len(self.engine.tick().slots), 0)  # Dead sessions are no longer attacked
+
+        self.assertEqual(self.engine.persist(), 3)
+        self.assertEqual(list(GameSession.objects.filter(id__in=[s.id for s in self.sessions])
+                              .values_list("health", "damage_taken")), [(0, 120)] * 3)
+
+    @override_settings(GAME_TICK_ENGINE={"ENABLED": True}, GAME_LIVE_STATE={"MAX_SESSIONS": 0})
+    def test_write_through_sessions_keep_one_slot_and_free_it_at_end(self):
+        from .ticks import tick_engine
+
+        session = GameSession.objects.create(player=self.user)
+        resident = len(live_sessions)
+        for _ in range(3):  # Nothing is kept in the store: each request looks the session up again
+            live = actions.get_session(session.id, self.user)
+        self.assertEqual(len(live_sessions), resident)
+        self.assertIs(tick_engine.get(session.id), live)
+        self.assertEqual(len(tick_engine), 1)
+
+        actions.end_game(self.user, session.id, 5)
+        self.assertEqual(len(tick_engine), 0)
+        self.assertFalse(tick_engine.alive.any())
+        self.assertIsNone(live.engine)
+
+    def test_listeners_are_told_when_hit(self):
+        received = []
+        self.engine.register(self.lives[0], listener=(None, received.append))
+        messages = self.engine.notifications(self.engine.tick())
+        self.assertEqual([message for _, message in messages],
+                         [{"type": "tick", "message": "Enemy attacked! You lost 40 HP.", "remaining_health": 60}])
+
+        response = self.client.post("/api/game/collect-item/",
+                                    {"session_id": self.sessions[0].id, "item": "Health Potion"})
+        self.assertEqual(response.data["health"], 80)
+
+
+class MaintenanceTests(TestCase):
+    """Expired sessions and abandoned games are cleaned up in small, throttled batches."""
+
+    def setUp(self):
+        self.user = User.objects.create_user(username="janitor", password="password123")
+
+    def tearDown(self):
+        live_sessions.clear()
+
+    def test_expired_sessions_are_deleted_in_batches(self):
+        from django.contrib.sessions.models import Session
+
+        for i in range(5):
+            Session.objects.create(session_key=f"expired{i:025d}", session_data="", expire_date=now() - timedelta(days=1))
+        Session.objects.create(session_key="active" + "0" * 26, session_data="", expire_date=now() + timedelta(days=1))
+        pauses = []
+        report = maintenance.purge_expired_sessions(batch_size=2, throttle=maintenance.Throttle(0.5, sleep=pauses.append))
+
+        self.assertEqual(report.rows, 5)
+        self.assertEqual(report.batches, 3)
+        self.assertEqual(len(pauses), 2)  # Between full batches, not after the last one
+        self.assertEqual(list(Session.objects.values_list("session_key", flat=True)), ["active" + "0" * 26])
+        self.assertGreater(report.rate, 0)
+
+    def test_abandoned_games_are_ended(self):
+        stale = now() - timedelta(hours=1)
+        abandoned = [GameSession.objects.create(player=self.user, start_time=stale, last_seen=stale) for _ in range(3)]
+        active = GameSession.objects.create(player=self.user)
+        reports = maintenance.run(batch_size=2, throttle=maintenance.Throttle(1))
+
+        self.assertEqual([report.rows for report in reports], [0, 3])
+        self.assertEqual(GameSession.objects.filter(id__in=[s.id for s in abandoned], end_time=stale).count(), 3)
+        active.refresh_from_db()
+        self.assertIsNone(active.end_time)
+
+    def test_throttle_keeps_writes_under_the_duty_cycle(self):
+        throttle = maintenance.Throttle(duty_cycle=0.25, max_pause=1.0)
+        self.assertAlmostEqual(throttle.pause_for(0.1), 0.3)
+        self.assertEqual(throttle.pause_for(10), 1.0)
+        self.assertEqual(maintenance.Throttle(duty_cycle=1).pause_for(10), 0.0)
+
+
+class ActivityRollupTests(APITestCase):
+    """Dashboard stats come from incrementally maintained hourly and daily rollups."""
+
+    def setUp(self):
+        activity_rollups.clear()
+        self.admin = User.objects.create_user(username="overseer", password="password123", role="admin")
+        self.user = User.objects.create_user(username="busy", password="password123")
+        self.client.force_authenticate(self.user)
+
+    def tearDown(self):
+        activity_rollups.clear()
+        live_sessions.clear()
+
+    def play(self, score):
+        session_id = self.client.post("/api/game/start/").json()["session_id"]
+        self.client.post("/api/game/move/", {"session_id": session_id, "action": "jump"})
+        self.client.post("/api/game/end/", {"session_id": session_id, "score": score})
+        move_ingestor.drain()
+
+    def stats(self):
+        self.client.force_authenticate(self.admin)
+        response = self.client.get("/api/auth/admin-dashboard/")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return response.data["stats"]
+
+    def test_counts_are_flushed_additively_and_served_with_pending_ones(self):
+        self.play(10)
+        activity_rollups.flush()
+        self.play(30)  # Still buffered
+        hour = rollups.hour_start(now())
+        row = ActivityRollup.objects.get(period=ActivityRollup.HOUR, bucket_start=hour)
+        self.assertEqual((row.sessions_started, row.sessions_ended, row.score_total, row.moves), (1, 1, 10, 1))
+
+        with CaptureQueriesContext(connection) as queries:
+            stats = self.stats()
+        self.assertEqual(stats["sessions_per_hour"][-1], {"hour": hour.isoformat(), "sessions_started": 2,
+                                                          "sessions_ended": 2})
+        self.assertEqual(stats["sessions_today"], 2)
+        self.assertEqual(stats["average_score"], 20)
+        self.assertGreater(stats["moves_per_minute"]["current_hour"], 0)
+        self.assertEqual(stats["active_sessions"], 0)
+        self.assertFalse([q for q in queries if "game_playermove" in q["sql"]])
+
+        activity_rollups.flush()
+        row.refresh_from_db()
+        self.assertEqual((row.sessions_started, row.score_total, row.moves), (2, 40, 2))
+
+    def test_backfill_rebuilds_past_hours_from_history(self):
+        earlier = rollups.hour_start(now()) - timedelta(hours=30)
+        sessions = [GameSession.objects.create(player=self.user, start_time=earlier + timedelta(minutes=i),
+                                               end_time=earlier + timedelta(hours=1, minutes=i), score=10 * i)
+                    for i in range(3)]
+        GameSession.objects.create(player=self.user, start_time=earlier)  # Still open
+        PlayerMove.objects.bulk_create([PlayerMove(session=sessions[0], action="run", timestamp=earlier)] * 4)
+        ActivityRollup.objects.add_counts([(ActivityRollup.HOUR, earlier, 99, 0, 0, 0)])  # Wrong, replaced
+
+        rollups.backfill()
+        first = ActivityRollup.objects.get(period=ActivityRollup.HOUR, bucket_start=earlier)
+        second = ActivityRollup.objects.get(period=ActivityRollup.HOUR, bucket_start=earlier + timedelta(hours=1))
+        self.assertEqual((first.sessions_started, first.sessions_ended, first.moves), (4, 0, 4))
+        self.assertEqual((second.sessions_ended, second.score_total), (3, 30))
+        days = ActivityRollup.objects.filter(period=ActivityRollup.DAY)
+        self.assertEqual(sum(day.sessions_started for day in days), 4)
+        self.assertEqual(sum(day.moves for day in days), 4)
+
+    def test_reaped_sessions_count_when_last_seen(self):
+        seen = now() - timedelta(hours=3)
+        GameSession.objects.create(player=self.user, start_time=seen, last_seen=seen)
+        self.assertEqual(reap_stale_sessions(timeout=60), 1)
+        self.assertEqual(activity_rollups.pending()[(ActivityRollup.HOUR, rollups.hour_start(seen))][1], 1)
+        self.assertNotIn((ActivityRollup.HOUR, rollups.hour_start(now())), activity_rollups.pending())
+
+
+@override_settings(GAME_THROTTLE={"RATES": {"attack": (0.01, 3), "collect": (0.01, 3), "move": (0.01, 3)}})
+class ThrottleTests(APITestCase):
+    """Per-user token buckets refuse action spam before it reaches the database."""
+
+    def setUp(self):
+        limiter.reset()  # Fresh buckets: user ids repeat across tests
+        self.user = User.objects.create_user(username="spammer", password="password123")
+        self.other = User.objects.create_user(username="patient", password="password123")
+        self.client.force_authenticate(self.user)
+        self.session_id = self.client.post("/api/game/start/").json()["session_id"]
+
+    def tearDown(self):
+        move_ingestor.drain()
+        live_sessions.clear()
+
+    def attack(self):
+        return self.client.post("/api/game/enemy-attack/", {"session_id": self.session_id})
+
+    def test_burst_then_429_with_retry_after(self):
+        shed = registry.counters[(SHED_METRIC, (("scope", "attack"),))]
+        self.assertEqual([self.attack().status_code for _ in range(3)], [200] * 3)
+        with self.assertNumQueries(0):
+            response = self.attack()
+        self.assertEqual(response.status_code, status.HTTP_429_TOO_MANY_REQUESTS)
+        self.assertGreater(int(response["Retry-After"]), 0)
+        self.assertEqual(registry.counters[(SHED_METRIC, (("scope", "attack"),))], shed + 1)
+        # Other scopes and other players have buckets of their own.
+        response = self.client.post("/api/game/move/", {"session_id": self.session_id, "action": "jump"})
+        self.assertEqual(response.status_code, status.HTTP_202_ACCEPTED)
+        self.client.force_authenticate(self.other)
+        session_id = self.client.post("/api/game/start/").json()["session_id"]
+        response = self.client.post("/api/game/enemy-attack/", {"session_id": session_id})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    def test_websocket_messages_share_the_buckets(self):
+        token = str(RefreshToken.for_user(self.user).access_token)
+        self.assertEqual(self.attack().status_code, 200)
+
+        async def scenario():
+            socket = ApplicationCommunicator(application, {"type": "websocket", "path": "/ws/game/"})
+            await socket.send_input({"type": "websocket.connect"})
+            await socket.receive_output()
+            replies = []
+            for message in [{"type": "auth", "token": token, "session_id": self.session_id}] + [{"type": "attack"}] * 3:
+                await socket.send_input({"type": "websocket.receive", "text": json.dumps(message)})
+                replies.append(json.loads((await socket.receive_output())["text"]))
+            await socket.send_input({"type": "websocket.disconnect", "code": 1000})
+            await socket.wait()
+            return replies
+
+        replies = async_to_sync(scenario)()
+        self.assertEqual([reply["type"] for reply in replies], ["ready", "attack", "attack", "error"])
+        self.assertIn("Too many attack messages", replies[-1]["error"])
+
+    def test_bucket_refills(self):
+        buckets = LocalBuckets(max_keys=10)
+        self.assertEqual([buckets.take(1, 2.0, 2.0, 100.0) for _ in range(2)], [0.0, 0.0])
+        self.assertAlmostEqual(buckets.take(1, 2.0, 2.0, 100.0), 0.5)
+        self.assertEqual(buckets.take(1, 2.0, 2.0, 100.5), 0.0)
+
+    def test_shared_file_is_seen_by_every_opener(self):
+        path = tempfile.mktemp(prefix="throttle-")
+        try:
+            first, second = SharedBuckets(path, 64), SharedBuckets(path, 64)
+            self.assertEqual(first.take(7, 1.0, 2.0, 10.0), 0.0)
+            self.assertEqual(second.take(7, 1.0, 2.0, 10.0), 0.0)
+            self.assertAlmostEqual(first.take(7, 1.0, 2.0, 10.0), 1.0)
+            self.assertEqual(second.take(8, 1.0, 2.0, 10.0), 0.0)  # A different key, a different slot
+        finally:
+            os.unlink(path)
+
+    def test_shared_file_from_before_a_reboot_starts_full(self):
+        path = tempfile.mktemp(prefix="throttle-")
+        try:
+            buckets = SharedBuckets(path, 64)
+            buckets.take(7, 1.0, 2.0, 5000.0)
+            buckets.take(7, 1.0, 2.0, 5000.0)
+            self.assertEqual(buckets.take(7, 1.0, 2.0, 3.0), 0.0)  # The monotonic clock restarted
+            self.assertEqual(buckets.take(7, 1.0, 2.0, 3.0), 0.0)
+            self.assertAlmostEqual(buckets.take(7, 1.0, 2.0, 3.0), 1.0)
+        finally:
+            os.unlink(path)
+
+
+class LeaderboardPageTests(TestCase):
+    """The leaderboard page is cached per top-10 version and answers conditional requests with 304."""
+
+    def setUp(self):
+        self.users = []
+        for i in range(12):
+            user = User.objects.create_user(username=f"racer{i}", password="password123")
+            Leaderboard.objects.create(player=user, best_score=100 - i)
+            self.users.append(user)
+        leaderboard_index.invalidate()
+        self.client.force_login(self.users[0])
+
+    def tearDown(self):
+        live_sessions.clear()
+
+    def end_game(self, user, score):
+        session = GameSession.objects.create(player=user)
+        actions.end_game(user, session.id, score)
+
+    def test_etag_and_not_modified(self):
+        response = self.client.get("/api/game/leaderboard/")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertContains(response, "racer0 - 100 points")
+        self.assertNotContains(response, "racer10")
+        self.assertIn("private", response["Cache-Control"])
+        self.assertNotIn("Last-Modified", response)  # A per-process clock would differ between workers
+        etag = response["ETag"]
+
+        # Only login_required's user lookup; the leaderboard itself costs no query and no rendering.
+        with self.assertNumQueries(1), self.assertTemplateNotUsed("game/leaderboard_table.html"):
+            response = self.client.get("/api/game/leaderboard/", HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+        with self.assertTemplateNotUsed("game/leaderboard_table.html"):  # The cached table is reused
+            self.assertEqual(self.client.get("/api/game/leaderboard/")["ETag"], etag)
+
+    def test_version_changes_only_with_the_top_ten(self):
+        etag = self.client.get("/api/game/leaderboard/")["ETag"]
+        self.end_game(self.users[11], 50)  # Improves a best score outside the top 10
+        self.assertEqual(self.client.get("/api/game/leaderboard/")["ETag"], etag)
+
+        self.end_game(self.users[11], 500)
+        response = self.client.get("/api/game/leaderboard/", HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertNotEqual(response["ETag"], etag)
+        self.assertContains(response, "racer11 - 500 points")
+
+    def test_a_new_build_changes_the_etag(self):
+        etag = self.client.get("/api/game/leaderboard/")["ETag"]
+        with self.settings(RELEASE="next"):
+            response = self.client.get("/api/game/leaderboard/", HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertNotEqual(response["ETag"], etag)
+
+
+class StaticFilesTests(TestCase):
+    """collectstatic fingerprints and precompresses assets; the middleware serves them with long caching."""
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.root = tempfile.mkdtemp()
+        cls.settings = override_settings(STATIC_ROOT=cls.root, STORAGES={
+            "default": {"BACKEND": "django.core.files.storage.FileSystemStorage"},
+            "staticfiles": {"BACKEND": "mygame.staticfiles.CompressedManifestStaticFilesStorage"},
+        })
+        cls.settings.enable()
+        call_command("collectstatic", interactive=False, verbosity=0, ignore_patterns=["admin", "rest_framework"])
+        with open(os.path.join(cls.root, "staticfiles.json")) as handle:
+            cls.hashed = json.load(handle)["paths"]["game/game.js"]
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.settings.disable()
+        shutil.rmtree(cls.root)
+        super().tearDownClass()
+
+    def test_fingerprinted_precompressed_copies(self):
+        self.assertRegex(self.hashed, r"^game/game\.[0-9a-f]{12}\.js$")
+        with open(os.path.join(self.root, self.hashed), "rb") as handle:
+            original = handle.read()
+        with gzip.open(os.path.join(self.root, self.hashed + ".gz")) as handle:
+            self.assertEqual(handle.read(), original)
+        self.assertTrue(os.path.exists(os.path.join(self.root, self.hashed + ".br")))
+
+    def test_content_negotiation_and_caching(self):
+        response = self.client.get(f"/static/{self.hashed}", HTTP_ACCEPT_ENCODING="gzip, deflate, br")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response["Content-Encoding"], "br")
+        self.assertEqual(response["Vary"], "Accept-Encoding")
+        self.assertEqual(response["Cache-Control"], "public, max-age=31536000, immutable")
+        response.close()
+
+        response = self.client.get(f"/static/{self.hashed}", HTTP_ACCEPT_ENCODING="gzip, br;q=0")
+        self.assertEqual(response["Content-Encoding"], "gzip")
+        response.close()
+
+        response = self.client.get("/static/game/game.js")
+        self.assertFalse(response.has_header("Content-Encoding"))
+        self.assertEqual(response["Cache-Control"], "public, max-age=60")  # No hash in the name
+        with open(os.path.join(self.root, "game/game.js"), "rb") as handle:
+            self.assertEqual(b"".join(response.streaming_content), handle.read())
+
+        response = self.client.get("/static/game/game.js", HTTP_IF_MODIFIED_SINCE=response["Last-Modified"])
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(self.client.get("/static/game/missing.js").status_code, 404)
@@ -0,0 +1,193 @@
+# game/throttling.py
+"""
+Per-user token buckets for the write-heavy game actions.
+
+Every (user, scope) pair has a bucket of `burst` tokens refilled at `rate`
+tokens per second (GAME_THROTTLE["RATES"]). Each action takes a token. An
+empty bucket refuses the request with 429 and a Retry-After. For the REST
+endpoints this happens in DRF's throttle check, after authentication and
+before the view runs, so a refused request never reaches the ORM. The
+WebSocket channel checks the same buckets per message.
+
+Buckets live in process memory by default. Each worker then enforces the
+limit on its own, so a client whose requests are spread over N workers
+gets up to N times the rate. With GAME_THROTTLE["SHARED_FILE"] set, the
+buckets live in a memory-mapped file that all workers on the host share.
+There is one fixed 24-byte slot per (user, scope) modulo SLOTS, guarded by
+an fcntl byte-range lock. Two keys hashed to the same slot take it over
+from each other, which can only let requests through, never refuse extra
+ones. A check costs about 2 µs in memory and 4-5 µs with the shared file
+(see `manage.py bench_throttle`).
+
+Refusals are counted per scope in the metrics registry
+(game_requests_shed_total).
+"""
+
+import fcntl
+import mmap
+import os
+import struct
+import threading
+import time
+
+from django.conf import settings
+from django.core.signals import setting_changed
+from django.dispatch import receiver
+from rest_framework.throttling import BaseThrottle
+
+from mygame.metrics import registry
+
+DEFAULTS = {
+    "ENABLED": True,
+    # scope -> (tokens per second, burst). Far above what a person can click, far below a script.
+    "RATES": {"attack": (5, 20), "collect": (5, 20), "move": (20, 60)},
+    "SHARED_FILE": None,  # Path of the bucket file shared by the workers of one host; None = per process
+    "SLOTS": 65536,  # Buckets in the shared file
+    "MAX_KEYS": 100_000,  # In-memory buckets kept before idle (full) ones are dropped
+}
+
+SHED_METRIC = "game_requests_shed_total"
+registry.describe(SHED_METRIC, "counter", "Game actions refused by the per-user token bucket, by scope.")
+
+
+def get_config():
+    return {**DEFAULTS, **getattr(settings, "GAME_THROTTLE", {})}
+
+
+class LocalBuckets:
+    """Token buckets in this process's memory."""
+
+    def __init__(self, max_keys):
+        self.max_keys = max_keys
+        self._buckets = {}  # key -> (tokens, updated)
+        self._lock = threading.Lock()
+
+    def take(self, key, rate, burst, now):
+        """Take a token from bucket `key`. Returns 0.0, or the seconds until one is available."""
+        with self._lock:
+            tokens, updated = self._buckets.get(key, (burst, now))
+            tokens = min(burst, tokens + (now - updated) * rate)
+            if tokens >= 1:
+                self._buckets[key] = (tokens - 1, now)
+                wait = 0.0
+            else:
+                self._buckets[key] = (tokens, now)
+                wait = (1 - tokens) / rate
+            if len(self._buckets) > self.max_keys:
+                self._prune(now)
+        return wait
+
+    def _prune(self, now):
+        # Caller holds self._lock. A bucket idle for a minute is full (or nearly so) and can be recreated full.
+        self._buckets = {key: value for key, value in self._buckets.items() if now - value[1] < 60}
+
+
+class SharedBuckets:
+    """Token buckets in a memory-mapped file shared by the worker processes of one host."""
+
+    SLOT = struct.Struct("=qdd")  # key (0 = empty), tokens, updated (time.monotonic: restarts at boot)
+
+    def __init__(self, path, slots):
+        self.slots = slots
+        size = slots * self.SLOT.size
+        self._fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o600)
+        if os.fstat(self._fd).st_size < size:
+            os.ftruncate(self._fd, size)  # New bytes read as zeros: empty slots
+        self._map = mmap.mmap(self._fd, size)
+        self._lock = threading.Lock()  # fcntl locks are per process; this orders our own threads
+
+    def take(self, key, rate, burst, now):
+        slot = self.SLOT
+        offset = (key % self.slots) * slot.size
+        with self._lock:
+            fcntl.lockf(self._fd, fcntl.LOCK_EX, slot.size, offset)
+            try:
+                stored, tokens, updated = slot.unpack_from(self._map, offset)
+                if stored != key or updated > now:  # Empty, another key's, or written before a reboot
+                    tokens, updated = burst, now
+                tokens = min(burst, tokens + (now - updated) * rate)
+                if tokens >= 1:
+                    slot.pack_into(self._map, offset, key, tokens - 1, now)
+                    return 0.0
+                slot.pack_into(self._map, offset, key, tokens, now)
+                return (1 - tokens) / rate
+            finally:
+                fcntl.lockf(self._fd, fcntl.LOCK_UN, slot.size, offset)
+
+
+class Limiter:
+    """The buckets of every scope; the store is opened lazily, once per process."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self._config = None
+            self._store = None
+            self._pid = None
+
+    def _prepare(self):
+        with self._lock:
+            if self._store is None or self._pid != os.getpid():  # Workers forked from a preloaded master reopen
+                config = get_config()
+                scopes = sorted(config["RATES"])
+                # Bucket key: user_id * (len(scopes) + 1) + the scope's number (1..), unique per (user, scope).
+                self._rates = {}
+                for number, scope in enumerate(scopes, 1):
+                    rate, burst = config["RATES"][scope]
+                    self._rates[scope] = (float(rate), float(burst), number)
+                self._scopes = len(scopes) + 1
+                if config["SHARED_FILE"]:
+                    self._store = SharedBuckets(config["SHARED_FILE"], config["SLOTS"])
+                else:
+                    self._store = LocalBuckets(config["MAX_KEYS"])
+                self._config = config
+                self._pid = os.getpid()
+
+    def take(self, scope, user_id):
+        """0.0 if `user_id` may act in `scope` now, else the seconds to wait (and the refusal is counted)."""
+        if self._pid != os.getpid():
+            self._prepare()
+        if not self._config["ENABLED"] or user_id is None:
+            return 0.0
+        rate, burst, index = self._rates[scope]
+        wait = self._store.take(user_id * self._scopes + index, rate, burst, time.monotonic())
+        if wait:
+            registry.inc(SHED_METRIC, (("scope", scope),))
+        return wait
+
+
+limiter = Limiter()
+
+
+@receiver(setting_changed)
+def _reset_limiter(setting, **kwargs):
+    if setting == "GAME_THROTTLE":
+        limiter.reset()
+
+
+class TokenBucketThrottle(BaseThrottle):
+    """DRF throttle taking one token from the user's bucket for `scope`."""
+
+    scope = None
+
+    def allow_request(self, request, view):
+        self._wait = limiter.take(self.scope, getattr(request.user, "pk", None))
+        return not self._wait
+
+    def wait(self):
+        return self._wait
+
+
+class AttackThrottle(TokenBucketThrottle):
+    scope = "attack"
+
+
+class CollectThrottle(TokenBucketThrottle):
+    scope = "collect"
+
+
+class MoveThrottle(TokenBucketThrottle):
+    scope = "move"
@@ -5,7 +5,9 @@ from .views import (
     start_game, log_move, end_game, 
     get_survival_time, enemy_attack, 
     collect_item, game_home, leaderboard_view,
-    login_view, register_view
+    login_view, register_view,
+    leaderboard_top, leaderboard_page, leaderboard_rank, leaderboard_around,
+    session_replay, heartbeat
 )
 
 app_name = "game"
@@ -15,8 +17,14 @@ urlpatterns = [
     path("move/", log_move, name="log-move"),
     path("end/", end_game, name="end-game"),
     path("survival-time/", get_survival_time, name="survival-time"),
+    path("heartbeat/", heartbeat, name="heartbeat"),
     path("enemy-attack/", enemy_attack, name="enemy-attack"),
     path("collect-item/", collect_item, name="collect-item"),
+    path("sessions/<int:session_id>/replay/", session_replay, name="session-replay"),
+    path("leaderboard/top/", leaderboard_top, name="leaderboard-top"),
+    path("leaderboard/page/", leaderboard_page, name="leaderboard-page"),
+    path("leaderboard/rank/", leaderboard_rank, name="leaderboard-rank"),
+    path("leaderboard/around/", leaderboard_around, name="leaderboard-around"),
     
     # Frontend Pages
     path("", game_home, name="game-home"),  # Home Page
@@ -3,151 +3,241 @@
 from django.shortcuts import render, redirect
 from django.http import JsonResponse
 from django.views.decorators.csrf import csrf_exempt
-from rest_framework.decorators import api_view, permission_classes
+from django.views.decorators.cache import cache_control
+from django.views.decorators.http import condition
+from django.core.cache import cache
+from django.template.loader import render_to_string
+from django.utils.safestring import mark_safe
+from rest_framework.decorators import api_view, permission_classes, throttle_classes
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.response import Response
 from django.contrib.auth.decorators import login_required
 from rest_framework import status
-from django.utils.timezone import now
-import random
-from django.contrib.auth import login, authenticate
-from django.contrib.auth.forms import AuthenticationForm, UserCreationForm
-from .models import GameSession, PlayerMove, Leaderboard
-from .serializers import GameSessionSerializer, PlayerMoveSerializer, LeaderboardSerializer
+from django.contrib.auth import login
+from django.db import IntegrityError
+from asgiref.sync import sync_to_async
+from mygame.staticfiles import build_version
+from mygame.streaming import streaming_response
+from . import actions
+from .actions import GameActionError
+from .models import GameSession
+from .leaderboard_index import TOP_N, leaderboard_index
+from .throttling import AttackThrottle, CollectThrottle, MoveThrottle
+from .serializers import LeaderboardSerializer
+
+LEADERBOARD_TABLE_TIMEOUT = 24 * 3600  # Seconds a rendered top-10 table stays cached
+
+def _refused(error):
+    return Response({"error": error.message}, status=error.status, headers=error.headers)
 
 @api_view(["POST"])
 @permission_classes([IsAuthenticated])
 @csrf_exempt
 def start_game(request):
     """Starts a new game session and returns the session ID."""
-    session = GameSession.objects.create(player=request.user)
-    return JsonResponse({"message": "Game started!", "session_id": session.id})
+    return JsonResponse(actions.start_game(request.user))
 
 @api_view(["POST"])
 @permission_classes([IsAuthenticated])
+@throttle_classes([MoveThrottle])
 def log_move(request):
-    """Log a player's move during the game."""
-    session_id = request.data.get("session_id")
-    action = request.data.get("action")
-
+    """Queue a player's move for batched insertion."""
     try:
-        session = GameSession.objects.get(id=session_id, player=request.user)
-        move = PlayerMove.objects.create(session=session, action=action)
-        return Response({"message": "Move logged!", "move_id": move.id}, status=status.HTTP_201_CREATED)
-    except GameSession.DoesNotExist:
-        return Response({"error": "Invalid session!"}, status=status.HTTP_400_BAD_REQUEST)
+        session = actions.get_session(request.data.get("session_id"), request.user)
+        return Response(actions.log_move(session, request.data.get("action")), status=status.HTTP_202_ACCEPTED)
+    except GameActionError as error:
+        return _refused(error)
 
 @api_view(["POST"])
 @permission_classes([IsAuthenticated])
 def end_game(request):
     """End the game session and update the leaderboard."""
-    session_id = request.data.get("session_id")
-    score = request.data.get("score", 0)
-
     try:
-        session = GameSession.objects.get(id=session_id, player=request.user)
-        session.end_time = now()
-        session.score = score
-        session.save()
-
-        # Update the leaderboard
-        leaderboard, _ = Leaderboard.objects.get_or_create(player=request.user)
-        if score > leaderboard.best_score:
-            leaderboard.best_score = score
-            leaderboard.save()
-
-        return Response({"message": "Game ended!", "final_score": score}, status=status.HTTP_200_OK)
-    except GameSession.DoesNotExist:
-        return Response({"error": "Invalid session!"}, status=status.HTTP_400_BAD_REQUEST)
+        score = actions.parse_score(request.data.get("score", 0))
+        result = actions.end_game(request.user, request.data.get("session_id"), score)
+        return Response(result, status=status.HTTP_200_OK)
+    except GameActionError as error:
+        return _refused(error)
 
 @api_view(["POST"])
 @permission_classes([IsAuthenticated])
+@throttle_classes([AttackThrottle])
 def enemy_attack(request):
     """Enemy attack reduces player's health randomly."""
-    session_id = request.data.get("session_id")
-
     try:
-        session = GameSession.objects.get(id=session_id, player=request.user)
-
-        if not session.is_alive():
-            return Response({"error": "Game Over!"}, status=status.HTTP_400_BAD_REQUEST)
-
-        damage = random.randint(5, 20)  # Random damage
-        session.take_damage(damage)
-
-        return Response({
-            "message": f"Enemy attacked! You lost {damage} HP.",
-            "remaining_health": session.health
-        }, status=status.HTTP_200_OK)
-
-    except GameSession.DoesNotExist:
-        return Response({"error": "Invalid session!"}, status=status.HTTP_400_BAD_REQUEST)
+        session = actions.get_session(request.data.get("session_id"), request.user)
+        return Response(actions.enemy_attack(session), status=status.HTTP_200_OK)
+    except GameActionError as error:
+        return _refused(error)
 
 @api_view(["POST"])
 @permission_classes([IsAuthenticated])
+@throttle_classes([CollectThrottle])
 def collect_item(request):
     """Collect an item and gain a bonus."""
-    session_id = request.data.get("session_id")
-    item = request.data.get("item")  # Example: "Health Potion"
-
     try:
-        session = GameSession.objects.get(id=session_id, player=request.user)
-
-        if not session.is_alive():
-            return Response({"error": "Game Over!"}, status=status.HTTP_400_BAD_REQUEST)
-
-        session.collect_item(item)
-
-        # If it's a health potion, restore health
-        if item == "Health Potion":
-            session.health = min(100, session.health + 20)
-            session.save()
-
-        return Response({
-            "message": f"You collected a {item}!",
-            "inventory": session.items,
-            "health": session.health
-        }, status=status.HTTP_200_OK)
-
-    except GameSession.DoesNotExist:
-        return Response({"error": "Invalid session!"}, status=status.HTTP_400_BAD_REQUEST)
+        session = actions.get_session(request.data.get("session_id"), request.user)
+        return Response(actions.collect_item(session, request.data.get("item")), status=status.HTTP_200_OK)
+    except GameActionError as error:
+        return _refused(error)
 
+@api_view(["GET"])
+@permission_classes([IsAuthenticated])
 def get_survival_time(request):
-    """Returns survival time message."""
-    return JsonResponse({"message": "Survival time will be implemented soon!"}, status=200)
+    """Survival time of `?session_id=`, computed from the server's start (and end) time."""
+    try:
+        return Response(actions.survival_time(request.user, request.query_params.get("session_id")))
+    except GameActionError as error:
+        return _refused(error)
+
+@api_view(["POST"])
+@permission_classes([IsAuthenticated])
+def heartbeat(request):
+    """Keep a session alive; sessions without one for a while are ended automatically."""
+    try:
+        session = actions.get_session(request.data.get("session_id"), request.user)
+        return Response(actions.heartbeat(session), status=status.HTTP_200_OK)
+    except GameActionError as error:
+        return _refused(error)
 
 @login_required
 def game_home(request):
     """Render the game home page."""
     return render(request, "game/index.html")
 
+def _leaderboard_etag(request):
+    return f"{build_version()}:{leaderboard_index.top_version()}"  # A deploy changes the page too
+
 @login_required
+@cache_control(private=True, no_cache=True)  # Behind login: browsers revalidate, shared caches keep out
+@condition(etag_func=_leaderboard_etag)  # No Last-Modified: see leaderboard_index.py
 def leaderboard_view(request):
     """Render the leaderboard page with top players."""
-    top_players = Leaderboard.objects.order_by("-best_score")[:10]
-    return render(request, "game/leaderboard.html", {"leaderboard": top_players})
+    key = f"game:leaderboard-table:{_leaderboard_etag(request)}"  # A new top 10 or build is a new key
+    table = cache.get(key)
+    if table is None:
+        table = render_to_string("game/leaderboard_table.html", {"leaderboard": leaderboard_index.top(TOP_N)})
+        cache.set(key, table, LEADERBOARD_TABLE_TIMEOUT)
+    return render(request, "game/leaderboard.html", {"table": mark_safe(table)})
+
+def _ranked(ranks, entries):
+    """Serialize leaderboard entries with their rank."""
+    data = LeaderboardSerializer(entries, many=True).data
+    for rank, row in zip(ranks, data):
+        row["rank"] = rank
+    return data
+
+def _limit(request, default, maximum=100):
+    try:
+        return max(1, min(int(request.query_params.get("limit", default)), maximum))
+    except ValueError:
+        return default
+
+@api_view(["GET"])
+@permission_classes([IsAuthenticated])
+def leaderboard_top(request):
+    """Top N players."""
+    entries = leaderboard_index.top(_limit(request, 10))
+    return Response({"results": _ranked(leaderboard_index.ranks(entries), entries)})
+
+@api_view(["GET"])
+@permission_classes([IsAuthenticated])
+def leaderboard_page(request):
+    """One keyset-paginated page of the leaderboard; pass back `next` as `after`."""
+    try:
+        entries, next_cursor = leaderboard_index.page(request.query_params.get("after"), _limit(request, 50))
+    except ValueError:
+        return Response({"error": "Invalid cursor!"}, status=status.HTTP_400_BAD_REQUEST)
+    return Response({"results": _ranked(leaderboard_index.ranks(entries), entries), "next": next_cursor})
 
-def login_view(request):
+def _leaderboard_player_id(request):
+    username = request.query_params.get("player")
+    return request.user.pk if username is None else leaderboard_index.player_id(username)
+
+@api_view(["GET"])
+@permission_classes([IsAuthenticated])
+def leaderboard_rank(request):
+    """Rank of `?player=<username>` (default: the current user)."""
+    found = leaderboard_index.rank(_leaderboard_player_id(request))
+    if found is None:
+        return Response({"error": "Player has no score yet!"}, status=status.HTTP_404_NOT_FOUND)
+    rank, entry = found
+    return Response(_ranked([rank], [entry])[0])
+
+@api_view(["GET"])
+@permission_classes([IsAuthenticated])
+def leaderboard_around(request):
+    """Players ranked around `?player=<username>` (default: the current user)."""
+    try:
+        radius = max(0, min(int(request.query_params.get("radius", 5)), 50))
+    except ValueError:
+        radius = 5
+    neighbours = leaderboard_index.around(_leaderboard_player_id(request), radius)
+    if not neighbours:
+        return Response({"error": "Player has no score yet!"}, status=status.HTTP_404_NOT_FOUND)
+    ranks, entries = zip(*neighbours)
+    return Response({"results": _ranked(ranks, entries)})
+
+@api_view(["GET"])
+@permission_classes([IsAuthenticated])
+def session_replay(request, session_id):
+    """Stream a session's moves as NDJSON (owner or admin); resume with `?after=<timestamp>,<id>`."""
+    owner = GameSession.objects.filter(id=session_id).values_list("player_id", flat=True).first()
+    if owner is None or (owner != request.user.pk and getattr(request.user, "role", None) != "admin"):
+        return Response({"error": "Invalid session!"}, status=status.HTTP_404_NOT_FOUND)
+    from . import replay  # Loads the move archive and numpy; only replays need them
+
+    try:
+        after = replay.parse_cursor(request.query_params.get("after"))
+    except ValueError:
+        return Response({"error": "Invalid cursor!"}, status=status.HTTP_400_BAD_REQUEST)
+    response = streaming_response(request, replay.stream_moves(session_id, after), content_type="application/x-ndjson")
+    response["X-Accel-Buffering"] = "no"  # Let proxies pass lines through as they are produced
+    return response
+
+def _busy_page(request, template, form, message):
+    from authentication.hashing import hashing_pool
+
+    form.add_error(None, message)
+    response = render(request, template, {"form": form}, status=status.HTTP_503_SERVICE_UNAVAILABLE)
+    response["Retry-After"] = str(hashing_pool.retry_after)
+    return response
+
+async def login_view(request):
     """Handles user login."""
+    from authentication.forms import PooledAuthenticationForm
+    from authentication.hashing import HashingPoolSaturated
+
     if request.method == "POST":
-        form = AuthenticationForm(request, data=request.POST)
-        if form.is_valid():
-            user = form.get_user()
-            login(request, user)
-            return redirect("game:game-home")  # Redirect to home page after login
+        form = PooledAuthenticationForm(request, data=request.POST)
+        try:
+            if await form.ais_valid():
+                await sync_to_async(login)(request, form.get_user())
+                return redirect("game:game-home")  # Redirect to home page after login
+        except HashingPoolSaturated:
+            return _busy_page(request, "game/login.html", form, "Too many logins in progress, please retry shortly.")
     else:
-        form = AuthenticationForm()
-    print("login_view triggered")
+        form = PooledAuthenticationForm()
     return render(request, "game/login.html", {"form": form})
 
-def register_view(request):
+async def register_view(request):
     """Handles user registration."""
+    from authentication.forms import RegistrationForm
+    from authentication.hashing import HashingPoolSaturated
+
     if request.method == "POST":
-        form = UserCreationForm(request.POST)
-        if form.is_valid():
-            user = form.save()
-            login(request, user)
-            return redirect("game:game-home")  # Redirect to home page after registration
+        form = RegistrationForm(request.POST)
+        if await sync_to_async(form.is_valid)():  # Username lookups and password validators
+            try:
+                user = await form.asave()
+            except HashingPoolSaturated:
+                return _busy_page(request, "game/register.html", form,
+                                  "Too many sign-ups in progress, please retry shortly.")
+            except IntegrityError:  # Taken since is_valid() checked
+                form.add_error("username", "A user with that username already exists.")
+            else:
+                await sync_to_async(login)(request, user)
+                return redirect("game:game-home")  # Redirect to home page after registration
     else:
-        form = UserCreationForm()
+        form = RegistrationForm()
     return render(request, "game/register.html", {"form": form})
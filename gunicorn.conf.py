@@ -0,0 +1,70 @@
+# gunicorn.conf.py
+"""
+Production gunicorn settings, read from the working directory: `gunicorn`.
+
+The application is imported and warmed up once in the master (preload_app,
+mygame/startup.py) and the workers are forked from it, so they start
+without repeating that work and share its memory copy-on-write. See
+`manage.py bench_startup` for the startup time and per-worker memory.
+
+GUNICORN_ASGI=True serves mygame.asgi with uvicorn workers. That is
+required for the WebSocket channel (/ws/game/), and it lets the async
+login and register views wait for password hashing without holding a
+thread. GUNICORN_THREADS does not apply then. Django runs the sync code of
+each request (the DRF views) on a thread of that request's own (asgiref's
+ThreadSensitiveContext), so a worker runs as many sync views at once as it
+has requests in flight, with no cap. Otherwise the WSGI app runs on
+threaded workers, at most GUNICORN_THREADS requests at a time per worker.
+
+Session affinity. The live session store (game/live_state.py) and the
+tick engine (game/ticks.py) are per process, so every request for a game
+session must reach the process that holds it. Gunicorn hands each
+connection to whichever worker accepts it first, so it cannot provide
+that. WEB_CONCURRENCY therefore defaults to 1. With a single worker,
+preload_app and gc.freeze only shorten restarts: there is no second worker
+to share memory with. To use more cores, pick one of:
+
+- Several workers in one gunicorn (WEB_CONCURRENCY=N) with
+  GAME_LIVE_STATE["MAX_SESSIONS"] = 0, which makes the store write-through,
+  and the tick engine off. The workers share the preloaded memory, and each
+  request reads and writes its session row. Set GAME_THROTTLE["SHARED_FILE"]
+  too, or each worker enforces the rate limits on its own.
+- One single-worker gunicorn per core, each on its own GUNICORN_BIND,
+  behind a proxy that sends every request of a player to the same instance
+  (sticky routing). The write-behind store and the tick engine then stay
+  on, but each instance loads its own copy of the app.
+"""
+
+import os
+
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "mygame.settings")
+
+if os.getenv("GUNICORN_ASGI", "False") == "True":
+    wsgi_app = "mygame.asgi:application"
+    worker_class = "uvicorn.workers.UvicornWorker"
+else:
+    wsgi_app = "mygame.wsgi:application"
+bind = os.getenv("GUNICORN_BIND", "0.0.0.0:8000")
+workers = int(os.getenv("WEB_CONCURRENCY", "1"))
+threads = int(os.getenv("GUNICORN_THREADS", "8"))
+preload_app = os.getenv("GUNICORN_PRELOAD", "True") == "True"
+max_requests = int(os.getenv("GUNICORN_MAX_REQUESTS", "0"))  # Recycling forks a fresh, still warm worker
+max_requests_jitter = max_requests // 10
+timeout = 30
+graceful_timeout = 30  # Time for background flushers to drain on shutdown
+
+
+def when_ready(server):
+    """Runs in the master after the app is loaded, before the first fork."""
+    if not server.cfg.preload_app:
+        return  # Each worker loads the app itself
+    from mygame.startup import warm_up
+
+    warm_up()
+    server.log.info("Application warmed up in the master")
+
+
+def post_fork(server, worker):
+    from mygame.startup import after_fork
+
+    after_fork()
@@ -2,6 +2,9 @@
 ASGI config for mygame project.
 
 It exposes the ASGI callable as a module-level variable named ``application``.
+HTTP goes to Django; WebSocket connections go to the game channel
+(game/realtime.py). Serve it with an ASGI server, e.g.
+``uvicorn mygame.asgi:application``.
 
 For more information on this file, see
 https://docs.djangoproject.com/en/5.1/howto/deployment/asgi/
@@ -13,4 +16,13 @@ from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'mygame.settings')
 
-application = get_asgi_application()
+django_application = get_asgi_application()
+
+from game.realtime import websocket_router  # noqa: E402  (needs Django set up)
+
+
+async def application(scope, receive, send):
+    if scope['type'] == 'websocket':
+        await websocket_router(scope, receive, send)
+    else:
+        await django_application(scope, receive, send)
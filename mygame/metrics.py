@@ -0,0 +1,312 @@
+"""
+Per-endpoint request metrics in the Prometheus text exposition format.
+
+MetricsMiddleware records, per URL name: request counts by status, a latency
+histogram, a response size histogram, DB query counts and time, and errors.
+Each request does a handful of dict updates under one lock.
+
+Every worker process keeps its own registry and dumps a snapshot to
+METRICS_DIR/<pid>.json at most every METRICS_DUMP_INTERVAL seconds (and at
+exit). The /metrics view sums the snapshots of all processes, with its own
+process's live numbers, so any worker can answer a scrape. Snapshots of
+exited workers are kept, like prometheus_client's multiprocess mode, so their
+counters and histograms still count; their gauges are dropped, since they
+describe a process that no longer exists. Clear the directory when deploying.
+With METRICS_DIR = None only the serving process is reported.
+
+/metrics answers only clients in METRICS_ALLOWED_IPS (addresses or
+networks; loopback by default) and logged-in staff; anyone else gets 403.
+The check reads REMOTE_ADDR, so behind a reverse proxy list the scraper's
+address as the proxy reports it, or block /metrics at the proxy.
+"""
+
+import atexit
+import ipaddress
+import json
+import os
+import threading
+import time
+from bisect import bisect_left
+from collections import defaultdict
+from pathlib import Path
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+from django.db import connection
+from django.http import HttpResponse, HttpResponseForbidden
+
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+SIZE_BUCKETS = (100, 500, 1000, 5000, 10000, 50000, 100000, 1000000)
+QUERY_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100)
+
+
+class Registry:
+    """Counters and histograms keyed by (metric name, sorted label pairs)."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.meta = {}  # name -> (type, help, buckets)
+        self.counters = defaultdict(float)
+        self.histograms = {}  # key -> [bucket counts..., +Inf count, sum]
+        self.collectors = []
+
+    def describe(self, name, kind, help_text, buckets=None):
+        self.meta.setdefault(name, (kind, help_text, buckets))
+
+    def inc(self, name, labels, value=1):
+        """Increment a counter; callers hold no lock."""
+        with self.lock:
+            self.counters[(name, labels)] += value
+
+    def _observe(self, name, labels, value):
+        # Caller holds self.lock.
+        buckets = self.meta[name][2]
+        key = (name, labels)
+        series = self.histograms.get(key)
+        if series is None:
+            series = self.histograms[key] = [0] * (len(buckets) + 2)
+        series[bisect_left(buckets, value)] += 1
+        series[-1] += value
+
+    def snapshot(self):
+        """JSON-friendly copy of this process's metrics, collectors included."""
+        collected = []
+        for collector in self.collectors:
+            collected.extend(collector())
+        with self.lock:
+            counters = [[name, list(labels), value] for (name, labels), value in self.counters.items()]
+            histograms = [[name, list(labels), list(series)] for (name, labels), series in self.histograms.items()]
+        for name, kind, help_text, labels, value in collected:
+            self.describe(name, kind, help_text)
+            counters.append([name, list(labels), value])
+        return {"counters": counters, "histograms": histograms}
+
+
+registry = Registry()
+registry.describe("http_requests_total", "counter", "Requests by view, method and status.")
+registry.describe("http_request_duration_seconds", "histogram", "Request latency by view.", LATENCY_BUCKETS)
+registry.describe("http_response_size_bytes", "histogram", "Response body size by view.", SIZE_BUCKETS)
+registry.describe("http_errors_total", "counter", "5xx responses and view exceptions by view.")
+registry.describe("db_queries_per_request", "histogram", "Database queries per request by view.", QUERY_BUCKETS)
+registry.describe("db_query_duration_seconds_total", "counter", "Time spent in database queries by view.")
+
+
+def register_collector(func):
+    """Add a callable returning (name, type, help, labels, value) samples, evaluated at snapshot time.
+
+    Values are summed across processes, so report per-process counters or gauges that add up.
+    """
+    registry.collectors.append(func)
+    return func
+
+
+class QueryCounter:
+    """connection.execute_wrapper that counts queries and their time."""
+
+    __slots__ = ("count", "seconds")
+
+    def __init__(self):
+        self.count = 0
+        self.seconds = 0.0
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.count += 1
+            self.seconds += time.perf_counter() - start
+
+
+class MetricsMiddleware:
+    """Records per-URL-name request metrics. Put it first in MIDDLEWARE."""
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        queries = QueryCounter()
+        start = time.perf_counter()
+        with connection.execute_wrapper(queries):
+            response = self.get_response(request)
+        self.record(request, response, queries, time.perf_counter() - start)
+        dumper.maybe_dump()
+        return response
+
+    async def __acall__(self, request):
+        queries = QueryCounter()
+        start = time.perf_counter()
+        with connection.execute_wrapper(queries):  # Sync views run in the same context, on the same connection
+            response = await self.get_response(request)
+        self.record(request, response, queries, time.perf_counter() - start)
+        if dumper.due():  # Write the snapshot off the event loop
+            await sync_to_async(dumper.maybe_dump, thread_sensitive=False)()
+        return response
+
+    def record(self, request, response, queries, elapsed):
+        match = getattr(request, "resolver_match", None)
+        view = match.view_name if match is not None else "<unmatched>"
+        if response.streaming:
+            size = None
+        else:
+            size = len(response.content)
+        error = getattr(request, "_metrics_exception", None)
+        if error is None and response.status_code >= 500:
+            error = str(response.status_code)
+
+        with registry.lock:
+            registry.counters[("http_requests_total", (("method", request.method), ("status", str(response.status_code)),
+                                                       ("view", view)))] += 1
+            registry._observe("http_request_duration_seconds", (("view", view),), elapsed)
+            registry._observe("db_queries_per_request", (("view", view),), queries.count)
+            registry.counters[("db_query_duration_seconds_total", (("view", view),))] += queries.seconds
+            if size is not None:
+                registry._observe("http_response_size_bytes", (("view", view),), size)
+            if error is not None:
+                registry.counters[("http_errors_total", (("error", error), ("view", view)))] += 1
+
+    def process_exception(self, request, exception):
+        request._metrics_exception = type(exception).__name__
+
+
+class SnapshotDumper:
+    """Writes this process's snapshot to METRICS_DIR, rate-limited."""
+
+    def __init__(self):
+        self._next = 0.0
+        self._lock = threading.Lock()
+
+    def directory(self):
+        path = getattr(settings, "METRICS_DIR", None)
+        return Path(path) if path else None
+
+    def due(self):
+        return time.monotonic() >= self._next
+
+    def maybe_dump(self):
+        if self.due() and self._lock.acquire(blocking=False):
+            try:
+                self._next = time.monotonic() + getattr(settings, "METRICS_DUMP_INTERVAL", 5)
+                self.dump()
+            finally:
+                self._lock.release()
+
+    def dump(self):
+        directory = self.directory()
+        if directory is None:
+            return
+        directory.mkdir(parents=True, exist_ok=True)
+        target = directory / f"{os.getpid()}.json"
+        temporary = directory / f".{os.getpid()}.json.tmp"
+        temporary.write_text(json.dumps(registry.snapshot()))
+        os.replace(temporary, target)
+
+
+dumper = SnapshotDumper()
+atexit.register(dumper.dump)
+
+
+def _alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:  # Exists, owned by someone else
+        return True
+    return True
+
+
+def aggregate():
+    """Sum the snapshots of every process (this one live); exited processes contribute no gauges."""
+    snapshots = [registry.snapshot()]
+    directory = dumper.directory()
+    if directory is not None and directory.is_dir():
+        own = f"{os.getpid()}.json"
+        for path in directory.glob("*.json"):
+            if path.name == own:
+                continue
+            try:
+                snapshot = json.loads(path.read_text())
+            except (OSError, ValueError):
+                continue
+            if path.stem.isdigit() and not _alive(int(path.stem)):
+                snapshot["counters"] = [sample for sample in snapshot["counters"]
+                                        if registry.meta.get(sample[0], ("untyped",))[0] != "gauge"]
+            snapshots.append(snapshot)
+
+    counters = defaultdict(float)
+    histograms = {}
+    for snapshot in snapshots:
+        for name, labels, value in snapshot["counters"]:
+            counters[(name, tuple(map(tuple, labels)))] += value
+        for name, labels, series in snapshot["histograms"]:
+            key = (name, tuple(map(tuple, labels)))
+            total = histograms.setdefault(key, [0] * len(series))
+            for i, value in enumerate(series):
+                total[i] += value
+    return counters, histograms
+
+
+def _format_labels(labels, extra=()):
+    pairs = list(labels) + list(extra)
+    if not pairs:
+        return ""
+    escaped = (str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n") for _, value in pairs)
+    return "{" + ",".join(f'{key}="{value}"' for (key, _), value in zip(pairs, escaped)) + "}"
+
+
+def _format_value(value):
+    return str(int(value)) if float(value).is_integer() else repr(float(value))
+
+
+def render():
+    """All metrics in the Prometheus text exposition format (version 0.0.4)."""
+    counters, histograms = aggregate()
+    lines = []
+    names = sorted({name for name, _ in counters} | {name for name, _ in histograms})
+    for name in names:
+        kind, help_text, buckets = registry.meta.get(name, ("untyped", "", None))
+        lines.append(f"# HELP {name} {help_text}")
+        lines.append(f"# TYPE {name} {kind}")
+        if kind == "histogram":
+            for (series_name, labels), series in sorted(histograms.items()):
+                if series_name != name:
+                    continue
+                cumulative = 0
+                for bound, count in zip(list(buckets) + ["+Inf"], series[:-1]):
+                    cumulative += count
+                    le = bound if bound == "+Inf" else _format_value(bound)
+                    lines.append(f"{name}_bucket{_format_labels(labels, [('le', le)])} {cumulative}")
+                lines.append(f"{name}_sum{_format_labels(labels)} {_format_value(series[-1])}")
+                lines.append(f"{name}_count{_format_labels(labels)} {cumulative}")
+        else:
+            for (series_name, labels), value in sorted(counters.items()):
+                if series_name == name:
+                    lines.append(f"{name}{_format_labels(labels)} {_format_value(value)}")
+    return "\n".join(lines) + "\n"
+
+
+def _may_scrape(request):
+    allowed = getattr(settings, "METRICS_ALLOWED_IPS", ["127.0.0.1", "::1"])
+    try:
+        client = ipaddress.ip_address(request.META.get("REMOTE_ADDR", ""))
+        if any(client in ipaddress.ip_network(network, strict=False) for network in allowed):
+            return True
+    except ValueError:
+        pass
+    user = getattr(request, "user", None)  # Only now: loading it reads the session
+    return user is not None and user.is_staff
+
+
+def metrics_view(request):
+    """Prometheus scrape endpoint (allowed clients and staff only)."""
+    if not _may_scrape(request):
+        return HttpResponseForbidden("Forbidden\n", content_type="text/plain")
+    return HttpResponse(render(), content_type="text/plain; version=0.0.4; charset=utf-8")
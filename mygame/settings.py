@@ -11,6 +11,7 @@ https://docs.djangoproject.com/en/5.1/ref/settings/
 """
 
 import os
+import sys
 from datetime import timedelta
 from pathlib import Path
 
@@ -43,8 +44,6 @@ CSRF_TRUSTED_ORIGINS = [
 
 INSTALLED_APPS = [
     'game',
-    'django_extensions',
-    'sslserver',
     'authentication',  # Our authentication app
     'rest_framework', # Django REST Framework
     'rest_framework_simplejwt',  # JWT Authentication
@@ -56,11 +55,22 @@ INSTALLED_APPS = [
     'django.contrib.staticfiles',
 ]
 
+# Development tools (runserver_plus, shell_plus, runsslserver). Production workers
+# (DJANGO_PRODUCTION=True) skip importing them unless DJANGO_DEV_APPS=True or one of
+# their commands is being run.
+DEV_APPS = ['django_extensions', 'sslserver']
+DEV_COMMANDS = {'runsslserver', 'runserver_plus', 'shell_plus', 'show_urls', 'graph_models'}
+if (os.getenv('DJANGO_PRODUCTION', 'False') != 'True' or os.getenv('DJANGO_DEV_APPS', 'False') == 'True'
+        or (len(sys.argv) > 1 and sys.argv[1] in DEV_COMMANDS)):
+    INSTALLED_APPS[1:1] = DEV_APPS
+
 
 
 MIDDLEWARE = [
+    'mygame.metrics.MetricsMiddleware',  # Per-endpoint metrics, served at /metrics
     'authentication.middleware.CustomExceptionMiddleware',  # Custom error handling middleware
     'django.middleware.security.SecurityMiddleware',
+    'mygame.staticfiles.StaticFilesMiddleware',  # Collected, precompressed static files; skips the rest
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',  # Keep CSRF Middleware
@@ -96,12 +106,37 @@ WSGI_APPLICATION = 'mygame.wsgi.application'
 
 DATABASES = {
     'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
+        'ENGINE': 'mygame.sqlite_tuned',  # sqlite3 plus WAL and tuning pragmas (mygame/sqlite_tuned/base.py)
         'NAME': BASE_DIR / 'db.sqlite3',
+        'CONN_MAX_AGE': 600,  # Keep each worker thread's connection open between requests
+        'CONN_HEALTH_CHECKS': True,
+        'OPTIONS': {
+            'transaction_mode': 'IMMEDIATE',  # Take the write lock at BEGIN instead of failing on upgrade
+        },
     }
 }
 
 
+# Caches
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    # Session reads (authentication/sessions.py). Must be shared by every worker, or a logged-out session
+    # keeps authenticating in the workers that cached it: Redis when SESSION_CACHE_URL is set, otherwise
+    # files under SESSION_CACHE_DIR, which the workers of one host share.
+    'sessions': {
+        'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+        'LOCATION': os.getenv('SESSION_CACHE_URL'),
+    } if os.getenv('SESSION_CACHE_URL') else {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': os.getenv('SESSION_CACHE_DIR', str(BASE_DIR / '.session_cache')),
+        'OPTIONS': {'MAX_ENTRIES': 50000},
+    },
+}
+
+
 # Password validation
 # https://docs.djangoproject.com/en/5.1/ref/settings/#auth-password-validators
 
@@ -125,7 +160,7 @@ AUTH_PASSWORD_VALIDATORS = [
 
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': (
-        'rest_framework_simplejwt.authentication.JWTAuthentication',
+        'authentication.authentication.CachedJWTAuthentication',  # JWT with verified-token/user caching
     ),
     'DEFAULT_PERMISSION_CLASSES': (
         'rest_framework.permissions.AllowAny',  # Allow login for unauthenticated users
@@ -139,6 +174,20 @@ SIMPLE_JWT = {
     'ROTATE_REFRESH_TOKENS': True,  # Generate a new refresh token every time
 }
 
+# Caches used by CachedJWTAuthentication (see authentication/authentication.py)
+AUTH_CACHE = {
+    'TOKENS': 10000,  # Verified tokens, each kept until it expires
+    'USERS': 10000,
+    'USER_TTL': 300,  # Seconds; bounds staleness for user changes made by other workers
+}
+
+# Bounded pool that login/register views hash passwords on (see authentication/hashing.py)
+AUTH_HASHING = {
+    'WORKERS': int(os.getenv('AUTH_HASHING_WORKERS', 2)),  # Per process; 0 hashes on the request thread
+    'MAX_PENDING': int(os.getenv('AUTH_HASHING_MAX_PENDING', 4)),  # Keep below GUNICORN_THREADS; beyond it: 503
+    'RETRY_AFTER': 1,
+}
+
 # Internationalization
 # https://docs.djangoproject.com/en/5.1/topics/i18n/
 
@@ -155,6 +204,17 @@ USE_TZ = True
 # https://docs.djangoproject.com/en/5.1/howto/static-files/
 
 STATIC_URL = 'static/'
+STATIC_ROOT = os.getenv('STATIC_ROOT', str(BASE_DIR / 'staticfiles'))  # `manage.py collectstatic` target
+STATIC_MAX_AGE = 60  # Seconds browsers cache static files without a content hash in their name
+RELEASE = os.getenv('RELEASE') or None  # Build identifier (e.g. the git commit); part of page ETags
+
+# In production collectstatic fingerprints file names and writes .gz/.br copies
+# (see mygame/staticfiles.py); {% static %} then needs the generated manifest.
+if os.getenv('DJANGO_PRODUCTION', 'False') == 'True':
+    STORAGES = {
+        'default': {'BACKEND': 'django.core.files.storage.FileSystemStorage'},
+        'staticfiles': {'BACKEND': 'mygame.staticfiles.CompressedManifestStaticFilesStorage'},
+    }
 
 
 if os.getenv('DJANGO_PRODUCTION', 'False') == 'True':
@@ -172,8 +232,14 @@ else:
 
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
-# Use database-based sessions (default)
-SESSION_ENGINE = 'django.contrib.sessions.backends.db'
+# Database-backed sessions that only write when something changed (authentication/sessions.py)
+SESSION_ENGINE = 'authentication.sessions'
+SESSION_CACHE_ALIAS = 'sessions'
+SESSION_LOCAL_CACHE_TTL = 30  # Seconds a session is served from the 'sessions' cache before rereading the row
+SESSION_REFRESH_INTERVAL = 3600  # Seconds; unchanged sessions refresh their stored expiry at most this often
+
+# Use database-based sessions
+# SESSION_ENGINE = 'django.contrib.sessions.backends.db'
 
 # Use file-based sessions
 # SESSION_ENGINE = 'django.contrib.sessions.backends.file'
@@ -199,3 +265,104 @@ SESSION_COOKIE_NAME = "game_session"
 
 LOGIN_URL = "/api/game/login/"
 
+# Running under `manage.py test`
+TESTING = len(sys.argv) > 1 and sys.argv[1] == "test"
+
+# Background threads (write-behind flushers etc.). Off in tests, which drain explicitly.
+GAME_BACKGROUND_WORKERS = not TESTING
+
+# Request metrics (see mygame/metrics.py). Each worker process dumps its numbers here
+# so /metrics can report all of them; None reports the serving process only.
+METRICS_DIR = None if TESTING else os.getenv('METRICS_DIR', str(BASE_DIR / '.metrics'))
+METRICS_DUMP_INTERVAL = 5  # Seconds
+# Clients that may scrape /metrics without a staff login: addresses or networks, comma-separated.
+METRICS_ALLOWED_IPS = os.getenv('METRICS_ALLOWED_IPS', '127.0.0.1,::1').split(',')
+
+# Write-behind state for active game sessions (see game/live_state.py)
+GAME_LIVE_STATE = {
+    "MAX_SESSIONS": 10000,  # Set to 0 for write-through when there is no session affinity
+    "IDLE_TIMEOUT": 300,  # Seconds
+    "FLUSH_INTERVAL": 2,  # Seconds; worst-case loss window on a crash
+    "BATCH_SIZE": 500,
+    "LAST_SEEN_INTERVAL": 30,  # Seconds; heartbeats are written at most this often per session
+}
+
+# Auto-ending of sessions that stopped heartbeating (see game/reaper.py)
+GAME_SESSION_REAPER = {
+    "TIMEOUT": 120,  # Seconds; keep above LAST_SEEN_INTERVAL + FLUSH_INTERVAL
+    "INTERVAL": 30,  # Seconds between runs
+    "BATCH_SIZE": 500,  # Sessions ended per UPDATE
+}
+
+# Throttled cleanup of expired django_session rows and abandoned games
+# (see game/maintenance.py, `manage.py cleanup`)
+GAME_MAINTENANCE = {
+    "INTERVAL": 0,  # Seconds between in-process runs; 0 = run `manage.py cleanup` from cron instead
+    "BATCH_SIZE": 500,  # Rows per transaction
+    "DUTY_CYCLE": 0.25,  # Largest fraction of wall time cleanup holds the write lock
+}
+
+# Server-side enemy attacks on every active session (see game/ticks.py)
+GAME_TICK_ENGINE = {
+    "ENABLED": False,  # Opt-in; clients then only see damage through pushes and responses
+    "TICK_INTERVAL": 1.0,  # Seconds
+    "ATTACK_CHANCE": 0.1,  # Per session per tick
+    "PERSIST_INTERVAL": 5.0,  # Seconds between batched health writes
+}
+
+# Buffered PlayerMove ingestion for log_move (see game/ingest.py)
+GAME_MOVE_INGEST = {
+    "BATCH_SIZE": 500,  # Rows per bulk_create
+    "FLUSH_INTERVAL": 0.5,  # Seconds
+    "MAX_QUEUE": 50000,  # Beyond this log_move answers 503
+    "ENQUEUE_TIMEOUT": 0.05,  # Seconds
+}
+
+# In-memory ranked leaderboard (see game/leaderboard_index.py)
+GAME_LEADERBOARD_INDEX = {
+    "RELOAD_INTERVAL": 60,  # Seconds; bounds staleness across worker processes
+}
+
+# Cold storage for moves of finished sessions (see game/archive.py, `manage.py archive_moves`)
+GAME_MOVE_ARCHIVE = {
+    "DIR": os.getenv('GAME_ARCHIVE_DIR', str(BASE_DIR / 'archive' / 'moves')),
+    "AFTER_DAYS": 30,
+    "SEGMENT_ROWS": 500_000,  # Rows per segment file set
+    "DELETE_BATCH": 2000,  # Rows deleted per transaction; keeps write locks short
+}
+
+# Per-user token buckets on attack, collect and move, REST and WebSocket alike
+# (see game/throttling.py, `manage.py bench_throttle`)
+GAME_THROTTLE = {
+    "ENABLED": True,
+    "RATES": {  # scope -> (tokens per second, burst)
+        "attack": (5, 20),
+        "collect": (5, 20),
+        "move": (20, 60),
+    },
+    # Share the buckets between the workers of one host (one file per host, e.g. on tmpfs);
+    # None keeps them per process, so N workers allow up to N times the rate.
+    "SHARED_FILE": os.getenv('GAME_THROTTLE_FILE') or None,
+    "SLOTS": 65536,  # 24 bytes each
+}
+
+# Hourly/daily activity counters behind the admin dashboard
+# (see game/rollups.py, `manage.py backfill_rollups`)
+GAME_ROLLUPS = {
+    "FLUSH_INTERVAL": 10,  # Seconds; buffered counts are added to the rollup rows this often
+    "HOURS_SHOWN": 24,
+    "DAYS_SHOWN": 30,  # Days the dashboard's average score covers
+}
+
+# Gameplay analytics (see game/analytics.py, `manage.py analytics`)
+GAME_ANALYTICS = {
+    "CACHE_DIR": BASE_DIR / 'analytics',  # Per-session results, so reruns are incremental
+    "CHUNK_SIZE": 20000,  # Sessions per chunk
+    "WORKERS": 1,  # Threads processing chunks
+    "LOOKBACK": None,  # Seconds reread before the watermark; None: the reaper's TIMEOUT + INTERVAL
+}
+
+# Best-score upserts from end_game (see game/scores.py)
+GAME_SCORE_SUBMISSION = {
+    "COALESCE_WINDOW": 0.05,  # Seconds; bursts per player inside the window become one write
+}
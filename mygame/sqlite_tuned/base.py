@@ -0,0 +1,35 @@
+"""
+SQLite backend tuned for concurrent game traffic (ENGINE 'mygame.sqlite_tuned').
+
+On every new connection it applies PRAGMAS (WAL journal, NORMAL sync, larger
+page cache, memory-mapped reads, busy timeout), merged with the optional
+OPTIONS['pragmas'] dict. WAL lets readers run alongside the single writer;
+combine it with OPTIONS['transaction_mode'] = 'IMMEDIATE' so write
+transactions take the lock up front and wait on busy_timeout instead of
+failing with "database is locked" when upgrading from a read lock.
+Connections are reused per thread through CONN_MAX_AGE as usual.
+"""
+
+from django.db.backends.sqlite3 import base
+
+PRAGMAS = {
+    "journal_mode": "WAL",
+    "synchronous": "NORMAL",  # Durable across app crashes; an OS crash can lose the last commits
+    "cache_size": -64000,  # Negative means KiB: 64 MB page cache per connection
+    "mmap_size": 268435456,  # 256 MB of the file read through mmap
+    "busy_timeout": 5000,  # Milliseconds to wait for the write lock
+    "temp_store": "MEMORY",
+}
+
+
+class DatabaseWrapper(base.DatabaseWrapper):
+    def get_connection_params(self):
+        kwargs = super().get_connection_params()
+        self.pragmas = {**PRAGMAS, **kwargs.pop("pragmas", {})}
+        return kwargs
+
+    def get_new_connection(self, conn_params):
+        conn = super().get_new_connection(conn_params)
+        for name, value in self.pragmas.items():
+            conn.execute(f"PRAGMA {name} = {value}")
+        return conn
@@ -0,0 +1,63 @@
+"""
+Process startup hooks for preforking servers (see gunicorn.conf.py).
+
+`warm_up()` runs once in the gunicorn master after the application is
+preloaded. It does the work every worker would otherwise repeat on its
+first requests: importing every URLconf and view module, compiling the page
+templates and building the in-memory leaderboard index. Afterwards it moves
+everything allocated so far into the garbage collector's permanent
+generation (gc.freeze), so collections in the workers do not touch, and
+thereby copy, the pages they share with the master.
+
+`after_fork()` runs in each worker before it serves anything. A forked
+process must not reuse its parent's database connections, and per-process
+random state has to diverge.
+"""
+
+import gc
+import logging
+import sys
+
+from django.db import connections
+from django.template import TemplateDoesNotExist, TemplateSyntaxError
+from django.template.loader import get_template
+from django.urls import get_resolver
+
+logger = logging.getLogger(__name__)
+
+TEMPLATES = ("game/index.html", "game/leaderboard.html", "game/login.html", "game/register.html")
+
+
+def warm_up():
+    """Load what the first requests of every worker would. Call in the master, after django.setup()."""
+    get_resolver().url_patterns  # Imports every urlconf and, through them, every view module
+    for name in TEMPLATES:
+        try:
+            get_template(name)  # The cached loader keeps the compiled template
+        except (TemplateDoesNotExist, TemplateSyntaxError):
+            logger.warning("Could not precompile template %s", name, exc_info=True)
+
+    from game.actions import ticks_enabled
+    from game.leaderboard_index import leaderboard_index
+
+    if ticks_enabled():
+        import game.ticks  # noqa: F401  (numpy and the engine's arrays, shared copy-on-write)
+    try:
+        leaderboard_index.load()
+    except Exception:
+        logger.warning("Could not preload the leaderboard index", exc_info=True)
+    finally:
+        connections.close_all()  # Never hand an open connection to a fork
+
+    gc.collect()
+    gc.freeze()
+
+
+def after_fork():
+    """Reset the state a worker must not share with the master."""
+    connections.close_all()  # In case a hook or the app's import opened one after warm_up()
+    ticks = sys.modules.get("game.ticks")
+    if ticks is not None:
+        import numpy as np
+
+        ticks.tick_engine._rng = np.random.default_rng()  # The stdlib random module reseeds itself on fork
@@ -0,0 +1,217 @@
+# mygame/staticfiles.py
+"""
+Fingerprinted, precompressed static files served by the app itself.
+
+`collectstatic` with CompressedManifestStaticFilesStorage copies each asset
+to STATIC_ROOT twice: under its own name and under a content-hashed name
+(game/game.3f2a0c1b9e4d.js, listed in staticfiles.json). In production
+{% static %} resolves to the hashed names. Next to every compressible file
+it writes a .gz copy, and a .br copy when the brotli package is installed,
+each only if it comes out smaller. All compression happens once, at build
+time, never per request.
+
+StaticFilesMiddleware answers GET and HEAD under STATIC_URL from an index
+of STATIC_ROOT built when the middleware loads (in the gunicorn master
+when the app is preloaded). It sends the smallest variant the client's
+Accept-Encoding allows, with Vary: Accept-Encoding. Hashed names are
+cached for a year as immutable; any other name for STATIC_MAX_AGE seconds,
+with Last-Modified revalidation. Bodies are FileResponses. Under WSGI the
+server's wsgi.file_wrapper sends them, and gunicorn does so with
+sendfile(2) on plain sockets. Under ASGI Django reads a file into memory
+before sending it, which the small, compressed assets allow. Paths missing
+from the index fall through to the rest of the stack.
+
+build_version() identifies the deployed build for validators of pages
+that embed it (ETags): settings.RELEASE, if set, and a digest of
+staticfiles.json, which changes whenever an asset does.
+"""
+
+import gzip
+import hashlib
+import json
+import mimetypes
+import os
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.contrib.staticfiles.storage import ManifestStaticFilesStorage
+from django.core.files.base import ContentFile
+from django.core.signals import setting_changed
+from django.dispatch import receiver
+from django.http import FileResponse, HttpResponseNotModified
+from django.utils.http import http_date
+from django.views.static import was_modified_since
+
+try:
+    import brotli
+except ImportError:  # Optional: without it only .gz copies are written
+    brotli = None
+
+COMPRESSIBLE = {".css", ".js", ".mjs", ".map", ".json", ".svg", ".txt", ".html", ".xml", ".ico", ".ttf", ".otf"}
+MIN_SIZE = 200  # Bytes; smaller files are not worth a compressed copy
+ENCODINGS = (("br", ".br"), ("gzip", ".gz"))  # Preferred first
+IMMUTABLE = "public, max-age=31536000, immutable"
+
+
+def _compress(encoding, content):
+    if encoding == "br":
+        return brotli.compress(content, quality=11)
+    return gzip.compress(content, compresslevel=9, mtime=0)  # mtime=0: identical input, identical bytes
+
+
+class CompressedManifestStaticFilesStorage(ManifestStaticFilesStorage):
+    """ManifestStaticFilesStorage that also writes .gz (and .br) copies of compressible files."""
+
+    def post_process(self, paths, dry_run=False, **options):
+        yield from super().post_process(paths, dry_run, **options)
+        if dry_run:
+            return
+        names = set(paths) | set(self.hashed_files.values())
+        for name in sorted(names):
+            if os.path.splitext(name)[1].lower() not in COMPRESSIBLE:
+                continue
+            with self.open(name) as handle:
+                content = handle.read()
+            if len(content) < MIN_SIZE:
+                continue
+            for encoding, suffix in ENCODINGS:
+                if encoding == "br" and brotli is None:
+                    continue
+                compressed = _compress(encoding, content)
+                target = name + suffix
+                if self.exists(target):
+                    self.delete(target)
+                if len(compressed) < len(content):
+                    self._save(target, ContentFile(compressed))
+                    yield name, target, True
+
+
+_build = None  # Read once per process
+
+
+def build_version():
+    """Version string of the deployed build."""
+    global _build
+    if _build is None:
+        parts = [getattr(settings, "RELEASE", None) or ""]
+        if settings.STATIC_ROOT:
+            path = os.path.join(settings.STATIC_ROOT, ManifestStaticFilesStorage.manifest_name)
+            try:
+                with open(path, "rb") as handle:
+                    parts.append(hashlib.blake2b(handle.read(), digest_size=8).hexdigest())
+            except OSError:
+                pass
+        _build = "-".join(part for part in parts if part)
+    return _build
+
+
+@receiver(setting_changed)
+def _reset_build_version(setting, **kwargs):
+    global _build
+    if setting in ("RELEASE", "STATIC_ROOT"):
+        _build = None
+
+
+def _accepted(header):
+    """Content codings an Accept-Encoding header allows."""
+    codings = set()
+    for item in header.split(","):
+        coding, _, params = item.partition(";")
+        params = params.strip().replace(" ", "")
+        if params.startswith("q="):
+            try:
+                if float(params[2:]) == 0:
+                    continue
+            except ValueError:
+                continue
+        codings.add(coding.strip().lower())
+    if "*" in codings:
+        codings.update(encoding for encoding, _ in ENCODINGS)
+    return codings
+
+
+class StaticAsset:
+    """One file under STATIC_ROOT and its precompressed variants."""
+
+    def __init__(self, path, immutable, max_age):
+        self.content_type = mimetypes.guess_type(path)[0] or "application/octet-stream"
+        self.mtime = os.stat(path).st_mtime
+        self.immutable = immutable
+        self.cache_control = IMMUTABLE if immutable else f"public, max-age={max_age}"
+        self.variants = [(encoding, path + suffix) for encoding, suffix in ENCODINGS if os.path.isfile(path + suffix)]
+        self.variants.append((None, path))
+
+    def response(self, request):
+        if not self.immutable and not was_modified_since(request.META.get("HTTP_IF_MODIFIED_SINCE"), self.mtime):
+            response = HttpResponseNotModified()
+        else:
+            accepted = _accepted(request.META.get("HTTP_ACCEPT_ENCODING", ""))
+            encoding, path = next((encoding, path) for encoding, path in self.variants
+                                  if encoding is None or encoding in accepted)
+            response = FileResponse(open(path, "rb"), content_type=self.content_type)
+            del response["Content-Disposition"]  # FileResponse adds "inline; filename=..." with a variant's name
+            if encoding:
+                response["Content-Encoding"] = encoding
+            response["Last-Modified"] = http_date(self.mtime)
+        response["Cache-Control"] = self.cache_control
+        if len(self.variants) > 1:
+            response["Vary"] = "Accept-Encoding"
+        return response
+
+
+def scan(root, max_age):
+    """{relative URL path: StaticAsset} for every file under `root` (compressed copies are variants)."""
+    manifest = ManifestStaticFilesStorage.manifest_name
+    hashed = set()
+    try:
+        with open(os.path.join(root, manifest)) as handle:
+            hashed = set(json.load(handle).get("paths", {}).values())
+    except (OSError, ValueError):
+        pass
+    assets = {}
+    for directory, _, files in os.walk(root):
+        present = set(files)
+        for filename in files:
+            base, suffix = os.path.splitext(filename)
+            if suffix in (".gz", ".br") and base in present:
+                continue
+            path = os.path.join(directory, filename)
+            name = os.path.relpath(path, root).replace(os.sep, "/")
+            if name == manifest:
+                continue
+            assets[name] = StaticAsset(path, name in hashed, max_age)
+    return assets
+
+
+class StaticFilesMiddleware:
+    """Serves collected static files (see the module docstring). Put it right after SecurityMiddleware."""
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+        self.prefix = settings.STATIC_URL
+        root = settings.STATIC_ROOT
+        self.assets = scan(str(root), getattr(settings, "STATIC_MAX_AGE", 60)) if root and os.path.isdir(root) else {}
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        asset = self.lookup(request)
+        if asset is not None:
+            return asset.response(request)
+        return self.get_response(request)
+
+    async def __acall__(self, request):
+        asset = self.lookup(request)
+        if asset is not None:
+            return asset.response(request)
+        return await self.get_response(request)
+
+    def lookup(self, request):
+        if self.assets and request.method in ("GET", "HEAD") and request.path_info.startswith(self.prefix):
+            return self.assets.get(request.path_info[len(self.prefix):])
+        return None
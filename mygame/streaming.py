@@ -0,0 +1,43 @@
+# mygame/streaming.py
+"""
+Streaming responses that stay streamed under ASGI as well as WSGI.
+
+A WSGI server pulls a StreamingHttpResponse's iterator one chunk at a
+time. Django's ASGI handler, given a sync iterator, first drains it into a
+list with sync_to_async(list), so a replay or a table export would be held
+in memory whole. An async iterator served over WSGI is buffered the same
+way. streaming_response() therefore picks the iterator for the handler
+serving the request. Under ASGI it wraps the sync generator in
+`aiterate()`, which pulls one chunk per await. The pull runs on the
+request's thread-sensitive thread, so a server-side cursor keeps using the
+connection that opened it.
+"""
+
+from asgiref.sync import sync_to_async
+from django.core.handlers.asgi import ASGIRequest
+from django.http import StreamingHttpResponse
+
+_DONE = object()
+
+
+async def aiterate(iterable):
+    """Async iterator over a sync `iterable`, advancing it in the thread-sensitive executor."""
+    iterator = iter(iterable)
+    step = sync_to_async(next, thread_sensitive=True)
+    try:
+        while True:
+            chunk = await step(iterator, _DONE)
+            if chunk is _DONE:
+                return
+            yield chunk
+    finally:
+        close = getattr(iterator, "close", None)  # Client went away: release the generator's cursor
+        if close is not None:
+            await sync_to_async(close, thread_sensitive=True)()
+
+
+def streaming_response(request, iterable, **kwargs):
+    """StreamingHttpResponse over `iterable` (sync), served chunk by chunk by both WSGI and ASGI handlers."""
+    if isinstance(getattr(request, "_request", request), ASGIRequest):  # DRF wraps the HttpRequest
+        iterable = aiterate(iterable)
+    return StreamingHttpResponse(iterable, **kwargs)
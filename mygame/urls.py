@@ -18,12 +18,15 @@ from django.contrib import admin
 from django.urls import path, include
 from django.http import HttpResponse
 
+from .metrics import metrics_view
+
 def home(request):
     return HttpResponse("<h1>Welcome to My Game API!</h1><p>Use /api/auth/ for authentication.</p>")
 
 
 urlpatterns = [
     path('', home, name='home'),  # Add homepage route
+    path('metrics', metrics_view, name='metrics'),  # Prometheus scrape endpoint; METRICS_ALLOWED_IPS and staff only
     path('admin/', admin.site.urls),
     path('api/auth/', include('authentication.urls')),  # Include authentication URLs
     path('api/game/', include('game.urls')),  # Game APIs